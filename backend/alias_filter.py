@@ -0,0 +1,237 @@
+# In-memory filter of existing short-URL aliases.
+#
+# Scanners request random /s/<alias> paths all day. A counting Bloom filter of
+# every alias answers "definitely not a link" after a catch-up read of links
+# created since the last one, which misses arriving together share; only
+# aliases the filter might contain go on to the short_urls lookup.
+#
+# The filter is built in a background thread by paging through short_urls by
+# id, and kept current three ways:
+#   - links created or deleted in this process update it directly;
+#   - on a miss, rows with an id above the last one seen (and ids skipped
+#     earlier that may still commit) are pulled in, so links created by other
+#     processes are found. A miss is only answered after a sync that started
+#     once the request arrived; misses that arrive while a sync runs wait and
+#     share the next one. With nothing new, a sync is one query returning no
+#     rows;
+#   - it is rebuilt every ALIAS_FILTER_REBUILD_INTERVAL seconds, which clears
+#     links deleted elsewhere (until then they only cost a query).
+# Until the first build finishes every alias is treated as possibly present.
+#
+# Settings (.env):
+#   ALIAS_FILTER=1
+#   ALIAS_FILTER_CAPACITY=1000000
+#   ALIAS_FILTER_ERROR_RATE=0.01
+#   ALIAS_FILTER_REBUILD_INTERVAL=3600
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+ENABLED = (os.environ.get("ALIAS_FILTER") or "1").strip().lower() in ("1", "true", "yes")
+CAPACITY = int(os.environ.get("ALIAS_FILTER_CAPACITY", "1000000"))
+ERROR_RATE = float(os.environ.get("ALIAS_FILTER_ERROR_RATE", "0.01"))
+REBUILD_INTERVAL = float(os.environ.get("ALIAS_FILTER_REBUILD_INTERVAL", "3600"))
+PAGE_SIZE = 10000
+# Ids are handed out before commit, so a row can appear after a higher id was
+# already seen. Syncs re-read the ids they skipped (at most this many below
+# each new one, and the ones this far below a build's last id) until the row
+# shows up or the id is GAP_SECONDS old: a rolled-back insert never shows up,
+# and a transaction open longer than that is found by the next rebuild.
+SYNC_OVERLAP = 1000
+GAP_SECONDS = 60
+
+
+class CountingBloomFilter:
+    """Bloom filter with 8-bit counters so entries can be removed.
+
+    A counter that reaches 255 stays there, which can only cause false
+    positives, never false negatives.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        step = int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            if self.counters[position] < 255:
+                self.counters[position] += 1
+        self.count += 1
+
+    def remove(self, key):
+        positions = self._positions(key)
+        if not all(self.counters[p] for p in positions):
+            return
+        for position in positions:
+            if self.counters[position] < 255:
+                self.counters[position] -= 1
+        self.count = max(0, self.count - 1)
+
+    def __contains__(self, key):
+        return all(self.counters[p] for p in self._positions(key))
+
+    def estimated_error_rate(self):
+        filled = (self.size - self.counters.count(0)) / self.size
+        return filled ** self.hashes
+
+
+class AliasFilter:
+    def __init__(self, client, capacity=CAPACITY, error_rate=ERROR_RATE,
+                 rebuild_interval=REBUILD_INTERVAL):
+        self.client = client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.filter = None
+        self.last_id = 0
+        # Ids at or below last_id that a sync has not seen yet, with when they
+        # were first skipped, and ids above it that add() already counted
+        self.gaps = {}
+        self.ahead_ids = set()
+        # Start time of the last sync that finished
+        self.synced_from = 0.0
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def ready(self):
+        return self.filter is not None
+
+    def _scan(self, after_id):
+        """Yield pages of (id, alias) with id > after_id, oldest first."""
+        while True:
+            page = self.client.table("short_urls").select("id,alias").gt("id", after_id) \
+                .order("id").limit(PAGE_SIZE).execute().data
+            if not page:
+                return
+            yield page
+            after_id = page[-1]["id"]
+            if len(page) < PAGE_SIZE:
+                return
+
+    def build(self):
+        """Rebuild from a full scan and swap it in."""
+        size = max(self.capacity, 2 * (self.filter.count if self.filter else 0))
+        fresh = CountingBloomFilter(size, self.error_rate)
+        last_id = 0
+        recent = set()
+        for page in self._scan(0):
+            for row in page:
+                fresh.add(row["alias"])
+                recent.add(row["id"])
+            last_id = page[-1]["id"]
+            recent = {i for i in recent if i > last_id - SYNC_OVERLAP}
+        now = time.monotonic()
+        with self.lock:
+            self.filter = fresh
+            self.last_id = last_id
+            self.ahead_ids = set()
+            self.gaps = {i: now for i in range(max(1, last_id - SYNC_OVERLAP + 1), last_id) if i not in recent}
+        # Rows added while the scan ran
+        self.sync()
+        return fresh.count
+
+    def sync(self, since=None):
+        """Add rows created since the last scan. Returns how many were added.
+
+        With `since`, nothing is read when a sync that started after it has
+        finished in the meantime.
+        """
+        with self.sync_lock:
+            if since is not None and self.synced_from >= since:
+                return 0
+            started = time.monotonic()
+            with self.lock:
+                self.gaps = {i: seen for i, seen in self.gaps.items() if started - seen < GAP_SECONDS}
+                after = min(self.gaps) - 1 if self.gaps else self.last_id
+            added = 0
+            for page in self._scan(after):
+                with self.lock:
+                    for row in page:
+                        i = row["id"]
+                        if i > self.last_id:
+                            for gap in range(max(self.last_id + 1, i - SYNC_OVERLAP), i):
+                                self.gaps[gap] = started
+                            self.last_id = i
+                            if i in self.ahead_ids:
+                                self.ahead_ids.discard(i)
+                                continue
+                        elif self.gaps.pop(i, None) is None:
+                            continue
+                        self.filter.add(row["alias"])
+                        added += 1
+            self.synced_from = started
+            return added
+
+    def might_exist(self, alias):
+        """False only when the alias is certainly not a link."""
+        arrived = time.monotonic()
+        current = self.filter
+        if current is None or alias in current:
+            return True
+        # A link another process created since the last sync is not in the
+        # filter yet, so "absent" needs a sync that started after we arrived
+        self.sync(since=arrived)
+        return alias in self.filter
+
+    def add(self, alias, row_id=None):
+        """Add a link created by this process; `row_id` stops a sync adding it twice."""
+        with self.lock:
+            if self.filter is None:
+                return
+            if row_id is not None:
+                if row_id > self.last_id:
+                    if row_id in self.ahead_ids:
+                        return
+                    self.ahead_ids.add(row_id)
+                elif self.gaps.pop(row_id, None) is None:
+                    return
+            self.filter.add(alias)
+
+    def remove(self, alias):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.remove(alias)
+
+    def stats(self):
+        current = self.filter
+        if current is None:
+            return {"ready": False}
+        return {"ready": True, "items": current.count, "bytes": current.size,
+                "hashes": current.hashes, "estimated_error_rate": current.estimated_error_rate()}
+
+    def start(self, on_build=None):
+        """Build now and then every rebuild_interval seconds, on a daemon thread."""
+        if self.thread is not None:
+            return self.thread
+
+        def loop():
+            while True:
+                try:
+                    count = self.build()
+                    print(f"[AliasFilter] Built with {count} alias(es)")
+                    if on_build:
+                        on_build(self)
+                except Exception as e:
+                    print(f"[AliasFilter] Build failed: {e}")
+                    if self.filter is None:
+                        time.sleep(min(self.rebuild_interval, 30))
+                        continue
+                time.sleep(self.rebuild_interval)
+
+        self.thread = threading.Thread(target=loop, name="alias-filter", daemon=True)
+        self.thread.start()
+        return self.thread
@@ -1,28 +1,94 @@
 import os
-from flask import Flask, request, jsonify, send_from_directory
+import base64
+import contextvars
+import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import jwt
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
-import smtplib
+from datetime import datetime, timedelta, timezone
 
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from supabase import create_client, Client
+from rate_limit import init_rate_limiting
+from metrics import init_metrics, registry as metrics
+from tracing import init_tracing, traced
+from text_patch import PatchError, validate_ops
+import note_history
+import click_analytics
+import alias_filter
+import short_url_io
+import workspace_io
+import todo_due
+import file_previews
+import folder_tree
+import usage
+import replicas
+import resilience
+import single_flight
+from short_alias import ALIAS_PATTERN, MAX_ATTEMPTS as ALIAS_ATTEMPTS, AliasGenerator
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": os.environ.get("CORS_ORIGINS", "*")}})
+CORS(app, resources={r"/*": {"origins": os.environ.get("CORS_ORIGINS", "*")}}, expose_headers=["ETag"])
 app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-production")
 
-# Supabase client
-def get_supabase() -> Client:
+# Supabase client (or the embedded SQLite store when STORAGE_BACKEND=sqlite).
+# With SUPABASE_READ_URLS set, selects in @replica_reads views may go to a
+# read replica (see replicas.py)
+def get_supabase() -> "Client":
+    if (os.environ.get("STORAGE_BACKEND") or "supabase").strip().lower() == "sqlite":
+        from sqlite_store import SQLiteClient
+        path = os.environ.get("SQLITE_PATH") or os.path.join(os.path.dirname(__file__), "data.db")
+        return SQLiteClient(path)
+    # Imported here: the supabase package is the slowest import at startup
+    from supabase import ClientOptions, create_client
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_KEY")
-    return create_client(url, key)
-
-supabase = get_supabase()
+    # No call waits longer than the write deadline (see resilience.py)
+    options = ClientOptions(postgrest_client_timeout=resilience.WRITE_TIMEOUT)
+    if not replicas.READ_URLS:
+        return create_client(url, key, options)
+    read_key = os.environ.get("SUPABASE_READ_KEY") or key
+    return replicas.RoutedClient(create_client(url, key, options),
+                                 [create_client(u, read_key, options) for u in replicas.READ_URLS],
+                                 lambda target: metrics.inc("db_reads_total", {"target": target}))
+
+class LazyClient:
+    """Creates the client on first use instead of at import time."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def reset(self):
+        """Drop the client so the next use creates a new one (after a fork,
+        connections opened by the parent must not be shared)."""
+        self._client = None
+        self._lock = threading.Lock()
+
+def wrap_client(client):
+    """Deadlines, read retries and the circuit breaker around whichever client
+    it is, identical concurrent reads sharing one call, and query tracing."""
+    return traced(single_flight.coalescing(resilience.resilient(client, metrics.inc), metrics.inc))
+
+supabase = LazyClient(lambda: wrap_client(get_supabase()))
 
 # ===== HELPER FUNCTIONS =====
 def verify_token(token):
@@ -43,13 +109,154 @@ def get_user_by_id(user_id):
     return response.data[0] if response.data else None
 
 def create_user(username, email, password):
+    """Create the user with its default folder and notebook in one transaction.
+
+    Returns the new user's id. Raises on unique violations (code 23505).
+    """
     hashed_password = generate_password_hash(password)
-    response = supabase.table("users").insert({
-        "username": username,
-        "email": email,
-        "password": hashed_password
+    response = supabase.rpc("register_user", {
+        "p_username": username,
+        "p_email": email,
+        "p_password": hashed_password
     }).execute()
-    return response.data[0] if response.data else None
+    return response.data
+
+def is_unique_violation(error):
+    text = f"{getattr(error, 'message', '') or ''} {error}".lower()
+    return getattr(error, "code", None) == "23505" or "duplicate" in text
+
+def duplicate_user_message(error):
+    if not is_unique_violation(error):
+        return None
+    text = f"{getattr(error, 'message', '') or ''} {error}".lower()
+    if "username" in text:
+        return "Username already exists"
+    if "email" in text:
+        return "Email already exists"
+    return "Username or email already exists"
+
+def etag_for(row):
+    return f'"{row.get("version", 1)}"'
+
+def requested_version(data):
+    """Version the client last saw, from If-Match or a "version" body field.
+
+    Returns (version, status to use on mismatch) or (None, None).
+    """
+    if_match = request.headers.get("If-Match", "").strip()
+    if if_match and if_match != "*":
+        value = if_match.split(",")[0].strip().removeprefix("W/").strip('"')
+        try:
+            return int(value), 412
+        except ValueError:
+            return -1, 412
+    if data.get("version") is not None:
+        try:
+            return int(data["version"]), 409
+        except (TypeError, ValueError):
+            return -1, 409
+    return None, None
+
+def versioned_update(table, id, user_id, values, data, not_found):
+    """Apply `values` in a single UPDATE ... RETURNING scoped to the owner.
+
+    The database bumps `version` on every update. When the client sends the
+    version it last saw, the update only matches that version; otherwise it
+    gets 409 (body field) or 412 (If-Match) with the current version.
+    """
+    version, mismatch_status = requested_version(data)
+    query = supabase.table(table).update(values).eq("id", id).eq("user_id", user_id)
+    if version is not None:
+        query = query.eq("version", version)
+    response = query.execute()
+
+    if response.data:
+        row = response.data[0]
+        result = jsonify({"message": "Updated", "version": row.get("version")})
+        result.headers["ETag"] = etag_for(row)
+        return result
+
+    if version is not None:
+        # Only on the failure path: tell a stale version apart from a missing row
+        current = supabase.table(table).select("id,version").eq("id", id).eq("user_id", user_id).execute()
+        if current.data:
+            result = jsonify({"message": "Version conflict", "version": current.data[0].get("version")})
+            result.status_code = mismatch_status
+            result.headers["ETag"] = etag_for(current.data[0])
+            return result
+    return jsonify({"message": not_found}), 404
+
+def current_user_id():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    return verify_token(token) if token else None
+
+init_metrics(app)
+init_tracing(app)
+init_rate_limiting(app, current_user_id)
+replicas.init_read_routing(app, current_user_id)
+resilience.init_resilience(app)
+
+def flush_clicks(rows):
+    supabase.rpc("add_click_rollups", {"p_rows": rows}).execute()
+    metrics.inc("short_url_clicks_flushed_total", value=sum(row["clicks"] for row in rows))
+
+click_recorder = click_analytics.ClickRecorder(flush_clicks) if click_analytics.ENABLED else None
+
+def publish_alias_filter_stats(current):
+    stats = current.stats()
+    metrics.set("alias_filter_items", value=stats.get("items", 0))
+    metrics.set("alias_filter_estimated_error_rate", value=stats.get("estimated_error_rate", 0))
+
+# Answers /s/<alias> for aliases that were never created without a query
+short_alias_filter = alias_filter.AliasFilter(supabase) if alias_filter.ENABLED else None
+
+def store_file_preview(row):
+    supabase.table("file_previews").upsert(row, on_conflict="file_id").execute()
+    metrics.inc("file_previews_total", {"status": row["status"]})
+
+# Thumbnails and snippets for GET /files/<id>/preview, made off the request path
+file_preview_generator = file_previews.PreviewGenerator(store_file_preview) if file_previews.ENABLED else None
+
+background_tasks = {"started": False, "lock": threading.Lock()}
+
+def start_background_tasks():
+    """Start note history compaction, usage reconciliation, click flushing and
+    the alias filter build, once per process.
+
+    Nothing starts at import: the first request does it (so importing the app
+    never scans short_urls), unless DEFER_BACKGROUND_TASKS is set. Threads do
+    not survive a fork, so serve.py sets it when it imports the app before
+    forking workers and calls after_fork() in each worker instead.
+    """
+    with background_tasks["lock"]:
+        if background_tasks["started"]:
+            return
+        background_tasks["started"] = True
+    note_history.start_compaction(supabase)
+    usage.start_reconciliation(supabase)
+    if click_recorder:
+        click_recorder.start()
+    if short_alias_filter:
+        short_alias_filter.start(publish_alias_filter_stats)
+
+def after_fork():
+    if isinstance(supabase, LazyClient):
+        supabase.reset()
+    background_tasks["started"] = False
+    background_tasks["lock"] = threading.Lock()
+    start_background_tasks()
+
+def before_exit():
+    """Flush what only lives in this process before it exits."""
+    if click_recorder:
+        click_recorder.flush()
+    if file_preview_generator:
+        file_preview_generator.shutdown()
+
+@app.before_request
+def start_background_on_first_request():
+    if not background_tasks["started"] and not os.environ.get("DEFER_BACKGROUND_TASKS"):
+        start_background_tasks()
 
 # Serve landing page
 @app.route("/", methods=["GET"])
@@ -74,17 +281,15 @@ def register():
         return jsonify({"message": "Password required"}), 400
 
     try:
-        user = create_user(username, email, password)
-        if not user:
+        # Default folder and notebook are created by the same database call
+        user_id = create_user(username, email, password)
+        if not user_id:
             return jsonify({"message": "Username or email already exists"}), 400
-        
-        # Create default folder
-        supabase.table("folders").insert({"user_id": user["id"], "name": "General"}).execute()
-        
         return jsonify({"message": "User registered successfully"}), 201
     except Exception as e:
-        if "duplicate" in str(e).lower():
-            return jsonify({"message": "Username or email already exists"}), 400
+        message = duplicate_user_message(e)
+        if message:
+            return jsonify({"message": message}), 400
         return jsonify({"message": str(e)}), 500
 
 # Login endpoint
@@ -113,6 +318,77 @@ def login():
     else:
         return jsonify({"message": "Invalid username or password"}), 401
 
+# ===== SETTINGS =====
+# Due times are resolved in the user's time zone (see todo_due.py). The
+# database sets due_at itself; this cache only serves reads such as "due today"
+time_zones = todo_due.TimeZoneCache()
+
+@app.route("/settings/time-zone", methods=["GET"])
+def get_time_zone():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+    return jsonify({"time_zone": time_zones.get(supabase, user_id)})
+
+@app.route("/settings/time-zone", methods=["PUT"])
+def set_time_zone():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    name = ((request.json or {}).get("time_zone") or "").strip()
+    if not todo_due.valid_time_zone(name):
+        return jsonify({"message": "Unknown time zone, use an IANA name such as Europe/Berlin"}), 400
+    # One call: the same wall-clock due times are now different moments, so
+    # the user's open todos get a new due_at (none when the zone is unchanged).
+    # Not checked against time_zones first: another process may have changed it
+    updated = supabase.rpc("set_user_time_zone", {"p_user_id": user_id, "p_time_zone": name}).execute().data
+    time_zones.put(user_id, name)
+    return jsonify({"time_zone": name, "updated": updated})
+
+# ===== BOOTSTRAP =====
+# Everything a tool page needs on first load, in one request. The queries for
+# the requested views run concurrently; list payloads leave out large columns
+# (note content, file data) which the pages fetch per item.
+BOOTSTRAP_QUERIES = {
+    "folders": lambda user_id: supabase.table("folders").select("*").eq("user_id", user_id).order("created_at", desc=True),
+    "todos": lambda user_id: supabase.table("todos").select("*").eq("user_id", user_id).order("id", desc=True),
+    "notebooks": lambda user_id: supabase.table("notebooks").select("*").eq("user_id", user_id).order("created_at", desc=True),
+    "notes": lambda user_id: supabase.table("notes").select("id,notebook_id,section,title,created_at,updated_at").eq("user_id", user_id).order("updated_at", desc=True),
+    # Flat, parents first, with total_files and total_bytes (see folder_tree.py)
+    "file_folder_tree": lambda user_id: supabase.rpc("file_folder_tree", {"p_user_id": user_id}),
+    "files": lambda user_id: supabase.table("files").select("id,name,type,mime_type,size,folder_id,created_at,modified_at").eq("user_id", user_id).order("modified_at", desc=True),
+}
+BOOTSTRAP_VIEWS = {
+    "todos": ("folders", "todos"),
+    "notes": ("notebooks", "notes"),
+    "files": ("file_folder_tree", "files", "notes"),
+}
+bootstrap_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("BOOTSTRAP_THREADS", "8")))
+
+@app.route("/bootstrap", methods=["GET"])
+@replicas.replica_reads
+def bootstrap():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    views = [v.strip() for v in (request.args.get("views") or "todos,notes,files").split(",") if v.strip()]
+    unknown = [v for v in views if v not in BOOTSTRAP_VIEWS]
+    if unknown:
+        return jsonify({"message": f"Unknown view: {', '.join(unknown)}"}), 400
+
+    keys = []
+    for view in views:
+        keys.extend(k for k in BOOTSTRAP_VIEWS[view] if k not in keys)
+    # copy_context keeps query tracing attached to this request in the pool threads
+    futures = {key: bootstrap_pool.submit(contextvars.copy_context().run, lambda k=key: BOOTSTRAP_QUERIES[k](user_id).execute())
+               for key in keys}
+    return jsonify({key: future.result().data for key, future in futures.items()})
+
 # ===== FOLDERS =====
 @app.route("/folders", methods=["GET"])
 def get_folders():
@@ -122,14 +398,7 @@ def get_folders():
         return jsonify({"message": "Unauthorized"}), 401
 
     response = supabase.table("folders").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-    folders = response.data
-    
-    if not folders:
-        supabase.table("folders").insert({"user_id": user_id, "name": "General"}).execute()
-        response = supabase.table("folders").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        folders = response.data
-    
-    return jsonify(folders)
+    return jsonify(response.data)
 
 @app.route("/folders", methods=["POST"])
 def create_folder():
@@ -174,6 +443,7 @@ def delete_folder(id):
 
 # ===== TODOS =====
 @app.route("/todos", methods=["GET"])
+@replicas.replica_reads
 def get_todos():
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
     user_id = verify_token(token)
@@ -181,6 +451,22 @@ def get_todos():
         return jsonify({"message": "Unauthorized"}), 401
 
     folder_id = request.args.get("folder_id")
+    due = request.args.get("due")
+    if due:
+        # Range scans on (user_id, due_at)
+        query = supabase.table("todos").select("*").eq("user_id", user_id).eq("completed", 0)
+        now = datetime.now(timezone.utc)
+        if due == "today":
+            start, end = todo_due.day_range(time_zones.get(supabase, user_id), now)
+            query = query.gte("due_at", todo_due.iso(start)).lt("due_at", todo_due.iso(end))
+        elif due == "overdue":
+            query = query.lt("due_at", todo_due.iso(now))
+        else:
+            return jsonify({"message": "due must be today or overdue"}), 400
+        if folder_id:
+            query = query.eq("folder_id", folder_id)
+        return jsonify(query.order("due_at").execute().data)
+
     if folder_id:
         response = supabase.table("todos").select("*").eq("user_id", user_id).eq("folder_id", folder_id).order("id", desc=True).execute()
     else:
@@ -199,13 +485,15 @@ def add_todo():
     if not data.get("title") or not data.get("priority"):
         return jsonify({"message": "Missing title or priority"}), 400
 
+    due_date = data.get("due_date", "")
+    due_time = data.get("due_time", "23:59")
     response = supabase.table("todos").insert({
         "user_id": user_id,
         "folder_id": data.get("folder_id"),
         "title": data["title"],
         "priority": data["priority"],
-        "due_date": data.get("due_date", ""),
-        "due_time": data.get("due_time", "23:59")
+        "due_date": due_date,
+        "due_time": due_time
     }).execute()
     
     return jsonify({"message": "Task added"}), 201
@@ -218,33 +506,15 @@ def update_todo(id):
         return jsonify({"message": "Unauthorized"}), 401
 
     data = request.json
-    
-    # Get current todo
-    response = supabase.table("todos").select("*").eq("id", id).eq("user_id", user_id).execute()
-    if not response.data:
-        return jsonify({"message": "Todo not found"}), 404
-    
-    todo = response.data[0]
-    
-    title = data.get("title") if data.get("title") is not None else todo["title"]
-    priority = data.get("priority") if data.get("priority") is not None else todo["priority"]
-    due_date = data.get("due_date") if data.get("due_date") is not None else todo["due_date"]
-    due_time = data.get("due_time") if data.get("due_time") is not None else todo["due_time"]
-    completed = data.get("completed") if data.get("completed") is not None else todo["completed"]
-    
-    reset_reminder = (data.get("due_date") is not None and data.get("due_date") != todo["due_date"]) or (data.get("due_time") is not None and data.get("due_time") != todo["due_time"])
-    reminder_sent = 0 if reset_reminder else (todo.get("reminder_sent") or 0)
 
-    supabase.table("todos").update({
-        "title": title,
-        "priority": priority,
-        "due_date": due_date,
-        "due_time": due_time,
-        "completed": completed,
-        "reminder_sent": reminder_sent
-    }).eq("id", id).eq("user_id", user_id).execute()
-    
-    return jsonify({"message": "Updated"})
+    values = {field: data[field] for field in ("title", "priority", "due_date", "due_time", "completed")
+              if data.get(field) is not None}
+    if not values:
+        return jsonify({"message": "Nothing to update"}), 400
+
+    # A new due date/time gets its due_at and a fresh reminder from the
+    # set_todo_due_at and reset_todo_reminder triggers
+    return versioned_update("todos", id, user_id, values, data, "Todo not found")
 
 @app.route("/todos/<int:id>", methods=["DELETE"])
 def delete_todo(id):
@@ -265,14 +535,7 @@ def get_notebooks():
         return jsonify({"message": "Unauthorized"}), 401
 
     response = supabase.table("notebooks").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-    notebooks = response.data
-    
-    if not notebooks:
-        supabase.table("notebooks").insert({"user_id": user_id, "name": "My First Notebook"}).execute()
-        response = supabase.table("notebooks").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        notebooks = response.data
-    
-    return jsonify(notebooks)
+    return jsonify(response.data)
 
 @app.route("/notebooks", methods=["POST"])
 def create_notebook():
@@ -301,6 +564,7 @@ def delete_notebook(id):
     return jsonify({"message": "Notebook deleted"})
 
 @app.route("/notes", methods=["GET"])
+@replicas.replica_reads
 def get_notes():
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
     user_id = verify_token(token)
@@ -351,7 +615,9 @@ def get_note(id):
     response = supabase.table("notes").select("*").eq("id", id).eq("user_id", user_id).execute()
     if not response.data:
         return jsonify({"message": "Note not found"}), 404
-    return jsonify(response.data[0])
+    result = jsonify(response.data[0])
+    result.headers["ETag"] = etag_for(response.data[0])
+    return result
 
 @app.route("/notes/<int:id>", methods=["PUT"])
 def update_note(id):
@@ -361,24 +627,80 @@ def update_note(id):
         return jsonify({"message": "Unauthorized"}), 401
 
     data = request.json
-    
-    response = supabase.table("notes").select("*").eq("id", id).eq("user_id", user_id).execute()
-    if not response.data:
-        return jsonify({"message": "Note not found"}), 404
-    
-    note = response.data[0]
-    title = data.get("title") if data.get("title") is not None else note["title"]
-    section = data.get("section") if data.get("section") is not None else note["section"]
-    content = data.get("content") if data.get("content") is not None else note["content"]
 
-    supabase.table("notes").update({
-        "title": title,
-        "section": section,
-        "content": content,
-        "updated_at": datetime.utcnow().isoformat()
-    }).eq("id", id).eq("user_id", user_id).execute()
-    
-    return jsonify({"message": "Updated"})
+    values = {field: data[field] for field in ("title", "section", "content") if data.get(field) is not None}
+    values["updated_at"] = datetime.utcnow().isoformat()
+
+    return versioned_update("notes", id, user_id, values, data, "Note not found")
+
+# Autosave sends only what changed: {"base_version": n, "ops": [[pos, delete, insert], ...]}
+# (positions in code points), applied by apply_note_patch in the database.
+@app.route("/notes/<int:id>", methods=["PATCH"])
+def patch_note(id):
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    data = request.json or {}
+    base_version, _ = requested_version({"version": data.get("base_version")})
+    if base_version is None:
+        return jsonify({"message": "Missing base_version"}), 400
+    try:
+        ops = validate_ops(data.get("ops", []))
+    except PatchError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        response = supabase.rpc("apply_note_patch", {
+            "p_note_id": id,
+            "p_user_id": user_id,
+            "p_base_version": base_version,
+            "p_ops": ops,
+            "p_title": data.get("title"),
+            "p_section": data.get("section")
+        }).execute()
+    except Exception as e:
+        code = getattr(e, "code", None)
+        if code == "P0002":
+            return jsonify({"message": "Note not found"}), 404
+        if code == "40001":
+            current = supabase.table("notes").select("id,version").eq("id", id).eq("user_id", user_id).execute()
+            result = jsonify({"message": "Version conflict", "version": current.data[0]["version"] if current.data else None})
+            result.status_code = 409
+            return result
+        if code == "22023":
+            return jsonify({"message": getattr(e, "message", None) or "Invalid patch"}), 400
+        raise
+
+    result = jsonify({"message": "Updated", "version": response.data["version"]})
+    result.headers["ETag"] = etag_for(response.data)
+    return result
+
+@app.route("/notes/<int:id>/revisions", methods=["GET"])
+def get_note_revisions(id):
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    try:
+        limit = min(max(int(request.args.get("limit", 100)), 1), 500)
+    except ValueError:
+        return jsonify({"message": "Invalid limit"}), 400
+    return jsonify(note_history.list_revisions(supabase, id, user_id, limit))
+
+@app.route("/notes/<int:id>/revisions/<int:version>", methods=["GET"])
+def get_note_revision(id, version):
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    content = note_history.load_revision(supabase, id, user_id, version)
+    if content is None:
+        return jsonify({"message": "Revision not found"}), 404
+    return jsonify({"id": id, "version": version, "content": content})
 
 @app.route("/notes/<int:id>", methods=["DELETE"])
 def delete_note(id):
@@ -392,6 +714,7 @@ def delete_note(id):
 
 # ===== FILES (Google Drive-like) =====
 @app.route("/files", methods=["GET"])
+@replicas.replica_reads
 def get_files():
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
     user_id = verify_token(token)
@@ -422,24 +745,78 @@ def upload_file():
     name = data.get("name")
     file_type = data.get("type")
     mime_type = data.get("mimeType")
-    size = data.get("size", 0)
     file_data = data.get("data")
     folder_id = data.get("folder_id")
 
     if not name:
         return jsonify({"message": "Missing file name"}), 400
+    # Charged by what is stored, not by the size the client sends
+    try:
+        size = usage.data_size(file_data)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
-    response = supabase.table("files").insert({
-        "user_id": user_id,
-        "name": name,
-        "type": file_type,
-        "mime_type": mime_type,
-        "size": size,
-        "data": file_data,
-        "folder_id": folder_id
-    }).execute()
-    
-    return jsonify({"message": "File uploaded", "id": response.data[0]["id"] if response.data else None}), 201
+    # The usage trigger refuses the insert if it would pass the storage quota
+    try:
+        response = supabase.table("files").insert({
+            "user_id": user_id,
+            "name": name,
+            "type": file_type,
+            "mime_type": mime_type,
+            "size": size,
+            "data": file_data,
+            "folder_id": folder_id
+        }).execute()
+    except Exception as e:
+        if usage.quota_exceeded(e):
+            return jsonify({"message": "Storage quota exceeded"}), 413
+        raise
+
+    file_id = response.data[0]["id"] if response.data else None
+    if file_id and file_preview_generator:
+        file_preview_generator.submit(file_id, user_id, file_type, mime_type, file_data)
+    return jsonify({"message": "File uploaded", "id": file_id}), 201
+
+@app.route("/files/<int:id>/preview", methods=["GET"])
+def get_file_preview(id):
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    response = supabase.table("file_previews").select("status,mime_type,data,digest") \
+        .eq("file_id", id).eq("user_id", user_id).execute()
+    if not response.data:
+        if not file_preview_generator:
+            return jsonify({"message": "Preview not available"}), 404
+        if not file_preview_generator.is_pending(id):
+            # Uploaded before previews existed, or while the queue was full:
+            # make one now. The data is only read when there is room for it.
+            full = file_preview_generator.is_full()
+            columns = "id" if full else "id,type,mime_type,data"
+            file = supabase.table("files").select(columns).eq("id", id).eq("user_id", user_id).execute()
+            if not file.data:
+                return jsonify({"message": "File not found"}), 404
+            if not full:
+                row = file.data[0]
+                file_preview_generator.submit(id, user_id, row["type"], row["mime_type"], row["data"])
+        result = jsonify({"message": "Preview is being generated"})
+        result.headers["Retry-After"] = "1"
+        return result, 202
+
+    preview = response.data[0]
+    if preview["status"] != "ready":
+        result = jsonify({"message": "Preview not available"})
+        if preview["status"] == "none":
+            result.headers["Cache-Control"] = "private, max-age=86400"
+        return result, 404
+
+    # A file's content never changes, so neither does its preview
+    etag = f'"{preview["digest"]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    return Response(base64.b64decode(preview["data"]), content_type=preview["mime_type"], headers=headers)
 
 @app.route("/files/<int:id>", methods=["GET"])
 def get_file(id):
@@ -451,7 +828,9 @@ def get_file(id):
     response = supabase.table("files").select("*").eq("id", id).eq("user_id", user_id).execute()
     if not response.data:
         return jsonify({"message": "File not found"}), 404
-    return jsonify(response.data[0])
+    result = jsonify(response.data[0])
+    result.headers["ETag"] = etag_for(response.data[0])
+    return result
 
 @app.route("/files/<int:id>", methods=["PUT"])
 def update_file(id):
@@ -461,21 +840,11 @@ def update_file(id):
         return jsonify({"message": "Unauthorized"}), 401
 
     data = request.json
-    
-    response = supabase.table("files").select("*").eq("id", id).eq("user_id", user_id).execute()
-    if not response.data:
-        return jsonify({"message": "File not found"}), 404
 
-    name = data.get("name") if data.get("name") is not None else response.data[0]["name"]
-    folder_id = data.get("folder_id") if data.get("folder_id") is not None else response.data[0]["folder_id"]
+    values = {field: data[field] for field in ("name", "folder_id") if data.get(field) is not None}
+    values["modified_at"] = datetime.utcnow().isoformat()
 
-    supabase.table("files").update({
-        "name": name,
-        "folder_id": folder_id,
-        "modified_at": datetime.utcnow().isoformat()
-    }).eq("id", id).eq("user_id", user_id).execute()
-    
-    return jsonify({"message": "Updated"})
+    return versioned_update("files", id, user_id, values, data, "File not found")
 
 @app.route("/files/<int:id>", methods=["DELETE"])
 def delete_file(id):
@@ -487,6 +856,17 @@ def delete_file(id):
     supabase.table("files").delete().eq("id", id).eq("user_id", user_id).execute()
     return jsonify({"message": "Deleted"})
 
+# Counters kept by triggers on every write (see usage.py), so this is one
+# row lookup
+@app.route("/usage", methods=["GET"])
+def get_usage():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    return jsonify(usage.summary(usage.get(supabase, user_id)))
+
 # File Folders API
 @app.route("/file-folders", methods=["GET"])
 def get_file_folders():
@@ -504,6 +884,19 @@ def get_file_folders():
     
     return jsonify(response.data)
 
+# Nested folders with the number and total size of the files in each folder
+# (file_count, byte_count) and in its whole subtree (total_files,
+# total_bytes), kept by a trigger on files: see folder_tree.py
+@app.route("/file-folders/tree", methods=["GET"])
+def get_file_folder_tree():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    rows = supabase.rpc("file_folder_tree", {"p_user_id": user_id}).execute().data
+    return jsonify(folder_tree.nest(rows or []))
+
 @app.route("/file-folders", methods=["POST"])
 def create_file_folder():
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
@@ -533,15 +926,11 @@ def delete_file_folder(id):
     if not user_id:
         return jsonify({"message": "Unauthorized"}), 401
 
-    # Get subfolders
-    response = supabase.table("file_folders").select("id").eq("parent_id", id).eq("user_id", user_id).execute()
-    for sub in response.data:
-        supabase.table("files").delete().eq("folder_id", sub["id"]).eq("user_id", user_id).execute()
-        supabase.table("file_folders").delete().eq("id", sub["id"]).eq("user_id", user_id).execute()
-    
-    supabase.table("files").delete().eq("folder_id", id).eq("user_id", user_id).execute()
-    supabase.table("file_folders").delete().eq("id", id).eq("user_id", user_id).execute()
-    return jsonify({"message": "Folder deleted"})
+    # The folder, every folder below it and their files, in one transaction
+    deleted = supabase.rpc("delete_file_folder", {"p_user_id": user_id, "p_folder_id": id}).execute().data
+    if not deleted or not deleted.get("folders"):
+        return jsonify({"message": "Folder not found"}), 404
+    return jsonify({"message": "Folder deleted", **deleted})
 
 # Import notes to files
 @app.route("/files/import-note/<int:note_id>", methods=["POST"])
@@ -556,23 +945,31 @@ def import_note_to_files(note_id):
         return jsonify({"message": "Note not found"}), 404
 
     note = response.data[0]
-    import base64
     content = note["content"] or ""
     encoded = base64.b64encode(content.encode()).decode()
     
-    file_response = supabase.table("files").insert({
-        "user_id": user_id,
-        "name": f"{note['title']}.txt",
-        "type": "note",
-        "mime_type": "text/plain",
-        "size": len(content),
-        "data": encoded
-    }).execute()
-    
-    return jsonify({"message": "Note imported to files", "id": file_response.data[0]["id"] if file_response.data else None}), 201
+    try:
+        file_response = supabase.table("files").insert({
+            "user_id": user_id,
+            "name": f"{note['title']}.txt",
+            "type": "note",
+            "mime_type": "text/plain",
+            "size": len(content.encode()),
+            "data": encoded
+        }).execute()
+    except Exception as e:
+        if usage.quota_exceeded(e):
+            return jsonify({"message": "Storage quota exceeded"}), 413
+        raise
+
+    file_id = file_response.data[0]["id"] if file_response.data else None
+    if file_id and file_preview_generator:
+        file_preview_generator.submit(file_id, user_id, "note", "text/plain", encoded)
+    return jsonify({"message": "Note imported to files", "id": file_id}), 201
 
 # ===== URL SHORTENER =====
 @app.route("/short-urls", methods=["GET"])
+@replicas.replica_reads
 def get_short_urls():
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
     user_id = verify_token(token)
@@ -582,6 +979,35 @@ def get_short_urls():
     response = supabase.table("short_urls").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
     return jsonify(response.data)
 
+alias_generator = AliasGenerator(os.environ.get("SHORT_ALIAS_KEY") or app.config['SECRET_KEY'],
+                                 int(os.environ.get("SHORT_ALIAS_LENGTH", "7")))
+
+def insert_short_url(user_id, original_url, alias, title, base_url):
+    """Insert one link in a single statement and return the new row.
+
+    Without `alias` one is generated, and regenerated on a collision. Returns
+    None when the alias is taken (or no free alias was found).
+    """
+    # No existence check: the unique index on alias decides, in the same insert
+    for attempt in range(1 if alias else ALIAS_ATTEMPTS):
+        candidate = alias or alias_generator.next(attempt)
+        try:
+            response = supabase.table("short_urls").insert({
+                "user_id": user_id,
+                "original_url": original_url,
+                "alias": candidate,
+                "short_url": f"{base_url}/s/{candidate}",
+                "title": title,
+                "clicks": 0
+            }).execute()
+            if short_alias_filter:
+                short_alias_filter.add(candidate, response.data[0]["id"])
+            return response.data[0]
+        except Exception as e:
+            if not is_unique_violation(e):
+                raise
+    return None
+
 @app.route("/short-urls", methods=["POST"])
 def create_short_url():
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
@@ -591,34 +1017,136 @@ def create_short_url():
 
     data = request.json
     original_url = data.get("original_url")
-    alias = data.get("alias")
+    alias = (data.get("alias") or "").strip()
     title = data.get("title", "Untitled")
 
     if not original_url:
         return jsonify({"message": "Missing original URL"}), 400
-    
-    if not alias:
-        return jsonify({"message": "Missing alias"}), 400
+    if alias and not ALIAS_PATTERN.match(alias):
+        return jsonify({"message": "Alias can only contain letters, numbers, hyphens, and underscores"}), 400
+
+    row = insert_short_url(user_id, original_url, alias, title, request.host_url.rstrip('/'))
+    if row is None:
+        if alias:
+            return jsonify({"message": "Alias already exists. Please choose another."}), 400
+        return jsonify({"message": "Could not allocate an alias, please retry"}), 503
+
+    return jsonify({"message": "Short URL created", "short_url": row["short_url"], "alias": row["alias"],
+                    "id": row["id"]}), 201
+
+def import_short_url_chunk(chunk, user_id, base_url, seen):
+    """Create one chunk of imported links: one alias lookup, one bulk insert."""
+    report = []
+    wanted = [row["alias"] for _, row, _ in chunk if row and row["alias"]]
+    taken = set()
+    if wanted:
+        existing = supabase.table("short_urls").select("alias").in_("alias", list(set(wanted))).execute()
+        taken = {row["alias"] for row in existing.data}
+
+    pending = []
+    for line, row, error in chunk:
+        if error:
+            report.append({"line": line, "status": "invalid", "message": error})
+        elif row["alias"] and (row["alias"] in taken or row["alias"] in seen):
+            report.append({"line": line, "status": "exists", "alias": row["alias"]})
+        else:
+            alias = row["alias"] or alias_generator.next()
+            seen.add(alias)
+            pending.append((line, row, alias))
+    if not pending:
+        return report
 
-    # Check if alias already exists for this user
-    existing = supabase.table("short_urls").select("*").eq("alias", alias).execute()
-    if existing.data:
-        return jsonify({"message": "Alias already exists. Please choose another."}), 400
+    try:
+        inserted = supabase.table("short_urls").insert([{
+            "user_id": user_id,
+            "original_url": row["original_url"],
+            "alias": alias,
+            "short_url": f"{base_url}/s/{alias}",
+            "title": row["title"],
+            "clicks": 0
+        } for _, row, alias in pending]).execute().data
+        if short_alias_filter:
+            for created in inserted:
+                short_alias_filter.add(created["alias"], created["id"])
+        report.extend({"line": line, "status": "created", "alias": created["alias"], "id": created["id"]}
+                      for (line, _, _), created in zip(pending, inserted))
+    except Exception as e:
+        if not is_unique_violation(e):
+            raise
+        # An alias was taken after the lookup (or a generated one collided):
+        # the bulk insert rolled back, so place these rows one at a time
+        for line, row, _ in pending:
+            created = insert_short_url(user_id, row["original_url"], row["alias"], row["title"], base_url)
+            if created:
+                report.append({"line": line, "status": "created", "alias": created["alias"], "id": created["id"]})
+            else:
+                report.append({"line": line, "status": "exists", "alias": row["alias"]})
+    return report
+
+# Body is CSV with a header row (original_url, alias, title) or NDJSON, read
+# line by line. Responds with a per-row report.
+@app.route("/short-urls/import", methods=["POST"])
+def import_short_urls():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
 
-    # Create short URL
+    fmt = short_url_io.detect_format(request.content_type, request.args.get("format"))
     base_url = request.host_url.rstrip('/')
-    short_url = f"{base_url}/s/{alias}"
+    report = []
+    seen = set()
+    error = None
+    try:
+        for chunk in short_url_io.chunked(short_url_io.read_rows(request.stream, fmt)):
+            report.extend(import_short_url_chunk(chunk, user_id, base_url, seen))
+    except (short_url_io.ImportLimitError, csv.Error) as e:
+        error = str(e)
 
-    response = supabase.table("short_urls").insert({
-        "user_id": user_id,
-        "original_url": original_url,
-        "alias": alias,
-        "short_url": short_url,
-        "title": title,
-        "clicks": 0
-    }).execute()
-    
-    return jsonify({"message": "Short URL created", "short_url": short_url, "id": response.data[0]["id"] if response.data else None}), 201
+    counts = {status: sum(1 for row in report if row["status"] == status) for status in ("created", "exists", "invalid")}
+    result = {"message": error or "Import finished", **counts, "rows": sorted(report, key=lambda row: row["line"])}
+    return jsonify(result), 400 if error and not counts["created"] else 200
+
+@app.route("/short-urls/export", methods=["GET"])
+def export_short_urls():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    fmt = short_url_io.detect_format(None, request.args.get("format") or "csv")
+
+    def pages():
+        # Keyset pagination: each page is one indexed range read on id
+        last_id = 0
+        while True:
+            page = supabase.table("short_urls").select("id," + ",".join(short_url_io.EXPORT_COLUMNS)) \
+                .eq("user_id", user_id).gt("id", last_id).order("id").limit(short_url_io.EXPORT_PAGE_SIZE).execute().data
+            if not page:
+                return
+            yield page
+            if len(page) < short_url_io.EXPORT_PAGE_SIZE:
+                return
+            last_id = page[-1]["id"]
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = Response(stream_with_context(short_url_io.export_lines(pages(), fmt)), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="short-urls.{fmt}"'
+    return response
+
+# Lets the form check a custom alias as it is typed; reads only the id column
+@app.route("/short-urls/available", methods=["GET"])
+def short_url_alias_available():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    alias = (request.args.get("alias") or "").strip()
+    if not ALIAS_PATTERN.match(alias):
+        return jsonify({"alias": alias, "valid": False, "available": False})
+    response = supabase.table("short_urls").select("id").eq("alias", alias).limit(1).execute()
+    return jsonify({"alias": alias, "valid": True, "available": not response.data})
 
 @app.route("/short-urls/<int:id>", methods=["DELETE"])
 def delete_short_url(id):
@@ -627,27 +1155,208 @@ def delete_short_url(id):
     if not user_id:
         return jsonify({"message": "Unauthorized"}), 401
 
-    supabase.table("short_urls").delete().eq("id", id).eq("user_id", user_id).execute()
+    deleted = supabase.table("short_urls").delete().eq("id", id).eq("user_id", user_id).execute()
+    if short_alias_filter:
+        for row in deleted.data:
+            short_alias_filter.remove(row["alias"])
     return jsonify({"message": "Deleted"})
 
+@app.route("/short-urls/<int:id>/stats", methods=["GET"])
+def short_url_stats(id):
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    parsed = click_analytics.parse_range(request.args.get("range"))
+    if parsed is None:
+        return jsonify({"message": "Invalid range, use e.g. 24h, 7d or 30d"}), 400
+    granularity, buckets = parsed
+
+    link = supabase.table("short_urls").select("id,clicks").eq("id", id).eq("user_id", user_id).execute()
+    if not link.data:
+        return jsonify({"message": "Short URL not found"}), 404
+    rollups = supabase.table("short_url_clicks").select("bucket,referrer,agent,country,clicks") \
+        .eq("short_url_id", id).eq("granularity", granularity).gte("bucket", buckets[0]).execute()
+    # Clicks this process has not flushed yet, so a fresh click shows up at once
+    pending = click_recorder.pending_rows(id) if click_recorder else []
+    stats = click_analytics.summarize(rollups.data + pending, granularity, buckets)
+    stats["all_time"] = (link.data[0].get("clicks") or 0) + sum(row["clicks"] for row in pending)
+    return jsonify(stats)
+
 # Redirect short URL
 @app.route("/s/<alias>", methods=["GET"])
+@replicas.replica_reads
 def redirect_short_url(alias):
-    response = supabase.table("short_urls").select("*").eq("alias", alias).execute()
+    if short_alias_filter and short_alias_filter.ready:
+        if not short_alias_filter.might_exist(alias):
+            metrics.inc("alias_filter_lookups_total", {"result": "absent"})
+            return jsonify({"message": "Short URL not found"}), 404
+        metrics.inc("alias_filter_lookups_total", {"result": "maybe"})
+
+    response = supabase.table("short_urls").select("id,original_url,clicks").eq("alias", alias).execute()
+    if not response.data and replicas.used():
+        # A link created moments ago may not have reached the replica yet
+        with replicas.primary_reads():
+            response = supabase.table("short_urls").select("id,original_url,clicks").eq("alias", alias).execute()
     
     if not response.data:
+        if short_alias_filter and short_alias_filter.ready:
+            metrics.inc("alias_filter_false_positives_total")
         return jsonify({"message": "Short URL not found"}), 404
     
     url_data = response.data[0]
     
-    # Increment click count
-    new_clicks = (url_data.get("clicks") or 0) + 1
-    supabase.table("short_urls").update({"clicks": new_clicks}).eq("alias", alias).execute()
+    if click_recorder:
+        # Counted in memory and written in batches by the flush thread
+        click_recorder.record(url_data["id"], request.referrer, request.user_agent.string,
+                              click_analytics.country_code(request.headers))
+    else:
+        new_clicks = (url_data.get("clicks") or 0) + 1
+        supabase.table("short_urls").update({"clicks": new_clicks}).eq("alias", alias).execute()
     
     # Redirect to original URL
     from flask import redirect
     return redirect(url_data["original_url"], code=302)
 
+# ===== WORKSPACE EXPORT / IMPORT =====
+def workspace_pages(user_id, table):
+    """Pages of a user's rows in one table, by id (see workspace_io.py)."""
+    columns = ",".join(workspace_io.TABLES[table])
+    size = workspace_io.page_size(table)
+    last_id = 0
+    while True:
+        page = supabase.table(table).select(columns).eq("user_id", user_id).gt("id", last_id) \
+            .order("id").limit(size).execute().data
+        if not page:
+            return
+        yield page
+        if len(page) < size:
+            return
+        last_id = page[-1]["id"]
+
+@app.route("/export", methods=["GET"])
+def export_workspace():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    fmt = workspace_io.detect_format(None, request.args.get("format") or "zip")
+    pages_for = lambda table: workspace_pages(user_id, table)
+    if fmt == "zip":
+        body, mimetype = workspace_io.export_zip(pages_for), "application/zip"
+    else:
+        body, mimetype = workspace_io.export_ndjson(pages_for), "application/x-ndjson"
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    stamp = datetime.utcnow().strftime("%Y%m%d")
+    response.headers["Content-Disposition"] = f'attachment; filename="workspace-{stamp}.{fmt}"'
+    return response
+
+def insert_workspace_rows(table, rows, user_id, ids, deferred, result):
+    """Bulk insert exported rows of one table and record their new ids."""
+    pending = []
+    room = None
+    if table == "files" and usage.QUOTA_BYTES > 0:
+        # Skips what clearly does not fit; the usage trigger has the final say
+        room = usage.QUOTA_BYTES - usage.get(supabase, user_id)["file_bytes"]
+    for row in rows:
+        values = workspace_io.prepare(table, row, ids)
+        if values is not None and table == "files":
+            # The archive's size column is not trusted: files are charged by their data
+            try:
+                values["size"] = usage.data_size(values.get("data"))
+            except ValueError:
+                values = None
+        if values is not None and room is not None:
+            # Files that no longer fit in the storage quota are skipped
+            size = values["size"]
+            if size > room:
+                values = None
+            else:
+                room -= size
+        if values is None:
+            result["skipped"][table] += 1
+            continue
+        pending.append((row.get("id"), row.get("parent_id"), dict(values, user_id=user_id)))
+    if not pending:
+        return
+    try:
+        inserted = supabase.table(table).insert([values for _, _, values in pending]).execute().data
+    except Exception as e:
+        if not usage.quota_exceeded(e):
+            raise
+        # Other uploads used the room meanwhile: keep the files that still fit
+        kept, inserted = [], []
+        for entry in pending:
+            try:
+                inserted += supabase.table(table).insert(entry[2]).execute().data
+                kept.append(entry)
+            except Exception as error:
+                if not usage.quota_exceeded(error):
+                    raise
+                result["skipped"][table] += 1
+        pending = kept
+    for (old_id, old_parent, values), created in zip(pending, inserted):
+        ids[table][old_id] = created["id"]
+        if table == "file_folders" and old_parent is not None and "parent_id" not in values:
+            # Parent comes later in the archive; linked once everything is in
+            deferred.append((created["id"], old_parent))
+    result["imported"][table] += len(inserted)
+
+def import_workspace_chunk(table, rows, user_id, ids, deferred, result, base_url, seen):
+    """Import one chunk of exported rows of one table."""
+    if table == "short_urls":
+        chunk = []
+        for line, row in enumerate(rows, 1):
+            try:
+                chunk.append((line, short_url_io.clean_row(row), None))
+            except ValueError as e:
+                chunk.append((line, None, str(e)))
+        for entry in import_short_url_chunk(chunk, user_id, base_url, seen):
+            result["imported" if entry["status"] == "created" else "skipped"][table] += 1
+        return
+
+    if table == "file_folders":
+        # Parents in the same chunk go in first, one insert per tree level
+        waiting = rows
+        while waiting:
+            inside = {row.get("id") for row in waiting}
+            wave = [row for row in waiting if row.get("parent_id") not in inside] or waiting
+            waiting = [row for row in waiting if row.get("parent_id") in inside] if len(wave) < len(waiting) else []
+            insert_workspace_rows(table, wave, user_id, ids, deferred, result)
+        return
+    insert_workspace_rows(table, rows, user_id, ids, deferred, result)
+
+# Body is the archive from GET /export: a ZIP, or NDJSON with ?format=ndjson.
+# Rows are added to the workspace; the response counts them per table.
+@app.route("/import", methods=["POST"])
+def import_workspace():
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    user_id = verify_token(token)
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    fmt = workspace_io.detect_format(request.content_type, request.args.get("format"))
+    ids = {table: {} for table in workspace_io.TABLES}
+    result = {"imported": dict.fromkeys(workspace_io.TABLES, 0), "skipped": dict.fromkeys(workspace_io.TABLES, 0)}
+    deferred = []
+    seen = set()
+    base_url = request.host_url.rstrip('/')
+    error = None
+    try:
+        for table, rows in workspace_io.chunks(workspace_io.read_records(request.stream, fmt)):
+            import_workspace_chunk(table, rows, user_id, ids, deferred, result, base_url, seen)
+    except ValueError as e:
+        error = str(e)
+    for folder_id, old_parent in deferred:
+        parent_id = ids["file_folders"].get(old_parent)
+        if parent_id:
+            supabase.table("file_folders").update({"parent_id": parent_id}).eq("id", folder_id).execute()
+
+    imported = sum(result["imported"].values())
+    return jsonify({"message": error or "Import finished", **result}), 400 if error and not imported else 200
+
 # ===== EMAIL REMINDER (SMTP) =====
 def get_smtp_config():
     try:
@@ -667,6 +1376,9 @@ def send_reminder_email(to_email, task_title, due_datetime_str):
     cfg = get_smtp_config()
     if not cfg["host"] or not cfg["user"] or not cfg["password"]:
         return False
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
     try:
         msg = MIMEMultipart("alternative")
         msg["Subject"] = f"Reminder: Task due soon — {task_title}"
@@ -688,37 +1400,36 @@ def check_and_send_reminders():
     cfg = get_smtp_config()
     if not cfg["host"] or not cfg["user"]:
         return
-    now = datetime.now()
+    now = datetime.now(timezone.utc)
     window_end = now + timedelta(hours=1)
     
-    response = supabase.table("todos").select("*").execute()
-    todos = [t for t in response.data if t.get("due_date") and not t.get("completed")]
+    # Range scan on the partial index over open, unreminded todos
+    todos = supabase.table("todos").select("id,user_id,title,due_at").eq("completed", 0).eq("reminder_sent", 0) \
+        .gte("due_at", todo_due.iso(now)).lte("due_at", todo_due.iso(window_end)).order("due_at").execute().data
+    owners = {}
+    if todos:
+        response = supabase.table("users").select("id,email,time_zone").in_("id", list({t["user_id"] for t in todos})).execute()
+        owners = {user["id"]: user for user in response.data}
     
-    sent_count = 0
-    for row in todos:
-        due_date = (row.get("due_date") or "").strip()
-        due_time = (row.get("due_time") or "23:59").strip()
-        if len(due_time) == 5 and ":" in due_time:
-            pass
-        else:
-            due_time = "23:59"
-        if not due_date:
-            continue
-        try:
-            due_dt = datetime.strptime(f"{due_date} {due_time}", "%Y-%m-%d %H:%M")
-        except ValueError:
-            continue
-        if now <= due_dt <= window_end:
-            user = get_user_by_id(row["user_id"])
+    sent_ids = []
+    try:
+        for row in todos:
+            user = owners.get(row["user_id"])
             to_email = (user.get("email") or "").strip() if user else ""
             if not user or not to_email:
                 continue
-            due_str = due_dt.strftime("%Y-%m-%d %H:%M")
+            # Shown in the owner's time zone, as they entered it
+            due_str = todo_due.local_text(row["due_at"], user.get("time_zone"))
             if send_reminder_email(to_email, row["title"], due_str):
-                supabase.table("todos").update({"reminder_sent": 1}).eq("id", row["id"]).execute()
-                sent_count += 1
+                sent_ids.append(row["id"])
+    finally:
+        # One update for the whole check, also when sending stopped partway
+        if sent_ids:
+            supabase.table("todos").update({"reminder_sent": 1}).in_("id", sent_ids).execute()
     
-    print(f"[Reminder] Check done: {len(todos)} task(s) checked, {sent_count} email(s) sent")
+    metrics.inc("reminder_checks_total")
+    metrics.inc("reminder_emails_sent_total", value=len(sent_ids))
+    print(f"[Reminder] Check done: {len(todos)} task(s) checked, {len(sent_ids)} email(s) sent")
 
 @app.route("/check-reminders", methods=["GET", "POST"])
 def trigger_check_reminders():
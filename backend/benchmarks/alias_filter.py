@@ -0,0 +1,86 @@
+# Short-URL redirects for unknown aliases with and without the alias filter.
+#
+#   cd backend
+#   python -m benchmarks.alias_filter --links 20000 --requests 5000 --unknown 0.5 --latency-ms 25
+#
+# Creates --links short URLs, then sends redirects where a share of --unknown
+# ask for aliases that were never created (as scanners do). Reports queries
+# per request and latency with the filter off and on, and the filter's
+# observed false-positive rate on the unknown aliases.
+
+import argparse
+import random
+import string
+import sys
+import threading
+import time
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend, print_report, run_plan, summarize
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Short-URL redirects with the alias filter")
+    parser.add_argument("--links", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--unknown", type=float, default=0.5, help="share of redirects for aliases that do not exist")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase()
+    backend = load_backend(client)
+    import alias_filter
+    backend.click_recorder = None
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "owner", "email": "owner@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["owner"].copy().pop()
+    headers = auth_header(backend, user_id)
+    aliases = [f"link-{i}" for i in range(args.links)]
+    for start in range(0, len(aliases), 1000):
+        body = "original_url,alias\n" + "".join(f"https://example.com/{a},{a}\n" for a in aliases[start:start + 1000])
+        test_client.post("/short-urls/import", headers=headers, data=body.encode(), content_type="text/csv")
+
+    started = time.perf_counter()
+    short_filter = alias_filter.AliasFilter(backend.supabase, capacity=max(args.links, 1000))
+    short_filter.build()
+    build_seconds = time.perf_counter() - started
+    client.latency = args.latency_ms / 1000.0
+
+    letters = string.ascii_letters + string.digits
+    plan_aliases = [
+        "".join(rng.choices(letters, k=7)) if rng.random() < args.unknown else rng.choice(aliases)
+        for _ in range(args.requests)
+    ]
+    local = threading.local()
+
+    def execute(op, alias):
+        tc = getattr(local, "client", None)
+        if tc is None:
+            tc = local.client = backend.app.test_client()
+        resp = tc.get(f"/s/{alias}")
+        return resp.status_code, int(resp.headers.get("X-Query-Count", 0))
+
+    results = {}
+    for mode in ("filter_off", "filter_on"):
+        backend.short_alias_filter = short_filter if mode == "filter_on" else None
+        samples, wall = run_plan([(mode, alias) for alias in plan_aliases], execute, args.concurrency)
+        results.update(summarize(samples, wall))
+    results.pop("all")
+
+    known = set(aliases)
+    unknown = [alias for alias in plan_aliases if alias not in known]
+    passed = sum(1 for alias in unknown if alias in short_filter.filter)
+    stats = short_filter.stats()
+    print_report(f"Redirects, {args.unknown:.0%} unknown ({args.concurrency} threads, {args.latency_ms:g} ms per query)", results)
+    print(f"filter: {stats['items']} aliases, {stats['bytes'] / 1024:.0f} KiB, {stats['hashes']} hashes, "
+          f"built in {build_seconds:.2f} s")
+    print(f"false positives: {passed}/{len(unknown)} unknown aliases "
+          f"({passed / max(len(unknown), 1):.2%} observed, {stats['estimated_error_rate']:.2%} estimated)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
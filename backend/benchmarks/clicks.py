@@ -0,0 +1,94 @@
+# Redirect cost and stats reads with batched click analytics.
+#
+#   cd backend
+#   python -m benchmarks.clicks --links 200 --clicks 20000 --concurrency 8 --latency-ms 25
+#
+# Runs the same redirects with a per-click UPDATE (the old path) and with
+# in-memory batching, then reports the rollup rows written against the raw
+# click count and the latency of GET /short-urls/<id>/stats.
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend, print_report, run_plan, summarize
+
+AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile/15E148",
+    "Mozilla/5.0 (iPad; CPU OS 17_0 like Mac OS X)",
+    "Googlebot/2.1 (+http://www.google.com/bot.html)",
+]
+REFERRERS = ["", "https://www.google.com/", "https://t.co/abc", "https://news.ycombinator.com/item", "https://mail.example.com/"]
+COUNTRIES = ["", "US", "DE", "IN", "BR", "JP"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Short-URL redirects with batched click analytics")
+    parser.add_argument("--links", type=int, default=200)
+    parser.add_argument("--clicks", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase()
+    backend = load_backend(client)
+    recorder = backend.click_recorder
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "owner", "email": "owner@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["owner"].copy().pop()
+    headers = auth_header(backend, user_id)
+    links = []
+    for i in range(args.links):
+        resp = test_client.post("/short-urls", headers=headers, json={"original_url": f"https://example.com/{i}"})
+        links.append((resp.get_json()["id"], resp.get_json()["alias"]))
+    client.latency = args.latency_ms / 1000.0
+
+    local = threading.local()
+
+    def execute(op, arg):
+        tc = getattr(local, "client", None)
+        if tc is None:
+            tc = local.client = backend.app.test_client()
+        _, alias = arg
+        resp = tc.get(f"/s/{alias}", headers={
+            "User-Agent": rng.choice(AGENTS), "Referer": rng.choice(REFERRERS), "CF-IPCountry": rng.choice(COUNTRIES)})
+        return resp.status_code, int(resp.headers.get("X-Query-Count", 0))
+
+    # Popular links get most of the traffic
+    weights = [1 / (rank + 1) for rank in range(len(links))]
+    results = {}
+    for mode in ("per_click_update", "batched"):
+        backend.click_recorder = recorder if mode == "batched" else None
+        plan = [(mode, link) for link in rng.choices(links, weights=weights, k=args.clicks)]
+        samples, wall = run_plan(plan, execute, args.concurrency)
+        results.update(summarize(samples, wall))
+    results.pop("all")
+    started = time.perf_counter()
+    flushed = recorder.flush()
+    flush_ms = (time.perf_counter() - started) * 1000
+
+    samples = []
+    for link_id, _ in rng.choices(links, k=200):
+        for range_arg in ("24h", "30d"):
+            started = time.perf_counter()
+            resp = test_client.get(f"/short-urls/{link_id}/stats?range={range_arg}", headers=headers)
+            samples.append((f"stats_{range_arg}", time.perf_counter() - started, resp.status_code,
+                            int(resp.headers.get("X-Query-Count", 0))))
+    stats = summarize(samples, sum(sample[1] for sample in samples))
+    stats.pop("all")
+    results.update(stats)
+
+    print_report(f"Redirects and stats ({args.concurrency} threads, {args.latency_ms:g} ms per query)", results)
+    print(f"batched run: {flushed} clicks flushed as {len(client.tables['short_url_clicks'].rows)} rollup rows "
+          f"(hourly + daily) in {flush_ms:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
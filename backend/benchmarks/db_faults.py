@@ -0,0 +1,104 @@
+# Database faults: the plain client against timeouts, retries, the breaker and hedging.
+#
+#   cd backend
+#   python -m benchmarks.db_faults --requests 2000 --threads 16 --latency-ms 10
+#
+# Sends GET /todos from --threads clients to the app on a stand-in that
+# injects faults (FaultInjector), once with the plain client and once wrapped
+# by resilience.ResilientClient, in three scenarios:
+#   errors     --error-rate of calls fail like a gateway 503; reads are retried
+#   slow tail  --slow-rate of calls take --slow-ms longer; reads still running
+#              after --hedge-ms are sent again
+#   outage     every call hangs --hang-ms and then fails; reads give up after
+#              --read-timeout-ms and the breaker then fails the rest at once
+# and reports the responses that failed and p50/p99 latency. After the outage
+# the database comes back and the breaker is checked to close again.
+
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import resilience
+from tracing import traced
+
+from .fake_supabase import FakeSupabase, FaultInjector
+from .harness import auth_header, load_backend
+
+
+def run(backend, headers, args, requests=None):
+    def send(_):
+        test_client = backend.app.test_client()
+        started = time.perf_counter()
+        status = test_client.get("/todos", headers=headers).status_code
+        return status, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(send, range(requests or args.requests)))
+    latencies = sorted(seconds for _, seconds in results)
+    return {"failed": sum(status >= 500 for status, _ in results),
+            "503": sum(status == 503 for status, _ in results),
+            "p50": statistics.median(latencies) * 1000,
+            "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plain client against the resilience policy under injected faults")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--slow-ms", type=float, default=500.0)
+    parser.add_argument("--hedge-ms", type=float, default=40.0)
+    parser.add_argument("--hang-ms", type=float, default=2000.0)
+    parser.add_argument("--read-timeout-ms", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    client = FakeSupabase()
+    backend = load_backend(client)
+    user_id = str(uuid.UUID(int=1))
+    client.bulk_load("users", [{"id": user_id, "username": "owner", "email": "owner@example.com", "password": "x"}])
+    client.bulk_load("todos", ({"user_id": user_id, "title": f"Task {i}", "priority": "Low"} for i in range(50)))
+    headers = auth_header(backend, user_id)
+    client.latency = args.latency_ms / 1000.0
+
+    def policy(**kwargs):
+        breaker = resilience.CircuitBreaker(failures=5, reset_seconds=1.0)
+        return traced(resilience.ResilientClient(client, read_timeout=args.read_timeout_ms / 1000.0, retries=2,
+                                                 backoff=0.02, breaker=breaker, **kwargs))
+
+    scenarios = [
+        ("errors", FaultInjector(error_rate=args.error_rate, seed=args.seed), {}, args.requests),
+        ("slow tail", FaultInjector(slow_rate=args.slow_rate, slow_ms=args.slow_ms, seed=args.seed),
+         {"hedge_after": args.hedge_ms / 1000.0}, args.requests),
+        # Fewer requests: without deadlines each one waits out the hang
+        ("outage", FaultInjector(hang_ms=args.hang_ms), {}, args.threads * 10),
+    ]
+    results = []
+    for name, faults, options, requests in scenarios:
+        faults.down = name == "outage"
+        client.faults = faults
+        for label, wrapped in (("plain", traced(client)), ("resilient", policy(**options))):
+            backend.supabase = wrapped
+            results.append((name, label, run(backend, headers, args, requests)))
+
+    # Back up: the breaker lets a probe through after its reset time and closes
+    client.faults.down = False
+    time.sleep(1.0)
+    recovered = run(backend, headers, args, args.threads * 10)
+
+    print(f"\nGET /todos from {args.threads} threads, {args.latency_ms:g} ms per query")
+    print(f"{'scenario':<11}{'client':<11}{'requests':>9}{'failed':>8}{'503':>6}{'p50 ms':>9}{'p99 ms':>9}")
+    for (name, label, r), (_, _, _, requests) in zip(results, [s for s in scenarios for _ in range(2)]):
+        print(f"{name:<11}{label:<11}{requests:>9}{r['failed']:>8}{r['503']:>6}{r['p50']:>9.1f}{r['p99']:>9.1f}")
+    print(f"\nAfter the outage: {recovered['failed']} of {args.threads * 10} failed, "
+          f"p50 {recovered['p50']:.1f} ms, breaker {'open' if backend.supabase._client.breaker.is_open else 'closed'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# Reminder scan: text due dates parsed in Python against the due_at range query.
+#
+#   cd backend
+#   python -m benchmarks.due_reminders --scale 0.1 --runs 5 --latency-ms 25
+#
+# Seeds the stand-in and the SQLite store with the same todos, then runs the
+# reminder check the old way (every todo fetched and its due_date/due_time
+# parsed, one user lookup per due task) and the current way (one range query
+# on due_at over open, unreminded todos plus one users query). Emails are not
+# sent, so every run sees the same due tasks. Reports queries, rows and bytes
+# returned per scan and the median scan time.
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlite_store import SQLiteClient
+from tracing import end_trace, start_trace
+
+from .fake_supabase import FakeSupabase
+from .harness import load_backend
+from .seed import seed
+
+
+def text_scan(backend):
+    """check_and_send_reminders before todos.due_at existed."""
+    now = datetime.now()
+    window_end = now + timedelta(hours=1)
+    response = backend.supabase.table("todos").select("*").execute()
+    todos = [t for t in response.data if t.get("due_date") and not t.get("completed")]
+    for row in todos:
+        due_time = (row.get("due_time") or "23:59").strip()
+        if not (len(due_time) == 5 and ":" in due_time):
+            due_time = "23:59"
+        try:
+            due_dt = datetime.strptime(f"{row['due_date'].strip()} {due_time}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            continue
+        if now <= due_dt <= window_end:
+            user = backend.get_user_by_id(row["user_id"])
+            if user and (user.get("email") or "").strip():
+                backend.send_reminder_email(user["email"], row["title"], due_dt.strftime("%Y-%m-%d %H:%M"))
+
+
+def measure(backend, scan, runs):
+    timings = []
+    trace = None
+    for _ in range(runs):
+        trace, token = start_trace("reminder-scan")
+        started = time.perf_counter()
+        try:
+            scan()
+        finally:
+            end_trace(token)
+        timings.append(time.perf_counter() - started)
+    return {
+        "queries": len(trace.queries),
+        "rows": sum(q["rows"] for q in trace.queries),
+        "kib": sum(q["bytes"] for q in trace.queries) / 1024,
+        "ms": statistics.median(timings) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reminder scan on text due dates vs todos.due_at")
+    parser.add_argument("--scale", type=float, default=0.1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=25.0, help="simulated Supabase round trip")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    fake = FakeSupabase()
+    seed(fake, args.scale, args.seed)
+    backend = load_backend(fake)
+    # Count the due tasks without sending or marking anything
+    backend.send_reminder_email = lambda to_email, title, due: False
+    fake.latency = args.latency_ms / 1000.0
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteClient(os.path.join(tmp, "bench.db"))
+        seed(store, args.scale, args.seed)
+        for label, client in ((f"stand-in {args.latency_ms:g} ms", fake), ("SQLite", store)):
+            backend.supabase = backend.wrap_client(client)
+            for method, scan in (("text scan", lambda: text_scan(backend)),
+                                 ("due_at range", backend.check_and_send_reminders)):
+                rows.append((label, method, measure(backend, scan, args.runs)))
+
+    print(f"\nReminder scan over {len(fake.tables['todos'].rows)} todos, median of {args.runs} run(s)")
+    print(f"{'store':<18}{'method':<15}{'queries':>9}{'rows':>10}{'KiB':>10}{'ms':>10}")
+    for label, method, r in rows:
+        print(f"{label:<18}{method:<15}{r['queries']:>9}{r['rows']:>10}{r['kib']:>10.0f}{r['ms']:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,702 @@
+# In-memory stand-in for the Supabase/PostgREST client.
+#
+# Implements the slice of the query builder the backend uses
+# (table().select/insert/update/upsert/delete, eq/neq/gt/gte/lt/lte/in_/is_,
+# order/limit/range, rpc) on top of Python dicts, with hash indexes on the
+# columns the app filters by. An optional per-call latency models the network
+# hop to hosted Supabase so benchmarks stay comparable, and a FaultInjector
+# can make calls fail, slow down or hang.
+
+import copy
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import folder_tree
+import note_history
+import todo_due
+import usage
+from text_patch import PatchError, apply_ops
+
+# Tables from supabase_setup.sql: (uuid primary key?, unique columns, indexed columns)
+SCHEMA = {
+    "users": (True, ("username", "email"), ("username", "email")),
+    "folders": (False, (), ("user_id",)),
+    "todos": (False, (), ("user_id", "folder_id")),
+    "notebooks": (False, (), ("user_id",)),
+    "notes": (False, (), ("user_id", "notebook_id")),
+    "file_folders": (False, (), ("user_id", "parent_id")),
+    "files": (False, (), ("user_id", "folder_id")),
+    "short_urls": (False, ("alias",), ("user_id", "alias")),
+    "note_revisions": (False, (), ("note_id",)),
+    "short_url_clicks": (False, (), ("short_url_id",)),
+    "file_previews": (False, ("file_id",), ("file_id",)),
+    "user_usage": (False, ("user_id",), ("user_id",)),
+}
+
+FOLDER_TREE_COLUMNS = ("id", "parent_id", "name", "created_at", "file_count", "byte_count")
+
+# Tables with the bump_version trigger
+VERSIONED_TABLES = {"todos", "notes", "files"}
+
+DEFAULTS = {
+    "users": {"time_zone": "UTC"},
+    "todos": {"due_time": "23:59", "completed": 0, "reminder_sent": 0, "version": 1, "due_at": None},
+    "notes": {"section": "General", "version": 1},
+    "file_folders": {"file_count": 0, "byte_count": 0},
+    "files": {"size": 0, "version": 1},
+    "short_urls": {"title": "Untitled", "clicks": 0},
+    "user_usage": {"file_count": 0, "file_bytes": 0, "todo_count": 0, "note_count": 0, "short_url_count": 0},
+}
+
+# Counter each table's rows add to in user_usage (the count_user_usage trigger)
+USAGE_COUNTERS = {"files": "file_count", "todos": "todo_count", "notes": "note_count", "short_urls": "short_url_count"}
+
+
+class APIError(Exception):
+    """Mirrors postgrest.exceptions.APIError closely enough for the app."""
+
+    def __init__(self, error):
+        self.message = error.get("message")
+        self.code = error.get("code")
+        self.hint = error.get("hint")
+        self.details = error.get("details")
+        super().__init__(str(error))
+
+
+class FaultInjector:
+    """Failures and slow calls for the stand-in: `client.faults = FaultInjector(...)`.
+
+    A share of calls (error_rate) fail like a PostgREST gateway 503 and a share
+    (slow_rate) take slow_ms longer. While `down` is set every call waits
+    hang_ms and then fails, like a database that stopped answering.
+    """
+
+    def __init__(self, error_rate=0.0, slow_rate=0.0, slow_ms=0.0, hang_ms=0.0, seed=None):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.hang_ms = hang_ms
+        self.down = False
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def __call__(self, query):
+        if self.down:
+            time.sleep(self.hang_ms / 1000.0)
+            raise APIError({"message": "upstream connect error", "code": "503"})
+        with self.lock:
+            fail, slow = self.rng.random() < self.error_rate, self.rng.random() < self.slow_rate
+        if slow:
+            time.sleep(self.slow_ms / 1000.0)
+        if fail:
+            raise APIError({"message": "Service Unavailable", "code": "503"})
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeTable:
+    def __init__(self, name, uuid_pk=False, unique=(), indexed=()):
+        self.name = name
+        self.uuid_pk = uuid_pk
+        self.unique = unique
+        self.rows = {}
+        self.next_id = 1
+        self.indexes = {column: {} for column in set(indexed) | {"id"}}
+        # Row triggers: called as hook(old_row, new_row); old_row is None on
+        # insert and new_row is None on delete
+        self.after_write = []
+        # BEFORE triggers: called as hook(old_row, values) and return the
+        # values to write; old_row is None on insert
+        self.before_write = []
+
+    def _index_add(self, row):
+        for column, index in self.indexes.items():
+            index.setdefault(row.get(column), set()).add(row["id"])
+
+    def _index_remove(self, row):
+        for column, index in self.indexes.items():
+            ids = index.get(row.get(column))
+            if ids is not None:
+                ids.discard(row["id"])
+                if not ids:
+                    del index[row.get(column)]
+
+    def _check_unique(self, row, ignore_id=None):
+        for column in self.unique:
+            ids = self.indexes[column].get(row.get(column), set()) - {ignore_id}
+            if row.get(column) is not None and ids:
+                raise APIError({
+                    "message": f'duplicate key value violates unique constraint "{self.name}_{column}_key"',
+                    "code": "23505",
+                    "details": f"Key ({column})=({row.get(column)}) already exists.",
+                })
+
+    def insert(self, row):
+        row = dict(DEFAULTS.get(self.name, {}), **row)
+        for hook in self.before_write:
+            row = hook(None, row)
+        if "id" not in row or row["id"] is None:
+            if self.uuid_pk:
+                row["id"] = str(uuid.uuid4())
+            else:
+                row["id"] = self.next_id
+        if not self.uuid_pk and isinstance(row["id"], int):
+            self.next_id = max(self.next_id, row["id"] + 1)
+        if row["id"] in self.rows:
+            raise APIError({"message": f'duplicate key value violates unique constraint "{self.name}_pkey"', "code": "23505"})
+        self._check_unique(row)
+        row.setdefault("created_at", _now())
+        if self.name == "notes":
+            row.setdefault("updated_at", row["created_at"])
+        if self.name == "files":
+            row.setdefault("modified_at", row["created_at"])
+        self.rows[row["id"]] = row
+        self._index_add(row)
+        for hook in self.after_write:
+            hook(None, row)
+        return row
+
+    def update(self, row, values):
+        if self.name in VERSIONED_TABLES and "version" not in values:
+            # Mirrors the bump_version trigger
+            values = dict(values, version=row["version"] + 1)
+        for hook in self.before_write:
+            values = hook(row, values)
+        candidate = dict(row, **values)
+        self._check_unique(candidate, ignore_id=row["id"])
+        old = dict(row) if self.after_write else None
+        self._index_remove(row)
+        row.update(values)
+        self._index_add(row)
+        for hook in self.after_write:
+            hook(old, row)
+        return row
+
+    def delete(self, row):
+        self._index_remove(row)
+        del self.rows[row["id"]]
+        for hook in self.after_write:
+            hook(row, None)
+
+    def candidates(self, filters):
+        # Use the narrowest equality index available, otherwise scan
+        best = None
+        for column, op, value in filters:
+            if op == "eq" and column in self.indexes:
+                ids = self.indexes[column].get(_coerce(value, self._sample_type(column)), set())
+                if best is None or len(ids) < len(best):
+                    best = ids
+        if best is None:
+            return list(self.rows.values())
+        return [self.rows[i] for i in best]
+
+    def _sample_type(self, column):
+        for row in self.rows.values():
+            value = row.get(column)
+            if value is not None:
+                return type(value)
+        return None
+
+
+def _coerce(value, kind):
+    # PostgREST compares on the column type; query-string args arrive as text
+    if kind is int and isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    if kind is str and isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def _matches(row, column, op, value):
+    current = row.get(column)
+    if op == "is":
+        return current is None if value in (None, "null") else current == value
+    if op == "in":
+        return current in {_coerce(v, type(current)) for v in value}
+    value = _coerce(value, type(current)) if current is not None else value
+    if op == "eq":
+        return current == value
+    if op == "neq":
+        return current != value
+    if current is None or value is None:
+        return False
+    if op == "gt":
+        return current > value
+    if op == "gte":
+        return current >= value
+    if op == "lt":
+        return current < value
+    if op == "lte":
+        return current <= value
+    if op in ("like", "ilike"):
+        pattern = str(value).replace("%", "")
+        text = str(current)
+        return pattern.lower() in text.lower() if op == "ilike" else pattern in text
+    raise ValueError(f"unsupported filter {op}")
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.limit_count = None
+        self.offset = 0
+        self.count_mode = None
+        self.upsert_conflict = None
+        self.single_row = False
+
+    # Operations
+    def select(self, columns="*", count=None, **kwargs):
+        self.columns = columns
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict="id", **kwargs):
+        self.operation = "upsert"
+        self.payload = payload
+        self.upsert_conflict = on_conflict
+        return self
+
+    def update(self, values, **kwargs):
+        self.operation = "update"
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def like(self, column, value):
+        return self._filter(column, "like", value)
+
+    def ilike(self, column, value):
+        return self._filter(column, "ilike", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    # Modifiers
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.limit_count = count
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset = start
+        self.limit_count = end - start + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def maybe_single(self):
+        return self.single()
+
+    def _project(self, row):
+        if self.columns.strip() == "*":
+            return copy.deepcopy(row)
+        return {c.strip(): copy.deepcopy(row.get(c.strip())) for c in self.columns.split(",")}
+
+    def _selected(self, table):
+        rows = [r for r in table.candidates(self.filters)
+                if all(_matches(r, c, op, v) for c, op, v in self.filters)]
+        for column, desc in reversed(self.orders):
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: r[column], reverse=desc)
+            # PostgREST puts NULLs first for DESC and last for ASC
+            rows = missing + present if desc else present + missing
+        return rows
+
+    def execute(self):
+        self.client.before_execute(self)
+        with self.client.lock:
+            table = self.client.tables[self.table_name]
+            count = None
+            if self.operation == "select":
+                rows = self._selected(table)
+                count = len(rows) if self.count_mode else None
+                end = None if self.limit_count is None else self.offset + self.limit_count
+                data = [self._project(r) for r in rows[self.offset:end]]
+            elif self.operation == "insert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                # All-or-nothing like a single INSERT statement
+                inserted = []
+                try:
+                    for p in payload:
+                        inserted.append(table.insert(dict(p)))
+                except APIError:
+                    for row in inserted:
+                        table.delete(row)
+                    raise
+                data = [copy.deepcopy(r) for r in inserted]
+            elif self.operation == "upsert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                data = []
+                for p in payload:
+                    keys = [k.strip() for k in self.upsert_conflict.split(",")]
+                    existing = [r for r in table.candidates([(k, "eq", p.get(k)) for k in keys])
+                                if all(r.get(k) == p.get(k) for k in keys)]
+                    row = table.update(existing[0], p) if existing else table.insert(dict(p))
+                    data.append(copy.deepcopy(row))
+            elif self.operation == "update":
+                data = [copy.deepcopy(table.update(r, self.payload)) for r in self._selected(table)]
+            else:
+                rows = self._selected(table)
+                data = [copy.deepcopy(r) for r in rows]
+                for r in rows:
+                    table.delete(r)
+        if self.single_row:
+            data = data[0] if data else None
+        return FakeResponse(data, count)
+
+
+class FakeRPC:
+    def __init__(self, client, fn, params):
+        self.client = client
+        self.fn = fn
+        self.params = params
+
+    def execute(self):
+        self.client.before_execute(self)
+        handler = self.client.functions.get(self.fn)
+        if handler is None:
+            raise APIError({"message": f"function {self.fn} does not exist", "code": "42883"})
+        with self.client.lock:
+            return FakeResponse(handler(self.client, **self.params))
+
+
+def register_user(client, p_username, p_email, p_password):
+    """Stand-in for the register_user function in supabase_setup.sql."""
+    users = client.tables["users"]
+    user = users.insert({"username": p_username, "email": p_email, "password": p_password})
+    client.tables["folders"].insert({"user_id": user["id"], "name": "General"})
+    client.tables["notebooks"].insert({"user_id": user["id"], "name": "My First Notebook"})
+    return user["id"]
+
+
+def apply_note_patch(client, p_note_id, p_user_id, p_base_version, p_ops, p_title=None, p_section=None):
+    """Stand-in for the apply_note_patch function in supabase_setup.sql."""
+    notes = client.tables["notes"]
+    note = notes.rows.get(p_note_id)
+    if note is None or note["user_id"] != p_user_id:
+        raise APIError({"message": "note not found", "code": "P0002"})
+    if note["version"] != p_base_version:
+        raise APIError({"message": f"stale base version, current is {note['version']}", "code": "40001"})
+    try:
+        body = apply_ops(note.get("content"), p_ops)
+    except PatchError as e:
+        raise APIError({"message": str(e), "code": "22023"}) from e
+    values = {"content": body, "updated_at": _now()}
+    if p_title is not None:
+        values["title"] = p_title
+    if p_section is not None:
+        values["section"] = p_section
+    note = notes.update(note, values)
+    return {"version": note["version"], "length": len(body)}
+
+
+def add_click_rollups(client, p_rows):
+    """Stand-in for the add_click_rollups function in supabase_setup.sql."""
+    links = client.tables["short_urls"]
+    rollups = client.tables["short_url_clicks"]
+    total = 0
+    for r in p_rows:
+        link = links.rows.get(r["short_url_id"])
+        if link is None:
+            continue
+        for granularity, bucket in (("hour", r["hour"]), ("day", r["hour"][:10] + "T00:00:00+00:00")):
+            key = {"short_url_id": r["short_url_id"], "granularity": granularity, "bucket": bucket,
+                   "referrer": r.get("referrer") or "", "agent": r.get("agent") or "", "country": r.get("country") or ""}
+            match = [row for row in rollups.candidates([("short_url_id", "eq", r["short_url_id"])])
+                     if all(row[k] == v for k, v in key.items())]
+            if match:
+                match[0]["clicks"] += r["clicks"]
+            else:
+                rollups.insert(dict(key, clicks=r["clicks"]))
+        links.update(link, {"clicks": (link.get("clicks") or 0) + r["clicks"]})
+        total += r["clicks"]
+    return total
+
+
+def set_todo_due_at(client, old, values):
+    """Stand-in for the set_todo_due_at trigger in supabase_setup.sql."""
+    if old is not None and "due_date" not in values and "due_time" not in values:
+        return values
+    row = dict(old or {}, **values)
+    user = client.tables["users"].rows.get(row.get("user_id"))
+    return dict(values, due_at=todo_due.due_at_value(row.get("due_date"), row.get("due_time"),
+                                                     user["time_zone"] if user else None))
+
+
+def reset_todo_reminder(old, values):
+    """Stand-in for the reset_todo_reminder trigger in supabase_setup.sql."""
+    if old is not None and any(column in values and values[column] != old.get(column) for column in ("due_date", "due_time")):
+        return dict(values, reminder_sent=0)
+    return values
+
+
+def backfill_todo_due_at(client, p_after_id, p_limit):
+    """Stand-in for the backfill_todo_due_at function in supabase_setup.sql."""
+    todos = client.tables["todos"]
+    users = client.tables["users"].rows
+    batch = sorted((row for row in todos.rows.values() if row["id"] > p_after_id), key=lambda row: row["id"])[:p_limit]
+    updated = 0
+    for row in batch:
+        user = users.get(row["user_id"])
+        value = todo_due.due_at_value(row.get("due_date"), row.get("due_time"), user["time_zone"]) if user else None
+        if row.get("due_at") is None and value is not None:
+            todos.update(row, {"due_at": value})
+            updated += 1
+    return {"last_id": batch[-1]["id"] if batch else None, "updated": updated}
+
+
+def set_user_time_zone(client, p_user_id, p_time_zone):
+    """Stand-in for the set_user_time_zone function in supabase_setup.sql."""
+    user = client.tables["users"].rows.get(p_user_id)
+    if user is None or user["time_zone"] == p_time_zone:
+        return 0
+    client.tables["users"].update(user, {"time_zone": p_time_zone})
+    todos = client.tables["todos"]
+    rows = [row for row in todos.candidates([("user_id", "eq", p_user_id)])
+            if row["user_id"] == p_user_id and not row.get("completed") and row.get("due_date")]
+    for row in rows:
+        todos.update(row, {"due_at": todo_due.due_at_value(row["due_date"], row.get("due_time"), p_time_zone),
+                           "reminder_sent": 0})
+    return len(rows)
+
+
+def record_note_revision(client, old, new):
+    """Stand-in for the record_note_revision trigger in supabase_setup.sql."""
+    revisions = client.tables["note_revisions"]
+    if new is None:
+        # ON DELETE CASCADE
+        for i in list(revisions.indexes["note_id"].get(old["id"], ())):
+            revisions.delete(revisions.rows[i])
+        return
+    if old is None:
+        revisions.insert({"note_id": new["id"], "user_id": new["user_id"], "version": new["version"],
+                          "chain": 0, "payload": new.get("content")})
+        return
+    if old.get("content") == new.get("content"):
+        return
+    existing = [revisions.rows[i] for i in revisions.indexes["note_id"].get(new["id"], ())]
+    if existing:
+        last_chain = max(existing, key=lambda r: r["version"])["chain"]
+    else:
+        revisions.insert({"note_id": old["id"], "user_id": old["user_id"], "version": old["version"],
+                          "chain": 0, "payload": old.get("content")})
+        last_chain = 0
+    chain, payload = note_history.next_revision(last_chain, old.get("content"), new.get("content"))
+    revisions.insert({"note_id": new["id"], "user_id": new["user_id"], "version": new["version"],
+                      "chain": chain, "payload": payload})
+
+
+def note_history_candidates(client, p_cutoff, p_keep, p_after_id, p_limit):
+    """Stand-in for the note_history_candidates function in supabase_setup.sql."""
+    revisions = client.tables["note_revisions"]
+    old = {row["note_id"] for row in revisions.rows.values()
+           if row["note_id"] > p_after_id and (row.get("created_at") or "") < p_cutoff}
+    return sorted(note_id for note_id in old if len(revisions.indexes["note_id"].get(note_id, ())) > p_keep)[:p_limit]
+
+
+def file_folder_tree(client, p_user_id):
+    """Stand-in for the file_folder_tree function in supabase_setup.sql."""
+    folders = client.tables["file_folders"]
+    rows = [row for row in folders.candidates([("user_id", "eq", p_user_id)]) if row["user_id"] == p_user_id]
+    return folder_tree.walk([{column: row.get(column) for column in FOLDER_TREE_COLUMNS} for row in rows])
+
+
+def delete_file_folder(client, p_user_id, p_folder_id):
+    """Stand-in for the delete_file_folder function in supabase_setup.sql."""
+    folders = client.tables["file_folders"]
+    files = client.tables["files"]
+    mine = [row for row in folders.candidates([("user_id", "eq", p_user_id)]) if row["user_id"] == p_user_id]
+    if not any(row["id"] == p_folder_id for row in mine):
+        return {"folders": 0, "files": 0}
+    ids = folder_tree.subtree_ids(mine, p_folder_id)
+    deleted = 0
+    for folder_id in ids:
+        for i in list(files.indexes["folder_id"].get(folder_id, ())):
+            if files.rows[i]["user_id"] == p_user_id:
+                files.delete(files.rows[i])
+                deleted += 1
+        folders.delete(folders.rows[folder_id])
+    return {"folders": len(ids), "files": deleted}
+
+
+def count_folder_files(client, old, new):
+    """Stand-in for the count_folder_files trigger in supabase_setup.sql."""
+    if old is not None and new is not None and (old.get("folder_id"), old.get("size")) == (new.get("folder_id"), new.get("size")):
+        return
+    folders = client.tables["file_folders"]
+    for row, sign in ((old, -1), (new, 1)):
+        folder = folders.rows.get(row.get("folder_id")) if row is not None else None
+        if folder is not None:
+            folder["file_count"] += sign
+            folder["byte_count"] += sign * int(row.get("size") or 0)
+
+
+def _usage_row(client, user_id):
+    usage = client.tables["user_usage"]
+    ids = usage.indexes["user_id"].get(user_id)
+    return usage.rows[next(iter(ids))] if ids else usage.insert({"user_id": user_id})
+
+
+def count_user_usage(client, table, old, new):
+    """Stand-in for the count_user_usage trigger in supabase_setup.sql."""
+    if old is not None and new is not None:
+        if table != "files" or old.get("size") == new.get("size"):
+            return
+        _usage_row(client, new["user_id"])["file_bytes"] += int(new.get("size") or 0) - int(old.get("size") or 0)
+        return
+    row, sign = (new, 1) if old is None else (old, -1)
+    usage = _usage_row(client, row["user_id"])
+    usage[USAGE_COUNTERS[table]] += sign
+    if table == "files":
+        usage["file_bytes"] += sign * int(row.get("size") or 0)
+
+
+def check_storage_quota(client, old, values):
+    """Stand-in for the quota check in the count_user_usage trigger."""
+    grown = int(values.get("size") or 0) - int((old or {}).get("size") or 0)
+    if "size" in values and grown > 0 and usage.QUOTA_BYTES > 0:
+        user_id = values.get("user_id") or old["user_id"]
+        if _usage_row(client, user_id)["file_bytes"] + grown > usage.QUOTA_BYTES:
+            raise APIError({"message": "Storage quota exceeded", "code": usage.QUOTA_EXCEEDED})
+    return values
+
+
+def reconcile_user_usage(client, p_after_id, p_limit):
+    """Stand-in for the reconcile_user_usage function in supabase_setup.sql."""
+    users = sorted(user_id for user_id in client.tables["users"].rows if p_after_id is None or user_id > p_after_id)
+    users = users[:p_limit]
+    fixed = 0
+    for user_id in users:
+        actual = dict.fromkeys(DEFAULTS["user_usage"], 0)
+        for table, counter in USAGE_COUNTERS.items():
+            rows = [client.tables[table].rows[i] for i in client.tables[table].indexes["user_id"].get(user_id, ())]
+            actual[counter] = len(rows)
+            if table == "files":
+                actual["file_bytes"] = sum(int(row.get("size") or 0) for row in rows)
+        usage = _usage_row(client, user_id)
+        if any(usage[counter] != value for counter, value in actual.items()):
+            usage.update(actual)
+            fixed += 1
+    return {"last_id": users[-1] if users else None, "checked": len(users), "fixed": fixed}
+
+
+def delete_file_preview(client, old, new):
+    """ON DELETE CASCADE from files to file_previews."""
+    if new is None:
+        previews = client.tables["file_previews"]
+        for i in list(previews.indexes["file_id"].get(old["id"], ())):
+            previews.delete(previews.rows[i])
+
+
+class FakeSupabase:
+    """Drop-in for supabase.Client backed by in-memory tables."""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.RLock()
+        self.tables = {name: FakeTable(name, *spec) for name, spec in SCHEMA.items()}
+        self.functions = {"register_user": register_user, "apply_note_patch": apply_note_patch,
+                          "add_click_rollups": add_click_rollups, "note_history_candidates": note_history_candidates,
+                          "backfill_todo_due_at": backfill_todo_due_at,
+                          "set_user_time_zone": set_user_time_zone, "file_folder_tree": file_folder_tree,
+                          "delete_file_folder": delete_file_folder, "reconcile_user_usage": reconcile_user_usage,
+                          "replication_lag": lambda client: 0.0}
+        self.tables["todos"].before_write.append(reset_todo_reminder)
+        self.tables["todos"].before_write.append(lambda old, values: set_todo_due_at(self, old, values))
+        self.tables["notes"].after_write.append(lambda old, new: record_note_revision(self, old, new))
+        self.tables["files"].before_write.append(lambda old, values: check_storage_quota(self, old, values))
+        self.tables["files"].after_write.append(lambda old, new: delete_file_preview(self, old, new))
+        self.tables["files"].after_write.append(lambda old, new: count_folder_files(self, old, new))
+        for table in USAGE_COUNTERS:
+            self.tables[table].after_write.append(lambda old, new, table=table: count_user_usage(self, table, old, new))
+        self.calls = 0
+        self.faults = None
+
+    def before_execute(self, query):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.faults:
+            self.faults(query)
+
+    def table(self, name):
+        if name not in self.tables:
+            raise APIError({"message": f'relation "public.{name}" does not exist', "code": "42P01"})
+        return FakeQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, **kwargs):
+        return FakeRPC(self, fn, params or {})
+
+    def register_function(self, name, handler):
+        """Register a Python stand-in for a Postgres function called via rpc()."""
+        self.functions[name] = handler
+
+    def add_table(self, name, uuid_pk=False, unique=(), indexed=()):
+        self.tables[name] = FakeTable(name, uuid_pk, unique, indexed)
+
+    def bulk_load(self, name, rows):
+        """Insert seed rows directly, skipping latency and per-call overhead."""
+        table = self.tables[name]
+        with self.lock:
+            for row in rows:
+                table.insert(row)
@@ -0,0 +1,123 @@
+# Browsing a folder of photos: full downloads against generated previews.
+#
+#   cd backend
+#   python -m benchmarks.file_previews --photos 40 --width 3000 --height 2000 --latency-ms 25
+#
+# Uploads --photos JPEGs and reports:
+#   - upload latency with previews rendered inline in the request and with
+#     the preview pool (the request only queues the job);
+#   - how long the pool takes to finish all previews;
+#   - the bytes and time to show the folder by fetching every file
+#     (GET /files/<id>, what the files page did) or every preview
+#     (GET /files/<id>/preview), and revalidating those with If-None-Match.
+#     Within max-age the browser sends no request for a preview at all.
+
+import argparse
+import base64
+import io
+import random
+import sys
+import time
+
+import file_previews
+import usage
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend, percentile
+
+
+def photo(rng, width, height):
+    from PIL import Image, ImageFilter
+    # Smoothed noise compresses about as badly as a real photo
+    small = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes(width // 8 * height // 8 * 3))
+    image = small.resize((width, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return base64.b64encode(out.getvalue()).decode()
+
+
+def inline_row(file_id, user_id, data):
+    status, mime_type, content = file_previews.render("image", data)
+    return {"file_id": file_id, "user_id": user_id, "status": status, "mime_type": mime_type,
+            "data": base64.b64encode(content).decode(), "digest": file_previews.digest(content)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="File previews against full downloads")
+    parser.add_argument("--photos", type=int, default=40)
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=file_previews.WORKERS)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    # Twice --photos full-size photos are stored, past the default quota
+    usage.QUOTA_BYTES = 0
+    client = FakeSupabase()
+    backend = load_backend(client)
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "owner", "email": "owner@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["owner"].copy().pop()
+    headers = auth_header(backend, user_id)
+    photos = [photo(rng, args.width, args.height) for _ in range(args.photos)]
+    client.latency = args.latency_ms / 1000.0
+
+    def upload(data, i):
+        body = {"name": f"photo-{i}.jpg", "type": "image", "mimeType": "image/jpeg", "size": len(data) * 3 // 4, "data": data}
+        started = time.perf_counter()
+        file_id = test_client.post("/files", headers=headers, json=body).get_json()["id"]
+        return file_id, time.perf_counter() - started
+
+    # Inline: the request renders and stores the preview itself
+    inline = []
+    backend.file_preview_generator = None
+    for i, data in enumerate(photos):
+        file_id, seconds = upload(data, i)
+        started = time.perf_counter()
+        backend.store_file_preview(inline_row(file_id, user_id, data))
+        inline.append(seconds + time.perf_counter() - started)
+
+    # The pool's processes start with the first upload, as in the app
+    generator = file_previews.PreviewGenerator(backend.store_file_preview, workers=args.workers)
+    backend.file_preview_generator = generator
+    pooled, ids = [], []
+    started = time.perf_counter()
+    for i, data in enumerate(photos):
+        file_id, seconds = upload(data, i)
+        ids.append(file_id)
+        pooled.append(seconds)
+    generator.shutdown()
+    drained = time.perf_counter() - started
+
+    def browse(path, etags=None):
+        total, started, tags = 0, time.perf_counter(), {}
+        for file_id in ids:
+            extra = {"If-None-Match": etags[file_id]} if etags and file_id in etags else {}
+            resp = test_client.get(path.format(file_id), headers=dict(headers, **extra))
+            total += len(resp.data)
+            if resp.headers.get("ETag"):
+                tags[file_id] = resp.headers["ETag"]
+        return total, time.perf_counter() - started, tags
+
+    full_bytes, full_seconds, _ = browse("/files/{}")
+    preview_bytes, preview_seconds, etags = browse("/files/{}/preview")
+    cached_bytes, cached_seconds, _ = browse("/files/{}/preview", etags)
+
+    print(f"\n{args.photos} photos of {args.width}x{args.height} "
+          f"({sum(len(p) for p in photos) * 3 // 4 / args.photos / 1024:.0f} KiB each), "
+          f"{args.latency_ms:g} ms per query, {args.workers} preview process(es)")
+    print(f"{'upload':<28}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, samples in (("preview rendered inline", inline), ("preview queued to the pool", pooled)):
+        print(f"{label:<28}{percentile(samples, 50) * 1000:>10.1f}{percentile(samples, 95) * 1000:>10.1f}")
+    print(f"pool finished all previews {drained:.2f} s after the first upload")
+    print(f"\n{'show the folder':<28}{'KiB':>12}{'ms':>10}")
+    for label, size, seconds in (("full files", full_bytes, full_seconds), ("previews", preview_bytes, preview_seconds),
+                                 ("previews, revalidated (304)", cached_bytes, cached_seconds)):
+        print(f"{label:<28}{size / 1024:>12.0f}{seconds * 1000:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Folder sizes on the files page: rebuilt in the browser against GET /file-folders/tree.
+#
+#   cd backend
+#   python -m benchmarks.folder_tree --folders 200 --files 2000 --file-kb 64 --latency-ms 25
+#
+# Fills one account with a folder tree (--depth levels) and --files files
+# spread over it, then reports bytes, queries and time for the two ways to
+# show every folder with its file count and size: GET /file-folders plus
+# GET /files (every file row, data included) summed up client-side, and
+# GET /file-folders/tree, whose counts the trigger on files keeps. Also times
+# DELETE /file-folders on the largest root folder, which removes its whole
+# subtree in one call.
+
+import argparse
+import base64
+import random
+import sys
+import time
+
+import folder_tree
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend
+
+
+def client_side_sizes(folders, files):
+    """What the files page had to do: sum every file into its folders."""
+    by_folder = {}
+    for row in files:
+        count, size = by_folder.get(row.get("folder_id"), (0, 0))
+        by_folder[row.get("folder_id")] = (count + 1, size + (row.get("size") or 0))
+    rows = [dict(folder, file_count=by_folder.get(folder["id"], (0, 0))[0],
+                 byte_count=by_folder.get(folder["id"], (0, 0))[1]) for folder in folders]
+    return folder_tree.walk(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Folder sizes client-side against GET /file-folders/tree")
+    parser.add_argument("--folders", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-kb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase()
+    backend = load_backend(client)
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "owner", "email": "owner@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["owner"].copy().pop()
+    headers = auth_header(backend, user_id)
+
+    levels = [[None]]
+    for i in range(args.folders):
+        depth = min(1 + i * args.depth // args.folders, args.depth)
+        parent = rng.choice(levels[depth - 1])
+        folder_id = test_client.post("/file-folders", headers=headers,
+                                     json={"name": f"Folder {i}", "parent_id": parent}).get_json()["id"]
+        if len(levels) <= depth:
+            levels.append([])
+        levels[depth].append(folder_id)
+    folder_ids = [folder_id for level in levels[1:] for folder_id in level]
+    blob = base64.b64encode(rng.randbytes(args.file_kb * 1024)).decode()
+    client.bulk_load("files", ({"user_id": user_id, "name": f"file-{i}.bin", "type": "file", "size": args.file_kb * 1024,
+                                "data": blob, "folder_id": rng.choice(folder_ids)} for i in range(args.files)))
+    client.latency = args.latency_ms / 1000.0
+
+    def timed(*paths):
+        started = time.perf_counter()
+        responses = [test_client.get(path, headers=headers) for path in paths]
+        seconds = time.perf_counter() - started
+        return (responses, sum(len(r.data) for r in responses),
+                sum(int(r.headers.get("X-Query-Count", 0)) for r in responses), seconds)
+
+    (folders, files), old_bytes, old_queries, old_seconds = timed("/file-folders", "/files")
+    started = time.perf_counter()
+    expected = client_side_sizes(folders.get_json(), files.get_json())
+    old_seconds += time.perf_counter() - started
+    (tree,), tree_bytes, tree_queries, tree_seconds = timed("/file-folders/tree")
+
+    flat = []
+    stack = list(tree.get_json())
+    while stack:
+        node = stack.pop()
+        flat.append(node)
+        stack.extend(node["children"])
+    totals = {row["id"]: (row["total_files"], row["total_bytes"]) for row in expected}
+    assert all(totals[node["id"]] == (node["total_files"], node["total_bytes"]) for node in flat)
+
+    root = max(levels[1], key=lambda folder_id: len(folder_tree.subtree_ids(
+        list(client.tables["file_folders"].rows.values()), folder_id)))
+    started = time.perf_counter()
+    resp = test_client.delete(f"/file-folders/{root}", headers=headers)
+    delete_ms = (time.perf_counter() - started) * 1000
+    deleted = resp.get_json()
+
+    print(f"\n{args.folders} folders up to {args.depth} deep, {args.files} files of {args.file_kb} KiB, "
+          f"{args.latency_ms:g} ms per query")
+    print(f"{'folder sizes':<34}{'KiB':>12}{'queries':>9}{'ms':>10}")
+    print(f"{'GET /file-folders + GET /files':<34}{old_bytes / 1024:>12.0f}{old_queries:>9}{old_seconds * 1000:>10.0f}")
+    print(f"{'GET /file-folders/tree':<34}{tree_bytes / 1024:>12.0f}{tree_queries:>9}{tree_seconds * 1000:>10.0f}")
+    print(f"\nDELETE /file-folders/<root>: {deleted['folders']} folders, {deleted['files']} files, "
+          f"{resp.headers.get('X-Query-Count')} query, {delete_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
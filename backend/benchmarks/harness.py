@@ -0,0 +1,240 @@
+# Shared helpers for the benchmark scripts: loading the Flask app and the
+# Cloudflare worker against the in-memory stand-in, timing requests, and
+# comparing results with a saved baseline.
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+
+
+def load_backend(client):
+    """Import backend/app.py with `client` in place of the Supabase client."""
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_KEY", "bench-key")
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    # The reports read X-Query-Count and the traced payload sizes
+    os.environ["TRACE_DEBUG"] = "1"
+    os.environ.setdefault("NOTE_HISTORY_COMPACT_INTERVAL", "0")
+    os.environ.setdefault("USAGE_RECONCILE_INTERVAL", "0")
+    # Its build thread would scan the real client; benchmarks that want the
+    # filter build one against the stand-in
+    os.environ.setdefault("ALIAS_FILTER", "0")
+    # Likewise the preview pool, whose processes would compete with the run
+    os.environ.setdefault("FILE_PREVIEWS", "0")
+    os.environ.setdefault("SMTP_HOST", "localhost")
+    os.environ.setdefault("SMTP_USER", "bench")
+    os.environ.setdefault("SMTP_PASSWORD", "bench")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import app as backend
+    # Wrapped as app.py wraps the real client
+    backend.supabase = backend.wrap_client(client)
+    # Reminder scans are measured without talking to an SMTP server
+    backend.send_reminder_email = lambda to_email, title, due: True
+    return backend
+
+
+def auth_header(backend, user_id):
+    import jwt
+    from datetime import datetime, timedelta
+    token = jwt.encode({"user_id": user_id, "username": "bench", "exp": datetime.utcnow() + timedelta(days=1)},
+                       backend.app.config["SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+class WorkerResponse:
+    """Minimal stand-in for the Workers `js.Response` object."""
+
+    def __init__(self, body="", status=200, headers=None, mimetype=None):
+        self.body = body
+        self.status = status
+        self.headers = dict(headers or {})
+        if mimetype:
+            self.headers["Content-Type"] = mimetype
+
+    @classmethod
+    def redirect(cls, url, status=302):
+        return cls("", status=status, headers={"Location": url})
+
+
+class WorkerRequest:
+    def __init__(self, method, path, headers=None, params=None, body=None, host="http://localhost"):
+        self.method = method
+        self.path = path
+        self.headers = dict(headers or {})
+        self.params = dict(params or {})
+        self.url = host + path
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+
+class LocalKV:
+    """Dict-backed stand-in for a Workers KV namespace (get/put/delete).
+
+    Each call sleeps `latency_ms`, like a read from the nearest KV location.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.values = {}
+        self.calls = 0
+
+    async def _wait(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, key):
+        await self._wait()
+        value, expires = self.values.get(key, (None, None))
+        if expires is not None and expires <= time.time():
+            self.values.pop(key, None)
+            return None
+        return value
+
+    async def put(self, key, value, expirationTtl=None):
+        await self._wait()
+        self.values[key] = (value, time.time() + expirationTtl if expirationTtl else None)
+
+    async def delete(self, key):
+        await self._wait()
+        self.values.pop(key, None)
+
+
+def load_worker(client):
+    """Import worker.py with a stand-in for the Pyodide `js` module."""
+    if "js" not in sys.modules:
+        js = types.ModuleType("js")
+        js.Response = WorkerResponse
+        sys.modules["js"] = js
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import worker
+    worker.supabase = client
+    return worker
+
+
+class WorkerContext:
+    """Stand-in for the Workers ExecutionContext."""
+
+    def __init__(self):
+        self.pending = []
+
+    def waitUntil(self, awaitable):
+        self.pending.append(awaitable)
+
+
+def call_worker(worker, request, env=None):
+    loop = getattr(_worker_loop, "loop", None)
+    if loop is None:
+        loop = _worker_loop.loop = asyncio.new_event_loop()
+    ctx = WorkerContext()
+    response = loop.run_until_complete(worker.on_fetch(request, env, ctx))
+    # waitUntil work runs after the response, as on Workers
+    if ctx.pending:
+        loop.run_until_complete(asyncio.gather(*ctx.pending))
+    return response
+
+
+_worker_loop = threading.local()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def run_plan(plan, execute, concurrency):
+    """Run `execute(op, arg)` for every (op, arg) in plan.
+
+    `execute` returns (status, queries). Returns a list of samples and the
+    wall-clock time of the whole run.
+    """
+    samples = []
+    lock = threading.Lock()
+
+    def one(item):
+        op, arg = item
+        started = time.perf_counter()
+        status, queries = execute(op, arg)
+        elapsed = time.perf_counter() - started
+        with lock:
+            samples.append((op, elapsed, status, queries))
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for item in plan:
+            one(item)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, plan))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall_time):
+    by_op = {}
+    for op, elapsed, status, queries in samples:
+        by_op.setdefault(op, []).append((elapsed, status, queries))
+    by_op["all"] = [(e, s, q) for _, e, s, q in samples]
+    results = {}
+    for op, rows in by_op.items():
+        latencies = [r[0] for r in rows]
+        queries = [r[2] for r in rows if r[2] is not None]
+        results[op] = {
+            "requests": len(rows),
+            "errors": sum(1 for r in rows if r[1] >= 500),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "throughput_rps": round(len(rows) / wall_time, 1) if wall_time else 0.0,
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return results
+
+
+def print_report(title, results):
+    print(f"\n{title}")
+    print(f"{'operation':<18}{'reqs':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'q/req':>7}")
+    for op, r in sorted(results.items(), key=lambda kv: (kv[0] == "all", kv[0])):
+        qpr = "-" if r["queries_per_request"] is None else f"{r['queries_per_request']:.1f}"
+        print(f"{op:<18}{r['requests']:>7}{r['errors']:>5}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['throughput_rps']:>10.1f}{qpr:>7}")
+
+
+def save_baseline(path, config, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "results": results}, f, indent=2, sort_keys=True)
+    print(f"\nBaseline saved to {path}")
+
+
+def compare_baseline(path, results, tolerance):
+    """Return a list of regressions against the baseline file."""
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {current['p95_ms']:.2f} ms > baseline {base['p95_ms']:.2f} ms")
+        if base.get("queries_per_request") is not None and current.get("queries_per_request") is not None \
+                and current["queries_per_request"] > base["queries_per_request"]:
+            regressions.append(f"{key}: {current['queries_per_request']} queries/request > baseline "
+                               f"{base['queries_per_request']}")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{key}: {current['errors']} errors > baseline {base['errors']}")
+    return regressions
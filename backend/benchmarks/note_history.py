@@ -0,0 +1,72 @@
+# Revision storage and read cost for note history.
+#
+#   cd backend
+#   python -m benchmarks.note_history --note-kb 100 --edits 500 --reads 200 --latency-ms 25
+#
+# Makes many small edits to one note, then reports the bytes kept in
+# note_revisions against storing every version in full, and the latency of
+# GET /notes/<id>/revisions/<version> for random versions.
+
+import argparse
+import random
+import sys
+import time
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend, print_report, summarize
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Note history: storage and reconstruction time")
+    parser.add_argument("--note-kb", type=int, default=100)
+    parser.add_argument("--edits", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase()
+    backend = load_backend(client)
+    import note_history
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "writer", "email": "writer@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["writer"].copy().pop()
+    headers = auth_header(backend, user_id)
+
+    content = ("<p>" + "lorem ipsum dolor sit amet " * 36 + "</p>") * (args.note_kb * 1024 // 1000)
+    note_id = test_client.post("/notes", headers=headers, json={
+        "notebook_id": 1, "title": "Journal", "content": content}).get_json()["id"]
+    versions = {1: content}
+    full_bytes = len(content.encode())
+    for _ in range(args.edits):
+        pos = rng.randrange(len(content))
+        content = content[:pos] + "edited" + content[pos + rng.randrange(10):]
+        version = test_client.put(f"/notes/{note_id}", headers=headers, json={"content": content}).get_json()["version"]
+        versions[version] = content
+        full_bytes += len(content.encode())
+
+    revisions = client.tables["note_revisions"].rows.values()
+    stored_bytes = sum(len((r["payload"] or "").encode()) for r in revisions)
+    snapshots = sum(1 for r in revisions if r["chain"] == 0)
+
+    # Reads pay the simulated round trip, writes above did not
+    client.latency = args.latency_ms / 1000.0
+    samples = []
+    for version in rng.choices(list(versions), k=args.reads):
+        started = time.perf_counter()
+        resp = test_client.get(f"/notes/{note_id}/revisions/{version}", headers=headers)
+        samples.append(("get_revision", time.perf_counter() - started, resp.status_code,
+                        int(resp.headers.get("X-Query-Count", 0))))
+        assert resp.get_json()["content"] == versions[version], f"version {version} rebuilt wrong"
+
+    print_report(f"Revision reads, {args.note_kb} KB note ({args.latency_ms:g} ms per query)",
+                 summarize(samples, sum(sample[1] for sample in samples)))
+    print(f"{len(versions)} versions, {snapshots} snapshots (every {note_history.SNAPSHOT_EVERY})")
+    print(f"full copies   {full_bytes / 1024:>10.1f} KB")
+    print(f"revisions     {stored_bytes / 1024:>10.1f} KB  ({full_bytes / max(stored_bytes, 1):.1f}x smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
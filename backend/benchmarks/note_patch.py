@@ -0,0 +1,74 @@
+# Autosave cost on large notes: full-content PUT against PATCH with a diff.
+#
+#   cd backend
+#   python -m benchmarks.note_patch --note-kb 500 --saves 200 --latency-ms 25
+#
+# Each save types a few characters at a random spot, like an autosave tick.
+# Reports request bytes on the wire and latency for both paths.
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from text_patch import diff_ops
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend, print_report, summarize
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Note autosave: PUT vs PATCH")
+    parser.add_argument("--note-kb", type=int, default=500)
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase(latency_ms=args.latency_ms)
+    backend = load_backend(client)
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "writer", "email": "writer@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["writer"].copy().pop()
+    headers = auth_header(backend, user_id)
+
+    text = ("<p>" + "lorem ipsum dolor sit amet " * 36 + "</p>") * (args.note_kb * 1024 // 1000)
+    results = {}
+    for mode in ("put", "patch"):
+        note_id = test_client.post("/notes", headers=headers, json={
+            "notebook_id": 1, "title": "Big note", "content": text}).get_json()["id"]
+        content, version = text, 1
+        samples, wire = [], 0
+        for _ in range(args.saves):
+            pos = rng.randrange(len(content))
+            new_content = content[:pos] + "typed" + content[pos:]
+            if mode == "put":
+                body = {"title": "Big note", "content": new_content}
+            else:
+                body = {"base_version": version, "ops": diff_ops(content, new_content)}
+            payload = json.dumps(body)
+            wire += len(payload.encode())
+            started = time.perf_counter()
+            resp = test_client.open(f"/notes/{note_id}", method=mode.upper(), headers=headers,
+                                    data=payload, content_type="application/json")
+            samples.append((mode, time.perf_counter() - started, resp.status_code,
+                            int(resp.headers.get("X-Query-Count", 0))))
+            version = resp.get_json().get("version", version)
+            content = new_content
+        # Throughput over time spent in requests, not in building the diffs
+        summary = summarize(samples, sum(sample[1] for sample in samples))
+        summary[mode]["request_kb_per_save"] = round(wire / args.saves / 1024, 2)
+        results[mode] = summary[mode]
+        stored = client.tables["notes"].rows[note_id]["content"]
+        assert stored == content, f"{mode}: stored content diverged"
+
+    print_report(f"Autosave of a {args.note_kb} KB note ({args.latency_ms:g} ms per query)", results)
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['request_kb_per_save']:>10.2f} KB request body per save")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
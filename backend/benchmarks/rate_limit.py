@@ -0,0 +1,122 @@
+# Rate limiter backends: shared buckets under contention, and idle buckets.
+#
+#   cd backend
+#   pip install fakeredis lupa
+#   python -m benchmarks.rate_limit --workers 4 --threads 8 --capacity 100 --latency-ms 1 --callers 100000
+#
+# Shared store: --workers RedisBackend instances (one per simulated worker
+# process, each with its own connection) spend one bucket of --capacity
+# tokens from --threads threads each, once with the old read-then-write take
+# and once with rate_limit.TAKE_SCRIPT, and report how many requests got
+# through; anything over --capacity is budget the race gave away. The store is
+# an in-process fakeredis server, where each command waits --latency-ms like a
+# round trip to Redis, or the Redis at --redis-url.
+#
+# Memory: --callers distinct IPs send one request each, then the bucket count
+# is reported before and after the sweep that follows their refill.
+
+import argparse
+import math
+import sys
+import threading
+import time
+import uuid
+
+import rate_limit
+
+
+class ReadThenWriteBackend(rate_limit.RedisBackend):
+    """The take the Redis backend used before the script: HMGET, then HSET."""
+
+    def take(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        rkey = self.prefix + key
+        tokens, updated = self.client.hmget(rkey, "tokens", "updated")
+        tokens = capacity if tokens is None else float(tokens)
+        updated = now if updated is None else float(updated)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.client.hset(rkey, mapping={"tokens": tokens, "updated": now})
+        self.client.pexpire(rkey, int(math.ceil(capacity / rate * 1000)) + 1000)
+        return (True, 0.0) if allowed else (False, (1 - tokens) / rate)
+
+
+def connect(args):
+    """A function returning a new connection to one shared store."""
+    if args.redis_url:
+        import redis
+        return lambda: redis.Redis.from_url(args.redis_url)
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("Install fakeredis and lupa (pip install fakeredis lupa), or pass --redis-url")
+    latency = args.latency_ms / 1000.0
+
+    class Connection(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            time.sleep(latency)
+            return super().execute_command(*args, **kwargs)
+
+    server = fakeredis.FakeServer()
+    return lambda: Connection(server=server)
+
+
+def contended(backend_class, connection, args):
+    """Requests let through when every thread spends the same bucket at once."""
+    backends = [backend_class(connection()) for _ in range(args.workers)]
+    key = f"bench:{uuid.uuid4().hex}"
+    # Slow enough that nothing refills during the run
+    rate = args.capacity / 3600.0
+    tries = args.capacity * 2 // (args.workers * args.threads) + 1
+    allowed = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.workers * args.threads)
+
+    def spend(backend):
+        barrier.wait()
+        mine = sum(backend.take(key, args.capacity, rate)[0] for _ in range(tries))
+        with lock:
+            allowed.append(mine)
+
+    threads = [threading.Thread(target=spend, args=(backend,)) for backend in backends for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(allowed), len(threads) * tries, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rate limiter backends under contention")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--callers", type=int, default=100000)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--redis-url", default="")
+    args = parser.parse_args(argv)
+
+    connection = connect(args)
+    print(f"\nOne bucket of {args.capacity}, {args.workers} workers x {args.threads} threads")
+    print(f"{'take':<18}{'requests':>10}{'allowed':>9}{'over':>6}{'ms':>8}")
+    for label, backend_class in (("read then write", ReadThenWriteBackend), ("script", rate_limit.RedisBackend)):
+        allowed, requests, seconds = contended(backend_class, connection, args)
+        print(f"{label:<18}{requests:>10}{allowed:>9}{max(0, allowed - args.capacity):>6}{seconds * 1000:>8.0f}")
+
+    memory = rate_limit.MemoryBackend()
+    capacity, rate = rate_limit.DEFAULT_BUDGET
+    now = time.time()
+    for i in range(args.callers):
+        memory.take(f"list_todos:ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", capacity, rate, now)
+    before = len(memory)
+    # The next request after they have all refilled triggers the sweep
+    memory.take("list_todos:ip:127.0.0.1", capacity, rate, now + max(capacity / rate, memory._sweep_seconds))
+    print(f"\nMemory backend: {before} buckets after {args.callers} callers, {len(memory)} after they refilled")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
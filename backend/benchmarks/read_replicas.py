@@ -0,0 +1,180 @@
+# Read replicas: list and redirect reads spread over replicas, writes on the primary.
+#
+#   cd backend
+#   python -m benchmarks.read_replicas --users 1000 --threads 32 --requests 3000 --replicas 2 --slots 4 --latency-ms 25
+#
+# Every server (the primary and each replica) is a stand-in that answers
+# --slots queries at a time, --latency-ms each, like a connection pool in
+# front of a busy database. --threads clients send a mix of list reads,
+# /s/<alias> redirects and todo inserts (--writes of them), first against the primary
+# alone and then with --replicas replicas; reports requests per second,
+# p50/p95 latency and the queries each server answered. Then checks
+# read-your-writes against replicas that never receive the writes (each user
+# creates a todo and lists todos at once, with and without stickiness), and
+# that reads return to the primary when the replicas report too much lag.
+
+import argparse
+import copy
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import replicas
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend
+
+READS = ("/todos", "/notes", "/files", "/short-urls")
+
+
+class Server(FakeSupabase):
+    """Stand-in that answers `slots` queries at a time."""
+
+    def __init__(self, latency_ms, slots):
+        super().__init__(latency_ms)
+        self.slots = threading.Semaphore(slots)
+        self.lag = 0.0
+        self.functions["replication_lag"] = lambda client: self.lag
+
+    def before_execute(self, query):
+        with self.slots:
+            super().before_execute(query)
+
+
+def replica_of(primary, latency_ms, slots, snapshot=False):
+    """A replica with the primary's data, or a copy of it that never catches up."""
+    replica = Server(latency_ms, slots)
+    replica.tables = copy.deepcopy(primary.tables) if snapshot else primary.tables
+    replica.lock = replica.lock if snapshot else primary.lock
+    return replica
+
+
+def fill(primary, backend, args):
+    users = []
+    for i in range(args.users):
+        user_id = str(uuid.UUID(int=i + 1))
+        primary.bulk_load("users", [{"id": user_id, "username": f"user{i}", "email": f"user{i}@example.com",
+                                     "password": "x"}])
+        primary.bulk_load("todos", ({"user_id": user_id, "title": f"Task {n}", "priority": "Low"} for n in range(50)))
+        primary.bulk_load("notes", ({"user_id": user_id, "title": f"Note {n}", "notebook_id": 1, "content": "x" * 200}
+                                    for n in range(20)))
+        primary.bulk_load("files", ({"user_id": user_id, "name": f"file-{n}", "type": "file", "size": 100}
+                                    for n in range(10)))
+        primary.bulk_load("short_urls", ({"user_id": user_id, "original_url": "https://example.com",
+                                          "alias": f"u{i}a{n}", "short_url": f"https://x/s/u{i}a{n}"}
+                                         for n in range(10)))
+        users.append((user_id, auth_header(backend, user_id)))
+    return users
+
+
+def load(backend, users, args, seed):
+    """Requests per second and latencies of the mixed workload."""
+    rng = random.Random(seed)
+    plan = []
+    for _ in range(args.requests):
+        i = rng.randrange(len(users))
+        roll = rng.random()
+        if roll < args.writes:
+            plan.append(("post", "/todos", users[i][1]))
+        elif roll < args.writes + 0.3:
+            plan.append(("get", f"/s/u{i}a{rng.randrange(10)}", {}))
+        else:
+            plan.append(("get", rng.choice(READS), users[i][1]))
+    local = threading.local()
+
+    def send(step):
+        method, path, headers = step
+        if not hasattr(local, "client"):
+            # Threads stand for many users, so no cookie is carried between them
+            local.client = backend.app.test_client(use_cookies=False)
+        started = time.perf_counter()
+        if method == "post":
+            resp = local.client.post(path, headers=headers, json={"title": "New task", "priority": "High"})
+        else:
+            resp = local.client.get(path, headers=headers)
+        assert resp.status_code in (200, 201, 302), (path, resp.status_code)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = sorted(pool.map(send, plan))
+    seconds = time.perf_counter() - started
+    return {"rps": len(plan) / seconds, "p50": statistics.median(latencies) * 1000,
+            "p95": latencies[int(len(latencies) * 0.95)] * 1000}
+
+
+def read_your_writes(backend, users):
+    """Users whose todo was missing from the list they loaded right after creating it."""
+    missing = 0
+    for _, headers in users:
+        # A new client per user: no cookie, so only the in-process record helps
+        test_client = backend.app.test_client()
+        title = f"Fresh {random.random()}"
+        test_client.post("/todos", headers=headers, json={"title": title, "priority": "High"})
+        listed = test_client.get("/todos", headers=headers).get_json()
+        missing += not any(todo["title"] == title for todo in listed)
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List reads on read replicas against the primary alone")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--writes", type=float, default=0.05, help="share of requests that add a todo")
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--slots", type=int, default=4, help="queries each server answers at a time")
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    primary = Server(0, args.slots)
+    backend = load_backend(primary)
+    users = fill(primary, backend, args)
+    primary.latency = args.latency_ms / 1000.0
+
+    results = []
+    for count in (0, args.replicas):
+        servers = [replica_of(primary, args.latency_ms, args.slots) for _ in range(count)]
+        backend.supabase = backend.wrap_client(replicas.RoutedClient(primary, servers))
+        calls = primary.calls
+        result = load(backend, users, args, args.seed)
+        result["queries"] = [primary.calls - calls] + [server.calls for server in servers]
+        results.append((count, result))
+
+    # Replicas frozen at this point: only stickiness shows users their new todo
+    snapshots = [replica_of(primary, 0, args.slots, snapshot=True) for _ in range(args.replicas)]
+    primary.latency = 0
+    backend.supabase = backend.wrap_client(replicas.RoutedClient(primary, snapshots))
+    sticky = read_your_writes(backend, users)
+    replicas.STICKY_SECONDS, saved = 0, replicas.STICKY_SECONDS
+    unsticky = read_your_writes(backend, users)
+    replicas.STICKY_SECONDS = saved
+
+    # Replicas too far behind: after the next lag check reads use the primary
+    for server in snapshots:
+        server.lag = replicas.MAX_LAG_SECONDS * 5
+    replicas.LAG_CHECK_SECONDS = 0
+    calls = primary.calls
+    test_client = backend.app.test_client()
+    for _, headers in users:
+        test_client.get("/notes", headers=headers)
+    lagging = primary.calls - calls
+
+    print(f"\n{args.requests} requests from {args.threads} threads, {args.slots} queries at a time per server, "
+          f"{args.latency_ms:g} ms per query")
+    print(f"{'replicas':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}  queries (primary, replicas)")
+    for count, r in results:
+        print(f"{count:>9}{r['rps']:>10.0f}{r['p50']:>10.1f}{r['p95']:>10.1f}  {', '.join(map(str, r['queries']))}")
+    print(f"\nRead-your-writes with stale replicas: {sticky}/{len(users)} users missed their new todo with "
+          f"stickiness, {unsticky}/{len(users)} without")
+    print(f"Replicas {replicas.MAX_LAG_SECONDS * 5:g}s behind: {lagging}/{len(users)} note lists read the primary")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# Worker redirects through the memory -> KV -> Supabase lookup tiers.
+#
+#   cd backend
+#   python -m benchmarks.redirect_cache --links 2000 --requests 5000 --isolates 8 --latency-ms 25 --kv-latency-ms 3
+#
+# Sends the same redirects (popular links get most traffic, one in ten aliases
+# does not exist) round-robin across --isolates simulated isolates, each with
+# its own memory tier, with no cache, KV only, and memory + KV. Reports latency
+# and queries per redirect, and each tier's hit ratio and mean lookup time.
+
+import argparse
+import random
+import sys
+import types
+
+from .fake_supabase import FakeSupabase
+from .harness import LocalKV, WorkerRequest, call_worker, load_worker, print_report, run_plan, summarize
+
+CONFIGS = {
+    "no_cache": (False, False),
+    "kv": (False, True),
+    "memory+kv": (True, True),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker redirects with tiered lookups")
+    parser.add_argument("--links", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--isolates", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=25.0, help="round trip to Supabase")
+    parser.add_argument("--kv-latency-ms", type=float, default=3.0, help="read from the nearest KV location")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase()
+    worker = load_worker(client)
+    aliases = [f"link-{i}" for i in range(args.links)]
+    client.table("short_urls").insert([{
+        "user_id": 1, "original_url": f"https://example.com/{alias}", "alias": alias,
+        "short_url": f"http://localhost/s/{alias}", "title": "Untitled", "clicks": 0,
+    } for alias in aliases]).execute()
+    client.latency = args.latency_ms / 1000.0
+
+    weights = [1 / (rank + 1) for rank in range(len(aliases))]
+    plan = [f"missing-{rng.randrange(10**9)}" if rng.random() < 0.1 else alias
+            for alias in rng.choices(aliases, weights=weights, k=args.requests)]
+    memory_ttl = worker.REDIRECT_MEMORY_TTL
+
+    results = {}
+    tiers = {}
+    for name, (use_memory, use_kv) in CONFIGS.items():
+        worker.metrics = worker.WorkerMetrics()
+        worker.REDIRECT_MEMORY_TTL = memory_ttl if use_memory else 0
+        env = types.SimpleNamespace(REDIRECTS=LocalKV(args.kv_latency_ms)) if use_kv else None
+        isolates = [({}, worker.OrderedDict()) for _ in range(args.isolates)]
+        counter = iter(range(len(plan)))
+
+        def execute(op, alias):
+            worker.missing_aliases, worker.redirect_memory = isolates[next(counter) % len(isolates)]
+            before = client.calls
+            resp = call_worker(worker, WorkerRequest("GET", f"/s/{alias}"), env)
+            return resp.status, client.calls - before
+
+        samples, wall = run_plan([(name, alias) for alias in plan], execute, 1)
+        results.update(summarize(samples, wall))
+        tiers[name] = {tier: (worker.metrics.hit_ratio(tier), total / count * 1000, count)
+                       for tier, (_, total, count) in worker.metrics.cache_latency.items()}
+    results.pop("all")
+    worker.REDIRECT_MEMORY_TTL = memory_ttl
+
+    print_report(f"Redirects, {args.isolates} isolates ({args.latency_ms:g} ms database, "
+                 f"{args.kv_latency_ms:g} ms KV)", results)
+    print(f"\n{'config':<12}{'tier':<10}{'lookups':>9}{'hit ratio':>11}{'mean ms':>9}")
+    for name, by_tier in tiers.items():
+        for tier in ("memory", "kv", "database"):
+            if tier in by_tier:
+                ratio, mean_ms, count = by_tier[tier]
+                print(f"{name:<12}{tier:<10}{count:>9}{ratio:>11.1%}{mean_ms:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
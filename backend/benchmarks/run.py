@@ -0,0 +1,170 @@
+# Mixed-workload benchmark for backend/app.py and the worker.py router.
+#
+#   cd backend
+#   python -m benchmarks.run --scale 0.01 --requests 2000 --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run --scale 0.01 --requests 2000 --baseline benchmarks/baseline.json
+#
+# The second command exits non-zero when p95 latency, queries per request or
+# error counts regress beyond --tolerance.
+
+import argparse
+import base64
+import random
+import sys
+
+from .fake_supabase import FakeSupabase
+from .harness import (
+    WorkerRequest, auth_header, call_worker, compare_baseline, load_backend,
+    load_worker, print_report, run_plan, save_baseline, summarize,
+)
+from .seed import seed
+
+# Relative weights of each operation in the mixed workload
+MIX = {
+    "redirect": 50,
+    "list_todos": 15,
+    "list_notes": 10,
+    "list_files": 5,
+    "get_note": 10,
+    "add_todo": 5,
+    "upload": 4,
+    "reminder_scan": 1,
+}
+WORKER_MIX = {"redirect": 60, "list_todos": 20, "list_notes": 20}
+UPLOAD_BYTES = 256 * 1024
+
+
+def build_plan(mix, count, data, rng):
+    ops = list(mix)
+    weights = [mix[op] for op in ops]
+    plan = []
+    for op in rng.choices(ops, weights=weights, k=count):
+        if op == "redirect":
+            # One in five redirects is for an alias that does not exist
+            arg = rng.choice(data["aliases"]) if rng.random() < 0.8 else f"missing{rng.randrange(10**9)}"
+        elif op == "get_note":
+            arg = (rng.choice(data["user_ids"]), rng.randrange(1, data["counts"]["notes"] + 1))
+        else:
+            arg = rng.choice(data["user_ids"])
+        plan.append((op, arg))
+    return plan
+
+
+def backend_executor(backend):
+    import threading
+    local = threading.local()
+    headers = {}
+    upload_body = base64.b64encode(b"u" * UPLOAD_BYTES).decode()
+
+    def auth(user_id):
+        if user_id not in headers:
+            headers[user_id] = auth_header(backend, user_id)
+        return headers[user_id]
+
+    def execute(op, arg):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = backend.app.test_client()
+        if op == "redirect":
+            resp = client.get(f"/s/{arg}")
+        elif op == "list_todos":
+            resp = client.get("/todos", headers=auth(arg))
+        elif op == "list_notes":
+            resp = client.get("/notes", headers=auth(arg))
+        elif op == "list_files":
+            resp = client.get("/files", headers=auth(arg))
+        elif op == "get_note":
+            user_id, note_id = arg
+            resp = client.get(f"/notes/{note_id}", headers=auth(user_id))
+        elif op == "add_todo":
+            resp = client.post("/todos", headers=auth(arg), json={
+                "title": "bench", "priority": "Low", "due_date": "2030-01-01", "due_time": "12:00"})
+        elif op == "upload":
+            resp = client.post("/files", headers=auth(arg), json={
+                "name": "bench.bin", "type": "document", "mimeType": "application/octet-stream",
+                "size": UPLOAD_BYTES, "data": upload_body})
+        elif op == "reminder_scan":
+            resp = client.post("/check-reminders")
+        else:
+            raise ValueError(op)
+        queries = resp.headers.get("X-Query-Count")
+        return resp.status_code, int(queries) if queries is not None else None
+
+    return execute
+
+
+def worker_executor(worker, client, secret_headers):
+    def execute(op, arg):
+        before = client.calls
+        if op == "redirect":
+            resp = call_worker(worker, WorkerRequest("GET", f"/s/{arg}"))
+        elif op == "list_todos":
+            resp = call_worker(worker, WorkerRequest("GET", "/todos", headers=secret_headers(arg)))
+        elif op == "list_notes":
+            resp = call_worker(worker, WorkerRequest("GET", "/notes", headers=secret_headers(arg)))
+        else:
+            raise ValueError(op)
+        return resp.status, client.calls - before
+
+    return execute
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mixed-workload benchmark against the in-memory Supabase stand-in")
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of full data volume to seed")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated round trip per query")
+    parser.add_argument("--target", choices=("backend", "worker", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", help="fail if results regress against this file")
+    parser.add_argument("--save-baseline", help="write results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown, as a fraction")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase(latency_ms=args.latency_ms)
+    print(f"Seeding stand-in at scale {args.scale} ...")
+    data = seed(client, args.scale, args.seed)
+    print("Seeded " + ", ".join(f"{count} {name}" for name, count in data["counts"].items()))
+
+    results = {}
+    if args.target in ("backend", "both"):
+        backend = load_backend(client)
+        plan = build_plan(MIX, args.requests, data, rng)
+        samples, wall = run_plan(plan, backend_executor(backend), args.concurrency)
+        summary = summarize(samples, wall)
+        print_report("backend/app.py", summary)
+        results.update({f"backend.{op}": r for op, r in summary.items()})
+
+    if args.target in ("worker", "both"):
+        worker = load_worker(client)
+        import jwt
+
+        def secret_headers(user_id):
+            token = jwt.encode({"user_id": user_id}, worker.SECRET_KEY, algorithm="HS256")
+            return {"Authorization": f"Bearer {token}"}
+
+        plan = build_plan(WORKER_MIX, args.requests, data, rng)
+        # The worker runs one request at a time per isolate
+        samples, wall = run_plan(plan, worker_executor(worker, client, secret_headers), 1)
+        summary = summarize(samples, wall)
+        print_report("worker.py", summary)
+        results.update({f"worker.{op}": r for op, r in summary.items()})
+
+    config = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline")}
+    if args.save_baseline:
+        save_baseline(args.save_baseline, config, results)
+    if args.baseline:
+        regressions = compare_baseline(args.baseline, results, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
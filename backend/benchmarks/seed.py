@@ -0,0 +1,105 @@
+# Deterministic seed data for the benchmark stand-in.
+#
+# Full scale matches the volumes we plan for: 10k users, 1M todos, 100k notes,
+# 20k files (a slice of them multi-megabyte) and 50k short links. Use a
+# smaller --scale for quick local runs.
+
+import base64
+import random
+from datetime import datetime, timedelta
+
+
+FULL_SCALE = {
+    "users": 10_000,
+    "todos": 1_000_000,
+    "notes": 100_000,
+    "files": 20_000,
+    "short_urls": 50_000,
+}
+LARGE_FILE_EVERY = 200
+LARGE_FILE_BYTES = 2 * 1024 * 1024
+SMALL_FILE_BYTES = 4 * 1024
+NOTE_BYTES = 2 * 1024
+PASSWORD_HASH = "pbkdf2:sha256:600000$bench$" + "0" * 64
+
+
+def volumes(scale):
+    return {name: max(1, int(count * scale)) for name, count in FULL_SCALE.items()}
+
+
+def seed(client, scale=1.0, seed_value=1234):
+    """Fill `client` (a FakeSupabase) and return ids the workloads pick from."""
+    rng = random.Random(seed_value)
+    counts = volumes(scale)
+    now = datetime.now()
+
+    users = [{
+        "id": f"00000000-0000-4000-8000-{i:012d}",
+        "username": f"user{i}",
+        "email": f"user{i}@example.com",
+        "password": PASSWORD_HASH,
+    } for i in range(counts["users"])]
+    client.bulk_load("users", users)
+    user_ids = [u["id"] for u in users]
+
+    client.bulk_load("folders", ({"id": i + 1, "user_id": uid, "name": "General"} for i, uid in enumerate(user_ids)))
+    client.bulk_load("notebooks", ({"id": i + 1, "user_id": uid, "name": "My First Notebook"} for i, uid in enumerate(user_ids)))
+
+    def todos():
+        for i in range(counts["todos"]):
+            owner = rng.randrange(len(user_ids))
+            due = now + timedelta(minutes=rng.randrange(-7 * 24 * 60, 14 * 24 * 60))
+            yield {
+                "id": i + 1,
+                "user_id": user_ids[owner],
+                "folder_id": owner + 1,
+                "title": f"Task {i}",
+                "priority": rng.choice(("Low", "Medium", "High")),
+                "due_date": due.strftime("%Y-%m-%d"),
+                "due_time": due.strftime("%H:%M"),
+                "completed": int(rng.random() < 0.4),
+            }
+    client.bulk_load("todos", todos())
+
+    note_body = "lorem ipsum dolor sit amet " * (NOTE_BYTES // 27)
+
+    def notes():
+        for i in range(counts["notes"]):
+            owner = rng.randrange(len(user_ids))
+            yield {
+                "id": i + 1,
+                "user_id": user_ids[owner],
+                "notebook_id": owner + 1,
+                "title": f"Note {i}",
+                "content": note_body,
+            }
+    client.bulk_load("notes", notes())
+
+    small_blob = base64.b64encode(b"x" * SMALL_FILE_BYTES).decode()
+    large_blob = base64.b64encode(b"x" * LARGE_FILE_BYTES).decode()
+
+    def files():
+        for i in range(counts["files"]):
+            large = i % LARGE_FILE_EVERY == 0
+            yield {
+                "id": i + 1,
+                "user_id": user_ids[rng.randrange(len(user_ids))],
+                "name": f"file{i}.{'png' if large else 'txt'}",
+                "type": "image" if large else "document",
+                "mime_type": "image/png" if large else "text/plain",
+                "size": LARGE_FILE_BYTES if large else SMALL_FILE_BYTES,
+                "data": large_blob if large else small_blob,
+            }
+    client.bulk_load("files", files())
+
+    aliases = [f"l{i:x}" for i in range(counts["short_urls"])]
+    client.bulk_load("short_urls", ({
+        "id": i + 1,
+        "user_id": user_ids[rng.randrange(len(user_ids))],
+        "original_url": f"https://example.com/page/{i}",
+        "alias": alias,
+        "short_url": f"http://localhost/s/{alias}",
+        "title": f"Link {i}",
+    } for i, alias in enumerate(aliases)))
+
+    return {"user_ids": user_ids, "aliases": aliases, "counts": counts}
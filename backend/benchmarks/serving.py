@@ -0,0 +1,156 @@
+# Throughput of the backend under different server models.
+#
+#   cd backend
+#   python -m benchmarks.serving --requests 400 --concurrency 32 --latency-ms 25
+#
+# Starts the app over real HTTP with the in-memory stand-in (seeded before any
+# fork) under each model in turn:
+#   dev      werkzeug's threaded server, what `python app.py` runs
+#   sync     gunicorn, 2 x CPUs + 1 single-threaded workers
+#   io       serve.py's I/O-bound profile
+#   cpu      serve.py's CPU-bound profile
+# and drives two mixes against it: `io` lists todos (one query each, waiting
+# --latency-ms) and `cpu` logs in (a password hash each).
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from .harness import BACKEND_DIR, percentile
+
+MODELS = ("dev", "sync", "io", "cpu")
+PASSWORD = "correct horse battery staple"
+
+
+def model_settings(model):
+    import serve
+    cpus = os.cpu_count() or 1
+    if model == "sync":
+        return {"workers": 2 * cpus + 1, "threads": 1}
+    workers, threads = serve.concurrency(model, cpus)
+    return {"workers": workers, "threads": threads}
+
+
+def serve_model(model, port, latency_ms):
+    """Child process: seed a stand-in and serve the app with `model`."""
+    from .fake_supabase import FakeSupabase
+    from .harness import auth_header, load_backend
+
+    os.environ["DEFER_BACKGROUND_TASKS"] = "1"
+    client = FakeSupabase()
+    backend = load_backend(client)
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "bench", "email": "bench@example.com", "password": PASSWORD})
+    user_id = client.tables["users"].indexes["username"]["bench"].copy().pop()
+    headers = auth_header(backend, user_id)
+    for i in range(20):
+        test_client.post("/todos", headers=headers, json={"title": f"Todo {i}"})
+    client.latency = latency_ms / 1000.0
+    # The driver reads the auth header from this line
+    print(json.dumps(headers), flush=True)
+
+    if model == "dev":
+        from werkzeug.serving import run_simple
+        run_simple("127.0.0.1", port, backend.app, threaded=True)
+        return 0
+    import serve
+    return serve.run(lambda preload: backend.app, bind=f"127.0.0.1:{port}", preload=True, **model_settings(model))
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return True
+        except urllib.error.HTTPError:
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def drive(port, mix, headers, count, concurrency):
+    def one(_):
+        if mix == "io":
+            req = urllib.request.Request(f"http://127.0.0.1:{port}/todos", headers=headers)
+        else:
+            body = json.dumps({"username": "bench", "password": PASSWORD}).encode()
+            req = urllib.request.Request(f"http://127.0.0.1:{port}/login", data=body,
+                                         headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        try:
+            status = urllib.request.urlopen(req, timeout=60).status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 599
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(count)))
+    wall = time.perf_counter() - started
+    latencies = [s[0] for s in samples]
+    return {
+        "errors": sum(1 for s in samples if s[1] >= 400),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "rps": count / wall,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend throughput by server model")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--port", type=int, default=9871)
+    parser.add_argument("--models", default=",".join(MODELS))
+    parser.add_argument("--serve", choices=MODELS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    if args.serve:
+        return serve_model(args.serve, args.port, args.latency_ms)
+
+    rows = []
+    for model in [m.strip() for m in args.models.split(",") if m.strip()]:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.serving", "--serve", model, "--port", str(args.port),
+             "--latency-ms", str(args.latency_ms)],
+            cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            line = proc.stdout.readline()
+            while line and not line.startswith("{"):
+                line = proc.stdout.readline()
+            headers = json.loads(line)
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            if not wait_ready(args.port):
+                print(f"{model}: server did not start")
+                continue
+            label = "1 x threads" if model == "dev" else "{workers} x {threads}".format(**model_settings(model))
+            for mix in ("io", "cpu"):
+                rows.append((model, label, mix, drive(args.port, mix, headers, args.requests, args.concurrency)))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+    print(f"\n{args.requests} requests per mix, {args.concurrency} clients, "
+          f"{args.latency_ms:g} ms per query, {os.cpu_count()} CPU(s)")
+    print(f"{'model':<8}{'procs x threads':<18}{'mix':<6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+    for model, label, mix, r in rows:
+        print(f"{model:<8}{label:<18}{mix:<6}{r['errors']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['rps']:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
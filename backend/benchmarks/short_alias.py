@@ -0,0 +1,68 @@
+# Short-URL creation throughput under concurrency.
+#
+#   cd backend
+#   python -m benchmarks.short_alias --creates 2000 --concurrency 16 --latency-ms 25
+#
+# "generated" lets the server pick the alias, "custom" sends a random alias
+# from the client the way the old form did. A final race sends the same custom
+# alias from every thread at once; exactly one of them may succeed.
+
+import argparse
+import random
+import string
+import sys
+import threading
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend, print_report, run_plan, summarize
+from .seed import seed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Short-URL create throughput")
+    parser.add_argument("--scale", type=float, default=0.01, help="fraction of full data volume to seed")
+    parser.add_argument("--creates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase(latency_ms=args.latency_ms)
+    data = seed(client, args.scale, args.seed)
+    backend = load_backend(client)
+    headers = {user_id: auth_header(backend, user_id) for user_id in data["user_ids"][:100]}
+    local = threading.local()
+
+    def execute(op, arg):
+        test_client = getattr(local, "client", None)
+        if test_client is None:
+            test_client = local.client = backend.app.test_client()
+        user_id, alias = arg
+        body = {"original_url": "https://example.com/landing", "title": "bench"}
+        if alias:
+            body["alias"] = alias
+        resp = test_client.post("/short-urls", headers=headers[user_id], json=body)
+        return resp.status_code, int(resp.headers.get("X-Query-Count", 0))
+
+    users = list(headers)
+    alphabet = string.ascii_letters + string.digits
+    plan = [("generated", (rng.choice(users), None)) for _ in range(args.creates)]
+    plan += [("custom", (rng.choice(users), "".join(rng.choices(alphabet, k=6)))) for _ in range(args.creates)]
+    rng.shuffle(plan)
+    samples, wall = run_plan(plan, execute, args.concurrency)
+    print_report(f"Create short URL ({args.concurrency} threads, {args.latency_ms:g} ms per query)",
+                 summarize(samples, wall))
+    created = sum(1 for _, _, status, _ in samples if status == 201)
+    print(f"{created}/{len(samples)} created")
+
+    race = [("race", (rng.choice(users), "same-alias")) for _ in range(args.concurrency * 4)]
+    samples, _ = run_plan(race, execute, args.concurrency)
+    winners = sum(1 for _, _, status, _ in samples if status == 201)
+    print(f"same alias from {len(race)} requests at once: {winners} created, "
+          f"{sum(1 for _, _, status, _ in samples if status == 400)} rejected")
+    return 0 if winners == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# Bulk short-URL import and export against one request per link.
+#
+#   cd backend
+#   python -m benchmarks.short_url_import --links 5000 --latency-ms 25
+#
+# Imports the same CSV through POST /short-urls/import and through one
+# POST /short-urls per row, then streams it back with GET /short-urls/export.
+
+import argparse
+import csv
+import io
+import sys
+import time
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend
+
+
+def build_csv(count, prefix):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["original_url", "alias", "title"])
+    for i in range(count):
+        # Every tenth row lets the server pick the alias
+        writer.writerow([f"https://example.com/{prefix}/{i}", "" if i % 10 == 0 else f"{prefix}-{i}", f"Link {i}"])
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk short-URL import/export")
+    parser.add_argument("--links", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    args = parser.parse_args(argv)
+
+    client = FakeSupabase(latency_ms=args.latency_ms)
+    backend = load_backend(client)
+    test_client = backend.app.test_client()
+    test_client.post("/register", json={"username": "migrator", "email": "migrator@example.com", "password": "secret"})
+    user_id = client.tables["users"].indexes["username"]["migrator"].copy().pop()
+    headers = auth_header(backend, user_id)
+
+    rows = []
+    body = build_csv(args.links, "bulk")
+    before = client.calls
+    started = time.perf_counter()
+    resp = test_client.post("/short-urls/import", headers=headers, data=body.encode(), content_type="text/csv")
+    report = resp.get_json()
+    rows.append(("import endpoint", time.perf_counter() - started, client.calls - before, report["created"]))
+
+    before = client.calls
+    started = time.perf_counter()
+    created = 0
+    for record in csv.DictReader(io.StringIO(build_csv(args.links, "single"))):
+        payload = {"original_url": record["original_url"], "title": record["title"]}
+        if record["alias"]:
+            payload["alias"] = record["alias"]
+        created += test_client.post("/short-urls", headers=headers, json=payload).status_code == 201
+    rows.append(("one POST per link", time.perf_counter() - started, client.calls - before, created))
+
+    before = client.calls
+    started = time.perf_counter()
+    resp = test_client.get("/short-urls/export", headers=headers)
+    exported = sum(1 for _ in csv.reader(io.StringIO(resp.get_data(as_text=True)))) - 1
+    rows.append(("export (csv)", time.perf_counter() - started, client.calls - before, exported))
+
+    print(f"\n{args.links} links, {args.latency_ms:g} ms per query")
+    print(f"{'operation':<20}{'seconds':>10}{'queries':>10}{'rows':>10}{'rows/s':>10}")
+    for name, seconds, queries, count in rows:
+        print(f"{name:<20}{seconds:>10.2f}{queries:>10}{count:>10}{count / seconds:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
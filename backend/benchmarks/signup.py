@@ -0,0 +1,64 @@
+# Signup throughput: POST /register (one register_user RPC) against the old
+# sequence of separate users / folders / notebooks inserts.
+#
+#   cd backend
+#   python -m benchmarks.signup --signups 200 --concurrency 8 --latency-ms 25
+#
+# Password hashing is the same in both paths and usually dominates; pass
+# --fast-hash to swap in a cheap hash and isolate the database round trips.
+
+import argparse
+import sys
+
+from .fake_supabase import FakeSupabase
+from .harness import load_backend, print_report, run_plan, summarize
+
+
+def legacy_register(client, hash_password):
+    """The pre-RPC flow: three independent inserts, no transaction."""
+    def register(username):
+        user = client.table("users").insert({
+            "username": username, "email": f"{username}@example.com", "password": hash_password("secret"),
+        }).execute().data[0]
+        client.table("folders").insert({"user_id": user["id"], "name": "General"}).execute()
+        client.table("notebooks").insert({"user_id": user["id"], "name": "My First Notebook"}).execute()
+        return 201, 3
+    return register
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Signup throughput benchmark")
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    parser.add_argument("--fast-hash", action="store_true", help="replace PBKDF2 with a trivial hash")
+    args = parser.parse_args(argv)
+
+    client = FakeSupabase(latency_ms=args.latency_ms)
+    backend = load_backend(client)
+    if args.fast_hash:
+        backend.generate_password_hash = lambda password: "plain$" + password
+    hash_password = backend.generate_password_hash
+
+    legacy = legacy_register(client, hash_password)
+    plan = [("legacy", f"legacy{i}") for i in range(args.signups)]
+    samples, wall = run_plan(plan, lambda op, name: legacy(name), args.concurrency)
+    print_report("Separate inserts (before)", summarize(samples, wall))
+
+    test_client = backend.app.test_client()
+
+    def register(op, name):
+        resp = test_client.post("/register", json={"username": name, "email": f"{name}@example.com", "password": "secret"})
+        return resp.status_code, int(resp.headers.get("X-Query-Count", 0))
+
+    plan = [("register_user", f"rpc{i}") for i in range(args.signups)]
+    samples, wall = run_plan(plan, register, args.concurrency)
+    print_report("register_user RPC (after)", summarize(samples, wall))
+
+    duplicate = test_client.post("/register", json={"username": "rpc0", "email": "other@example.com", "password": "x"})
+    print(f"\nDuplicate username -> {duplicate.status_code} {duplicate.get_json()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
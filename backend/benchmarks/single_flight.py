@@ -0,0 +1,125 @@
+# Identical concurrent reads: one database call each against one shared call.
+#
+#   cd backend
+#   python -m benchmarks.single_flight --burst 200 --bursts 5 --tabs 4 --users 50 --latency-ms 25
+#
+# Reports database calls and time, with the plain client and with
+# single_flight.CoalescingClient, for:
+#   - bursts of --burst simultaneous GET /s/<alias> for one viral link
+#   - --users users each loading GET /todos and GET /notes from --tabs tabs
+#     at once
+#   - the same burst of lookups from coroutines through AsyncSingleFlight
+# and checks that a GET /todos sent right after a POST /todos does not join a
+# slower GET /todos that started before the write.
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import single_flight
+from tracing import traced
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend
+
+
+def burst(backend, requests):
+    """Send (path, headers) pairs all at once; returns the seconds it took."""
+    barrier = threading.Barrier(len(requests))
+
+    def send(request):
+        path, headers = request
+        test_client = backend.app.test_client()
+        barrier.wait()
+        resp = test_client.get(path, headers=headers)
+        assert resp.status_code in (200, 302), (path, resp.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        list(pool.map(send, requests))
+    return time.perf_counter() - started
+
+
+def async_burst(size, latency):
+    """Database calls made by `size` coroutines looking up the same alias."""
+    flights = single_flight.AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(latency)
+        return {"id": 1, "original_url": "https://example.com"}
+
+    async def run():
+        await asyncio.gather(*(flights.do("viral", fetch) for _ in range(size)))
+
+    asyncio.run(run())
+    return len(calls), flights.collapsed
+
+
+def own_write_visible(backend, client, headers, latency):
+    """True when a read after a write skips a slower read started before it."""
+    test_client = backend.app.test_client()
+    slow = threading.Thread(target=lambda: backend.app.test_client().get("/todos", headers=headers))
+    client.latency = latency * 8
+    slow.start()
+    time.sleep(latency)
+    client.latency = latency
+    test_client.post("/todos", headers=headers, json={"title": "Just written", "priority": "High"})
+    listed = test_client.get("/todos", headers=headers).get_json()
+    slow.join()
+    return any(todo["title"] == "Just written" for todo in listed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Identical concurrent reads with and without single flight")
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--tabs", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=25.0)
+    args = parser.parse_args(argv)
+
+    client = FakeSupabase()
+    backend = load_backend(client)
+    users = []
+    for i in range(args.users):
+        user_id = str(uuid.UUID(int=i + 1))
+        client.bulk_load("users", [{"id": user_id, "username": f"user{i}", "email": f"user{i}@example.com",
+                                    "password": "x"}])
+        client.bulk_load("todos", ({"user_id": user_id, "title": f"Task {n}", "priority": "Low"} for n in range(50)))
+        client.bulk_load("notes", ({"user_id": user_id, "title": f"Note {n}", "notebook_id": 1, "content": "x" * 500}
+                                   for n in range(20)))
+        users.append(auth_header(backend, user_id))
+    client.bulk_load("short_urls", [{"user_id": str(uuid.UUID(int=1)), "original_url": "https://example.com",
+                                     "alias": "viral", "short_url": "https://x/s/viral"}])
+    latency = args.latency_ms / 1000.0
+    client.latency = latency
+
+    viral = [("/s/viral", {})] * args.burst
+    tabs = [(path, headers) for headers in users for path in ("/todos", "/notes") for _ in range(args.tabs)]
+    results = []
+    for label, wrapped in (("plain", traced(client)), ("single flight", traced(single_flight.CoalescingClient(client)))):
+        backend.supabase = wrapped
+        for name, requests, repeat in (("redirect burst", viral, args.bursts), ("multi-tab loads", tabs, 1)):
+            calls = client.calls
+            seconds = sum(burst(backend, requests) for _ in range(repeat))
+            results.append((name, label, len(requests) * repeat, client.calls - calls, seconds))
+    visible = own_write_visible(backend, client, users[0], latency)
+    async_calls, async_collapsed = async_burst(args.burst, latency)
+
+    print(f"\n{args.latency_ms:g} ms per query")
+    print(f"{'workload':<18}{'client':<15}{'requests':>9}{'db calls':>10}{'ms':>9}")
+    for name, label, requests, calls, seconds in sorted(results):
+        print(f"{name:<18}{label:<15}{requests:>9}{calls:>10}{seconds * 1000:>9.0f}")
+    print(f"\nAsync burst of {args.burst}: {async_calls} call(s), {async_collapsed} collapsed")
+    print(f"Own write visible behind an older read: {'yes' if visible else 'NO'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
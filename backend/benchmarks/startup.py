@@ -0,0 +1,160 @@
+# Cold-start profile for backend/app.py and worker.py.
+#
+#   cd backend
+#   python -m benchmarks.startup --runs 10
+#
+# For each entry point this prints the slowest imports from `python -X
+# importtime` and the median time from process launch to the first response
+# (a route that does not touch the database, so the lazily created Supabase
+# client is not built). It then reports how long building the client takes on
+# first database use.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from .harness import BACKEND_DIR, REPO_ROOT
+
+BACKEND_FIRST_RESPONSE = """
+import os
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+import app
+resp = app.app.test_client().get("/smtp-status")
+assert resp.status_code == 200
+print("READY", flush=True)
+"""
+
+BACKEND_CLIENT_INIT = """
+import time
+import app
+started = time.perf_counter()
+app.supabase.get()
+print("CLIENT_MS", (time.perf_counter() - started) * 1000, flush=True)
+"""
+
+WORKER_STUB = """
+import sys, types
+js = types.ModuleType("js")
+class Response:
+    def __init__(self, body="", status=200, headers=None, mimetype=None):
+        self.body, self.status, self.headers = body, status, headers or {}
+    @classmethod
+    def redirect(cls, url, status=302):
+        return cls("", status, {"Location": url})
+js.Response = Response
+sys.modules["js"] = js
+"""
+
+WORKER_FIRST_RESPONSE = WORKER_STUB + """
+import asyncio
+import worker
+class Request:
+    method, path, headers, params, url = "OPTIONS", "/todos", {}, {}, "http://localhost/todos"
+resp = asyncio.run(worker.on_fetch(Request(), None))
+assert resp.status == 200
+print("READY", flush=True)
+"""
+
+WORKER_CLIENT_INIT = WORKER_STUB + """
+import time
+import worker
+started = time.perf_counter()
+worker.supabase.table
+print("CLIENT_MS", (time.perf_counter() - started) * 1000, flush=True)
+"""
+
+TARGETS = {
+    "backend/app.py": (BACKEND_DIR, "app", BACKEND_FIRST_RESPONSE, BACKEND_CLIENT_INIT),
+    "worker.py": (REPO_ROOT, "worker", WORKER_FIRST_RESPONSE, WORKER_CLIENT_INIT),
+}
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://localhost:54321")
+    env.setdefault("SUPABASE_KEY", "bench-key")
+    env["PYTHONDONTWRITEBYTECODE"] = "0"
+    return env
+
+
+def import_profile(cwd, code, module, top):
+    """Return the `top` slowest imports made directly by `module`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=child_env(),
+                          capture_output=True, text=True, check=True)
+    lines = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    # importtime lists children before their parent. The module is looked up
+    # at any depth: an import running on another thread at the same time
+    # shifts the nesting of everything printed after it
+    found = [i for i, line in enumerate(lines) if line[3] == module]
+    if not found:
+        return [], 0
+    end = found[-1]
+    depth, self_us, total, _ = lines[end]
+    rows = [(self_us, self_us, f"{module} (own code)")]
+    for child_depth, child_self, cumulative, name in reversed(lines[:end]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1:
+            rows.append((cumulative, child_self, name))
+    rows.sort(reverse=True)
+    return rows[:top], total
+
+
+def first_response_ms(cwd, code):
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=cwd, env=child_env(),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in proc.stdout:
+        if line.startswith("READY"):
+            elapsed = (time.perf_counter() - started) * 1000
+            break
+    else:
+        raise RuntimeError("child exited without responding")
+    proc.wait()
+    return elapsed
+
+
+def client_init_ms(cwd, code):
+    proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=child_env(),
+                          capture_output=True, text=True, check=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("CLIENT_MS"):
+            return float(line.split()[1])
+    raise RuntimeError("child did not report client init time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile and time-to-first-response")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args(argv)
+
+    for name, (cwd, module, response_code, client_code) in TARGETS.items():
+        import_code = (WORKER_STUB if module == "worker" else "") + f"import {module}"
+        rows, total = import_profile(cwd, import_code, module, args.top)
+        print(f"\n{name}: import {module} takes {total / 1000:.1f} ms; slowest direct imports (-X importtime)")
+        print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+        for cumulative, self_us, module in rows:
+            print(f"{cumulative / 1000:>14.1f}{self_us / 1000:>10.1f}  {module}")
+
+        timings = [first_response_ms(cwd, response_code) for _ in range(args.runs)]
+        print(f"time to first response: median {statistics.median(timings):.1f} ms, "
+              f"min {min(timings):.1f} ms over {args.runs} runs")
+        try:
+            print(f"Supabase client on first use: {client_init_ms(cwd, client_code):.1f} ms")
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            print(f"Supabase client on first use: not measured ({e})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# Per-request latency of the embedded SQLite store against the Supabase path.
+#
+#   cd backend
+#   python -m benchmarks.storage --scale 0.01 --requests 2000 --latency-ms 25
+#
+# The Supabase path is the in-memory stand-in with --latency-ms of simulated
+# round trip per query; set it to your measured latency to hosted Supabase.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from sqlite_store import SQLiteClient
+
+from .fake_supabase import FakeSupabase
+from .harness import load_backend, print_report, run_plan, summarize
+from .run import MIX, backend_executor, build_plan
+from .seed import seed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare SQLite and Supabase storage backends")
+    parser.add_argument("--scale", type=float, default=0.01)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=25.0, help="simulated Supabase round trip")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    fake = FakeSupabase(latency_ms=args.latency_ms)
+    data = seed(fake, args.scale, args.seed)
+    plan = build_plan(MIX, args.requests, data, random.Random(args.seed))
+    backend = load_backend(fake)
+
+    samples, wall = run_plan(plan, backend_executor(backend), args.concurrency)
+    supabase_results = summarize(samples, wall)
+    print_report(f"Supabase path ({args.latency_ms:g} ms per query)", supabase_results)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteClient(os.path.join(tmp, "bench.db"))
+        seed(store, args.scale, args.seed)
+        backend.supabase = backend.wrap_client(store)
+        samples, wall = run_plan(plan, backend_executor(backend), args.concurrency)
+        sqlite_results = summarize(samples, wall)
+        print_report("SQLite (WAL)", sqlite_results)
+
+    print(f"\n{'operation':<18}{'p50 speedup':>12}{'p95 speedup':>12}")
+    for op in sorted(sqlite_results):
+        base, local = supabase_results.get(op), sqlite_results[op]
+        if base and local["p50_ms"] and local["p95_ms"]:
+            print(f"{op:<18}{base['p50_ms'] / local['p50_ms']:>11.1f}x{base['p95_ms'] / local['p95_ms']:>11.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# Usage and quota checks: counted on the fly against the user_usage counters.
+#
+#   cd backend
+#   python -m benchmarks.usage_counters --sizes 100,1000,10000 --runs 5 --latency-ms 25
+#
+# For accounts of growing size (files, todos, notes and short URLs --sizes
+# each), reports rows and bytes read and the median time to work out one
+# user's usage by summing files.size and counting the other tables (what a
+# quota check did) and by reading their user_usage row, on the stand-in and
+# on SQLite. Also reports what the counting triggers add to an insert on
+# SQLite, and checks reconcile_user_usage finds nothing to fix.
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import usage
+from sqlite_store import SQLiteClient
+from tracing import end_trace, start_trace, traced
+
+from .fake_supabase import FakeSupabase
+
+USER = "00000000-0000-4000-8000-000000000001"
+
+
+def fill(client, size):
+    client.bulk_load("users", [{"id": USER, "username": "owner", "email": "owner@example.com", "password": "x"}])
+    client.bulk_load("files", ({"user_id": USER, "name": f"file-{i}", "type": "file", "size": 1000 + i}
+                               for i in range(size)))
+    client.bulk_load("todos", ({"user_id": USER, "title": f"Task {i}", "priority": "Low"} for i in range(size)))
+    client.bulk_load("notes", ({"user_id": USER, "title": f"Note {i}", "notebook_id": 1, "content": ""}
+                               for i in range(size)))
+    client.bulk_load("short_urls", ({"user_id": USER, "original_url": "https://example.com", "alias": f"a{i}",
+                                     "short_url": f"https://x/s/a{i}"} for i in range(size)))
+
+
+def counted(client):
+    """Usage computed from the tables."""
+    files = client.table("files").select("size").eq("user_id", USER).execute().data
+    counts = {table: len(client.table(table).select("id").eq("user_id", USER).execute().data)
+              for table in ("todos", "notes", "short_urls")}
+    return {"file_count": len(files), "file_bytes": sum(row["size"] or 0 for row in files),
+            "todo_count": counts["todos"], "note_count": counts["notes"], "short_url_count": counts["short_urls"]}
+
+
+def measure(client, read, runs):
+    timings = []
+    for _ in range(runs):
+        trace, token = start_trace("usage")
+        started = time.perf_counter()
+        try:
+            result = read()
+        finally:
+            end_trace(token)
+        timings.append(time.perf_counter() - started)
+    return result, {"rows": sum(q["rows"] for q in trace.queries), "kib": sum(q["bytes"] for q in trace.queries) / 1024,
+                    "ms": statistics.median(timings) * 1000}
+
+
+def insert_cost(path, rows, triggers):
+    store = SQLiteClient(path)
+    conn = store.connection()
+    if not triggers:
+        for name in [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                                                    "AND name LIKE '%usage%'")]:
+            conn.execute(f"DROP TRIGGER {name}")
+    started = time.perf_counter()
+    for i in range(rows):
+        store.table("todos").insert({"user_id": USER, "title": f"t{i}", "priority": "Low"}).execute()
+    return (time.perf_counter() - started) / rows * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Usage counted on the fly against user_usage")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=25.0, help="simulated Supabase round trip")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            fake = FakeSupabase()
+            fill(fake, size)
+            fake.latency = args.latency_ms / 1000.0
+            store = SQLiteClient(os.path.join(tmp, f"usage-{size}.db"))
+            fill(store, size)
+            for label, client in ((f"stand-in {args.latency_ms:g} ms", fake), ("SQLite", store)):
+                client = traced(client)
+                expected, on_the_fly = measure(client, lambda: counted(client), args.runs)
+                stored, counters = measure(client, lambda: usage.get(client, USER), args.runs)
+                assert expected == stored, (expected, stored)
+                assert usage.reconcile(client, log=lambda line: None)["fixed"] == 0
+                results.append((size, label, on_the_fly, counters))
+        plain = insert_cost(os.path.join(tmp, "plain.db"), 2000, triggers=False)
+        counting = insert_cost(os.path.join(tmp, "counting.db"), 2000, triggers=True)
+
+    print(f"\nOne user's usage, median of {args.runs} run(s)")
+    print(f"{'rows each':>10}  {'store':<18}{'method':<12}{'rows':>8}{'KiB':>10}{'ms':>10}")
+    for size, label, on_the_fly, counters in results:
+        for method, r in (("counted", on_the_fly), ("user_usage", counters)):
+            print(f"{size:>10}  {label:<18}{method:<12}{r['rows']:>8}{r['kib']:>10.1f}{r['ms']:>10.2f}")
+    print(f"\nSQLite todo insert: {plain:.3f} ms without the usage trigger, {counting:.3f} ms with it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# Full-workspace backup: buffered export against the streaming one, and import.
+#
+#   cd backend
+#   python -m benchmarks.workspace_export --todos 20000 --notes 2000 --files 60 --file-kb 512 --latency-ms 5
+#
+# Fills one account and reports, for GET /export:
+#   - a buffered export (every table loaded in one query, the ZIP built in
+#     memory, then sent) against the streaming one (keyset pages, each page
+#     compressed and sent before the next is read): time to first byte,
+#     total time and peak Python memory (tracemalloc) while the body is read;
+# and for POST /import of that archive into a second account, row-by-row
+# inserts against the chunked bulk inserts: queries and time.
+
+import argparse
+import base64
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+
+import workspace_io
+from tracing import end_trace, start_trace
+
+from .fake_supabase import FakeSupabase
+from .harness import auth_header, load_backend
+
+
+def fill(client, user_id, rng, args):
+    # Ids above those of the rows registration created
+    base = 1000
+    client.bulk_load("folders", ({"id": base + i, "user_id": user_id, "name": f"Folder {i}"} for i in range(20)))
+    client.bulk_load("todos", ({"id": base + i, "user_id": user_id, "folder_id": base + i % 20, "title": f"Task {i}",
+                                "priority": "Medium", "due_date": "2026-11-01", "due_time": "09:00", "completed": 0}
+                               for i in range(args.todos)))
+    client.bulk_load("notebooks", ({"id": base + i, "user_id": user_id, "name": f"Notebook {i}"} for i in range(10)))
+    client.bulk_load("notes", ({"id": base + i, "user_id": user_id, "notebook_id": base + i % 10, "section": "General",
+                                "title": f"Note {i}", "content": "lorem ipsum " * 200} for i in range(args.notes)))
+    client.bulk_load("file_folders", ({"id": base + i, "user_id": user_id, "name": f"Dir {i}",
+                                       "parent_id": base + i - 1 if i else None} for i in range(5)))
+    blob = base64.b64encode(rng.randbytes(args.file_kb * 1024)).decode()
+    client.bulk_load("files", ({"id": base + i, "user_id": user_id, "folder_id": base + i % 5, "name": f"file-{i}.bin",
+                                "type": "file", "mime_type": "application/octet-stream",
+                                "size": args.file_kb * 1024, "data": blob} for i in range(args.files)))
+
+
+def buffered_export(backend, user_id):
+    """What a one-shot export does: load everything, build the archive, send it."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as out:
+        for table, columns in workspace_io.TABLES.items():
+            rows = backend.supabase.table(table).select(",".join(columns)).eq("user_id", user_id).execute().data
+            out.writestr(f"{table}.ndjson", "".join(json.dumps(row) + "\n" for row in rows))
+    yield archive.getvalue()
+
+
+def measure_export(send):
+    """Time and peak memory of `send()`, which returns the body's iterable."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    first, size = None, 0
+    for chunk in send():
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak, size
+
+
+def row_by_row_import(backend, user_id, archive):
+    """Each record inserted on its own, as a loop over the single-item routes would."""
+    ids = {table: {} for table in workspace_io.TABLES}
+    for table, row in workspace_io.read_records(io.BytesIO(archive), "zip"):
+        values = workspace_io.prepare(table, row, ids)
+        if values is None or table == "short_urls":
+            continue
+        created = backend.supabase.table(table).insert(dict(values, user_id=user_id)).execute().data[0]
+        ids[table][row["id"]] = created["id"]
+
+
+def measure_import(run):
+    """Queries and time of `run()`, which returns a query count or None."""
+    trace, token = start_trace("workspace-import")
+    started = time.perf_counter()
+    try:
+        queries = run()
+    finally:
+        end_trace(token)
+    return queries if queries is not None else len(trace.queries), time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Buffered against streaming workspace export, and import")
+    parser.add_argument("--todos", type=int, default=20000)
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--file-kb", type=int, default=512)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    client = FakeSupabase()
+    backend = load_backend(client)
+    test_client = backend.app.test_client()
+    user_ids = []
+    for name in ("owner", "copy1", "copy2"):
+        test_client.post("/register", json={"username": name, "email": f"{name}@example.com", "password": "secret"})
+        user_ids.append(client.tables["users"].indexes["username"][name].copy().pop())
+    owner = user_ids[0]
+    fill(client, owner, rng, args)
+    client.latency = args.latency_ms / 1000.0
+
+    # Unbuffered, the test client hands the body over as a WSGI server would
+    results = [
+        ("buffered", measure_export(lambda: buffered_export(backend, owner))),
+        ("streaming", measure_export(lambda: test_client.get("/export", headers=auth_header(backend, owner),
+                                                             buffered=False).response)),
+    ]
+    archive = test_client.get("/export", headers=auth_header(backend, owner)).data
+
+    def chunked_import():
+        resp = test_client.post("/import", headers=auth_header(backend, user_ids[2]), data=archive)
+        return int(resp.headers.get("X-Query-Count", 0))
+
+    imports = [
+        ("row by row", measure_import(lambda: row_by_row_import(backend, user_ids[1], archive))),
+        ("chunked", measure_import(chunked_import)),
+    ]
+
+    print(f"\nOne account: {args.todos} todos, {args.notes} notes, {args.files} files of {args.file_kb} KiB, "
+          f"{args.latency_ms:g} ms per query; archive {len(archive) / 1024 / 1024:.1f} MiB")
+    print(f"{'export':<14}{'first byte ms':>15}{'total ms':>12}{'peak MiB':>12}")
+    for label, (first, total, peak, _) in results:
+        print(f"{label:<14}{first * 1000:>15.0f}{total * 1000:>12.0f}{peak / 1024 / 1024:>12.1f}")
+    print(f"\n{'import':<14}{'queries':>15}{'ms':>12}")
+    for label, (queries, seconds) in imports:
+        print(f"{label:<14}{queries:>15}{seconds * 1000:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
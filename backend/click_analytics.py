@@ -0,0 +1,195 @@
+# Click analytics for short URLs.
+#
+# Redirects record a click in process memory instead of writing to the
+# database. Clicks are counted per (link, hour, referrer host, user-agent class,
+# country) and flushed in one batch every CLICK_FLUSH_INTERVAL seconds, or
+# sooner once CLICK_FLUSH_MAX_KEYS distinct keys are pending. The
+# add_click_rollups function in supabase_setup.sql adds each batch to hourly
+# and daily rollups and to short_urls.clicks, so stats read a few rollup rows
+# instead of raw events. Clicks not yet flushed are lost if the process dies.
+#
+# Settings (.env):
+#   CLICK_ANALYTICS=1
+#   CLICK_FLUSH_INTERVAL=10
+#   CLICK_FLUSH_MAX_KEYS=5000
+
+import atexit
+import os
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+ENABLED = (os.environ.get("CLICK_ANALYTICS") or "1").strip().lower() in ("1", "true", "yes")
+FLUSH_INTERVAL = float(os.environ.get("CLICK_FLUSH_INTERVAL", "10"))
+FLUSH_MAX_KEYS = int(os.environ.get("CLICK_FLUSH_MAX_KEYS", "5000"))
+
+# Headers set by CDNs and proxies in front of the app
+COUNTRY_HEADERS = ("CF-IPCountry", "X-Country-Code", "CloudFront-Viewer-Country", "X-Vercel-IP-Country")
+BOT_PATTERN = re.compile(r"bot|crawl|spider|slurp|preview|facebookexternalhit|curl|wget|python-requests|httpclient", re.I)
+TABLET_PATTERN = re.compile(r"ipad|tablet|kindle|silk|(android(?!.*mobile))", re.I)
+MOBILE_PATTERN = re.compile(r"mobi|iphone|ipod|android|blackberry|opera mini|windows phone", re.I)
+
+# ?range= values: hours are answered from hourly rollups, days from daily ones
+RANGE_PATTERN = re.compile(r"^(\d{1,3})([hd])$")
+MAX_HOURS = 168
+MAX_DAYS = 366
+
+
+def agent_class(user_agent):
+    if not user_agent:
+        return "unknown"
+    if BOT_PATTERN.search(user_agent):
+        return "bot"
+    if TABLET_PATTERN.search(user_agent):
+        return "tablet"
+    if MOBILE_PATTERN.search(user_agent):
+        return "mobile"
+    return "desktop"
+
+
+def referrer_host(referrer):
+    if not referrer:
+        return ""
+    try:
+        return (urlparse(referrer).hostname or "").removeprefix("www.")[:255]
+    except ValueError:
+        return ""
+
+
+def country_code(headers):
+    for name in COUNTRY_HEADERS:
+        value = (headers.get(name) or "").strip().upper()
+        if len(value) == 2 and value.isalpha() and value != "XX":
+            return value
+    return ""
+
+
+def hour_bucket(moment):
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_key(moment):
+    return moment.strftime("%Y-%m-%dT%H:00:00+00:00")
+
+
+class ClickRecorder:
+    """Counts clicks in memory and hands them to `flush_fn` in batches."""
+
+    def __init__(self, flush_fn, interval=FLUSH_INTERVAL, max_keys=FLUSH_MAX_KEYS):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_keys = max_keys
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def record(self, short_url_id, referrer="", user_agent="", country="", now=None):
+        key = (short_url_id, bucket_key(hour_bucket(now or datetime.now(timezone.utc))),
+               referrer_host(referrer), agent_class(user_agent), country)
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + 1
+            full = len(self.pending) >= self.max_keys
+        if full:
+            self.wake.set()
+
+    def pending_rows(self, short_url_id=None):
+        with self.lock:
+            items = list(self.pending.items())
+        return [_row(key, clicks) for key, clicks in items if short_url_id is None or key[0] == short_url_id]
+
+    def flush(self):
+        """Send everything pending. Returns the number of clicks flushed."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+            if not batch:
+                return 0
+            try:
+                self.flush_fn([_row(key, clicks) for key, clicks in batch.items()])
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self.lock:
+                    for key, clicks in batch.items():
+                        self.pending[key] = self.pending.get(key, 0) + clicks
+                raise
+            return sum(batch.values())
+
+    def start(self):
+        if self.thread is not None:
+            return self.thread
+
+        def loop():
+            while True:
+                self.wake.wait(self.interval)
+                self.wake.clear()
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[Clicks] Flush failed, will retry: {e}")
+
+        self.thread = threading.Thread(target=loop, name="click-flush", daemon=True)
+        self.thread.start()
+        atexit.register(self._flush_at_exit)
+        return self.thread
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[Clicks] Flush at exit failed: {e}")
+
+
+def _row(key, clicks):
+    short_url_id, hour, referrer, agent, country = key
+    return {"short_url_id": short_url_id, "hour": hour, "referrer": referrer,
+            "agent": agent, "country": country, "clicks": clicks}
+
+
+def parse_range(value, now=None):
+    """(granularity, list of bucket keys oldest first) for ?range=, or None."""
+    match = RANGE_PATTERN.match((value or "7d").strip().lower())
+    if not match:
+        return None
+    count, unit = int(match.group(1)), match.group(2)
+    now = hour_bucket(now or datetime.now(timezone.utc))
+    if unit == "h" and 1 <= count <= MAX_HOURS:
+        return "hour", [bucket_key(now - timedelta(hours=i)) for i in range(count - 1, -1, -1)]
+    if unit == "d" and 1 <= count <= MAX_DAYS:
+        today = now.replace(hour=0)
+        return "day", [bucket_key(today - timedelta(days=i)) for i in range(count - 1, -1, -1)]
+    return None
+
+
+def summarize(rows, granularity, buckets, top=10):
+    """Stats payload from rollup rows (hourly-shaped pending rows are folded in)."""
+    series = dict.fromkeys(buckets, 0)
+    referrers, agents, countries = {}, {}, {}
+    total = 0
+    for row in rows:
+        moment = hour_bucket(datetime.fromisoformat(row.get("bucket") or row["hour"]))
+        bucket = bucket_key(moment.replace(hour=0) if granularity == "day" else moment)
+        if bucket not in series:
+            continue
+        clicks = row["clicks"]
+        series[bucket] += clicks
+        total += clicks
+        referrers[row["referrer"] or "direct"] = referrers.get(row["referrer"] or "direct", 0) + clicks
+        agents[row["agent"]] = agents.get(row["agent"], 0) + clicks
+        if row["country"]:
+            countries[row["country"]] = countries.get(row["country"], 0) + clicks
+
+    def ranked(counts):
+        return [{"name": name, "clicks": clicks}
+                for name, clicks in sorted(counts.items(), key=lambda item: -item[1])[:top]]
+
+    return {
+        "granularity": granularity,
+        "total": total,
+        "series": [{"bucket": bucket, "clicks": clicks} for bucket, clicks in series.items()],
+        "referrers": ranked(referrers),
+        "agents": agents,
+        "countries": ranked(countries),
+    }
@@ -0,0 +1,169 @@
+# Thumbnails and text snippets for uploaded files.
+#
+# The files page used to show a preview by downloading the file's full base64
+# data. Now an upload hands the file to a process pool off the request path:
+# images become a WebP thumbnail of at most PREVIEW_SIZE pixels, text files
+# and the first page of PDFs a snippet of PREVIEW_TEXT_CHARS characters. The
+# result is stored in file_previews (one row per file) and served by
+# GET /files/<id>/preview with long-lived cache headers, since a file's
+# content never changes after upload.
+#
+# Decoding and resizing hold the GIL, hence processes rather than threads. A
+# few dispatch threads wait on the pool and write the results, so a burst of
+# uploads queues here instead of in request handlers. Each queued job holds
+# the file's data, so at most PREVIEW_QUEUE are queued; files past that, and
+# files uploaded before previews existed, are queued the first time their
+# preview is asked for.
+# Needs Pillow (images) and pypdf (PDFs); without them those files simply
+# get no preview.
+#
+# Settings (.env):
+#   FILE_PREVIEWS=1
+#   PREVIEW_WORKERS=2
+#   PREVIEW_QUEUE=64
+#   PREVIEW_SIZE=256
+#   PREVIEW_TEXT_CHARS=600
+#   PREVIEW_MAX_SOURCE_MB=25
+
+import base64
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+ENABLED = (os.environ.get("FILE_PREVIEWS") or "1").strip().lower() in ("1", "true", "yes")
+WORKERS = int(os.environ.get("PREVIEW_WORKERS") or min(2, os.cpu_count() or 1))
+QUEUE_LIMIT = max(1, int(os.environ.get("PREVIEW_QUEUE", "64")))
+SIZE = int(os.environ.get("PREVIEW_SIZE", "256"))
+TEXT_CHARS = int(os.environ.get("PREVIEW_TEXT_CHARS", "600"))
+MAX_SOURCE_BYTES = int(float(os.environ.get("PREVIEW_MAX_SOURCE_MB", "25")) * 1024 * 1024)
+RENDER_TIMEOUT = 60
+
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+TEXT_TYPES = {"application/json", "application/xml", "application/javascript", "application/x-yaml"}
+TEXT_MIME = "text/plain; charset=utf-8"
+
+
+def preview_kind(file_type, mime_type):
+    """"image", "pdf", "text" or None when the file gets no preview."""
+    mime_type = (mime_type or "").split(";")[0].strip().lower()
+    if mime_type in IMAGE_TYPES:
+        return "image"
+    if mime_type == "application/pdf":
+        return "pdf"
+    if mime_type.startswith("text/") or mime_type in TEXT_TYPES or file_type == "note":
+        return "text"
+    return None
+
+
+def _snippet(text, limit):
+    lines = [" ".join(line.split()) for line in (text or "").splitlines()]
+    text = "\n".join(line for line in lines if line)[:limit]
+    return ("ready", TEXT_MIME, text.encode()) if text else ("none", None, None)
+
+
+def render(kind, data, size=SIZE, text_chars=TEXT_CHARS):
+    """Build a preview from base64 `data`. Runs in a pool process.
+
+    Returns (status, mime_type, bytes or None).
+    """
+    raw = base64.b64decode(data)
+    if kind == "image":
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(raw)) as image:
+            # Lets JPEG decode at a fraction of full size
+            image.draft("RGB", (size, size))
+            thumb = ImageOps.exif_transpose(image)
+            thumb.thumbnail((size, size))
+            if thumb.mode not in ("RGB", "RGBA"):
+                thumb = thumb.convert("RGBA" if "transparency" in thumb.info or thumb.mode in ("LA", "PA") else "RGB")
+            out = io.BytesIO()
+            thumb.save(out, "WEBP", quality=80, method=4)
+        return "ready", "image/webp", out.getvalue()
+    if kind == "pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(raw))
+        return _snippet(reader.pages[0].extract_text() if reader.pages else "", text_chars)
+    if kind == "text":
+        # Enough bytes for text_chars characters of any UTF-8 text
+        return _snippet(raw[:text_chars * 4].decode("utf-8", errors="ignore"), text_chars)
+    return "none", None, None
+
+
+def digest(content):
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+class PreviewGenerator:
+    """Queues preview jobs and passes each finished row to `store(row)`."""
+
+    def __init__(self, store, workers=WORKERS, queue_limit=QUEUE_LIMIT):
+        self.store = store
+        self.workers = max(1, workers)
+        self.queue_limit = max(1, queue_limit)
+        self.processes = None
+        self.dispatch = None
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def _start(self):
+        # Created on first use, in the process that serves requests: pools do
+        # not survive a fork, and spawn keeps the app's threads out of children
+        if self.dispatch is None:
+            self.processes = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self.dispatch = ThreadPoolExecutor(self.workers, thread_name_prefix="preview")
+
+    def is_pending(self, file_id):
+        return file_id in self.pending
+
+    def is_full(self):
+        return len(self.pending) >= self.queue_limit
+
+    def submit(self, file_id, user_id, file_type, mime_type, data):
+        """Queue a preview for a file. Returns False if one is already queued
+        or the queue is full; the file is then queued when its preview is
+        first asked for."""
+        with self.lock:
+            if file_id in self.pending or len(self.pending) >= self.queue_limit:
+                return False
+            self.pending.add(file_id)
+            self._start()
+            self.dispatch.submit(self._run, self.processes, file_id, user_id, preview_kind(file_type, mime_type), data)
+        return True
+
+    def _run(self, processes, file_id, user_id, kind, data):
+        try:
+            status, mime_type, content = "none", None, None
+            if kind and data and len(data) * 3 // 4 <= MAX_SOURCE_BYTES:
+                try:
+                    status, mime_type, content = processes.submit(render, kind, data).result(RENDER_TIMEOUT)
+                except ImportError as e:
+                    print(f"[Previews] No {kind} previews: {e}")
+                except Exception as e:
+                    print(f"[Previews] File {file_id} failed: {e!r}")
+                    status = "failed"
+            self.store({
+                "file_id": file_id,
+                "user_id": user_id,
+                "status": status,
+                "mime_type": mime_type,
+                "data": base64.b64encode(content).decode() if content else None,
+                "digest": digest(content) if content else None,
+            })
+        except Exception as e:
+            # Typically the file was deleted while its preview was made
+            print(f"[Previews] Could not store preview of file {file_id}: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(file_id)
+
+    def shutdown(self, wait=True):
+        """Finish queued previews (when `wait`) and stop the pools."""
+        with self.lock:
+            dispatch, processes = self.dispatch, self.processes
+            self.dispatch = self.processes = None
+        if dispatch is not None:
+            dispatch.shutdown(wait=wait)
+            processes.shutdown(wait=wait)
@@ -0,0 +1,77 @@
+# File folder tree with sizes (GET /file-folders/tree).
+#
+# Every file folder row carries file_count and byte_count: the files directly
+# in it and the sum of their sizes. A trigger on files (count_folder_files in
+# supabase_setup.sql) adjusts them on upload, delete, move and size change, so
+# nothing here reads the files table. The file_folder_tree function walks a
+# user's folders with a recursive query and adds every folder's counts to its
+# ancestors (total_files, total_bytes); the helpers below are the same walk
+# for the SQLite store and the benchmark stand-in, and turn the flat result
+# into the nested tree the endpoint returns.
+
+
+def walk(folders):
+    """Flat rows in tree order with depth, total_files and total_bytes added.
+
+    Roots are folders without a parent or whose parent is not in `folders`.
+    Folders caught in a parent cycle are unreachable and left out, as in the
+    recursive query.
+    """
+    children = {}
+    ids = {folder["id"] for folder in folders}
+    roots = []
+    for folder in sorted(folders, key=lambda f: (f.get("name") or "", f["id"])):
+        parent = folder.get("parent_id")
+        if parent is None or parent not in ids:
+            roots.append(folder)
+        else:
+            children.setdefault(parent, []).append(folder)
+
+    ordered = []
+    stack = [(folder, 0) for folder in reversed(roots)]
+    while stack:
+        folder, depth = stack.pop()
+        ordered.append(dict(folder, depth=depth, total_files=folder.get("file_count") or 0,
+                            total_bytes=folder.get("byte_count") or 0))
+        stack.extend((child, depth + 1) for child in reversed(children.get(folder["id"], ())))
+
+    # Children come after their parent, so walking backwards adds each
+    # subtree's totals into its parent before the parent is read
+    by_id = {row["id"]: row for row in ordered}
+    for row in reversed(ordered):
+        parent = by_id.get(row.get("parent_id")) if row["depth"] else None
+        if parent is not None:
+            parent["total_files"] += row["total_files"]
+            parent["total_bytes"] += row["total_bytes"]
+    return ordered
+
+
+def subtree_ids(folders, folder_id):
+    """Ids of `folder_id` and every folder below it."""
+    children = {}
+    for folder in folders:
+        children.setdefault(folder.get("parent_id"), []).append(folder["id"])
+    found = []
+    stack = [folder_id]
+    seen = set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        found.append(current)
+        stack.extend(children.get(current, ()))
+    return found
+
+
+def nest(rows):
+    """Nested tree from file_folder_tree rows (parents before children)."""
+    nodes = {}
+    roots = []
+    for row in rows:
+        node = {key: value for key, value in row.items() if key != "depth"}
+        node["children"] = []
+        nodes[node["id"]] = node
+        parent = nodes.get(node.get("parent_id")) if row.get("depth") else None
+        (parent["children"] if parent is not None else roots).append(node)
+    return roots
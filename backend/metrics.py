@@ -0,0 +1,173 @@
+# Request metrics for the Flask backend, exposed at /metrics in the
+# Prometheus text format. No client library is needed; the registry below
+# keeps everything in process memory.
+#
+# /metrics needs "Authorization: Bearer <METRICS_TOKEN>". Without a token it
+# only answers scrapes from this machine that did not come through a proxy.
+#
+# Settings (.env):
+#   METRICS_TOKEN=
+
+import hmac
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Where /metrics is served from when METRICS_TOKEN is not set
+LOCAL_ADDRESSES = {"127.0.0.1", "::1"}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms keyed by metric name and label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._meta[name] = (kind, help_text, tuple(buckets or ()))
+        self._values.setdefault(name, {})
+
+    def inc(self, name, labels=None, value=1):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def dec(self, name, labels=None, value=1):
+        self.inc(name, labels, -value)
+
+    def set(self, name, labels=None, value=0):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._values[name][key] = value
+
+    def observe(self, name, labels=None, value=0):
+        buckets = self._meta[name][2]
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._values[name]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get(self, name, labels=None):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            return self._values.get(name, {}).get(key)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self._values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                        continue
+                    counts, total, count = value
+                    for bound, bucket_count in zip(buckets, counts):
+                        labels = key + (("le", _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(labels)} {bucket_count}")
+                    labels = key + (("le", "+Inf"),)
+                    lines.append(f"{name}_bucket{_format_labels(labels)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("http_requests_total", "counter", "HTTP requests by route, method and status.")
+registry.describe("http_request_duration_seconds", "histogram", "Request latency by route and method.", LATENCY_BUCKETS)
+registry.describe("http_request_size_bytes", "histogram", "Request body size by route and method.", SIZE_BUCKETS)
+registry.describe("http_response_size_bytes", "histogram", "Response body size by route and method.", SIZE_BUCKETS)
+registry.describe("http_requests_in_flight", "gauge", "Requests currently being handled, by route.")
+registry.describe("reminder_checks_total", "counter", "Reminder scans run.")
+registry.describe("reminder_emails_sent_total", "counter", "Reminder emails sent.")
+registry.describe("short_url_clicks_flushed_total", "counter", "Short-URL clicks written to the rollups.")
+registry.describe("alias_filter_lookups_total", "counter", "Short-URL redirects checked against the alias filter, by result.")
+registry.describe("alias_filter_false_positives_total", "counter", "Aliases the filter passed that were not in the database.")
+registry.describe("alias_filter_items", "gauge", "Aliases in the filter at its last build.")
+registry.describe("alias_filter_estimated_error_rate", "gauge", "Estimated false-positive rate of the alias filter at its last build.")
+registry.describe("db_reads_total", "counter", "Selects by the server that answered them (replica, primary), with read replicas configured.")
+registry.describe("db_retries_total", "counter", "Reads retried after a transient database failure.")
+registry.describe("db_hedged_reads_total", "counter", "Slow reads sent a second time, by which copy answered first (first, hedge).")
+registry.describe("db_breaker_opened_total", "counter", "Times the database circuit breaker opened.")
+registry.describe("db_breaker_rejections_total", "counter", "Database calls failed fast while the circuit breaker was open.")
+registry.describe("db_reads_coalesced_total", "counter", "Reads answered by an identical read already running, by table.")
+registry.describe("file_previews_total", "counter", "File previews stored, by status (ready, none, failed).")
+
+
+def route_template():
+    from flask import request
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def init_metrics(app, metrics=registry):
+    """Record per-route metrics for every request and serve them at /metrics."""
+    from flask import Response, g, request, jsonify
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = route_template()
+        metrics.inc("http_requests_in_flight", {"route": g.metrics_route})
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        route = route_template()
+        labels = {"route": route, "method": request.method}
+        metrics.inc("http_requests_total", dict(labels, status=str(response.status_code)))
+        if started is not None:
+            metrics.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+        if request.content_length is not None:
+            metrics.observe("http_request_size_bytes", labels, request.content_length)
+        if not response.is_streamed and response.content_length is not None:
+            metrics.observe("http_response_size_bytes", labels, response.content_length)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc=None):
+        route = g.pop("metrics_route", None)
+        if route is not None:
+            metrics.dec("http_requests_in_flight", {"route": route})
+
+    def metrics_view():
+        token = (os.environ.get("METRICS_TOKEN") or "").strip()
+        if not token:
+            if request.remote_addr not in LOCAL_ADDRESSES or "X-Forwarded-For" in request.headers:
+                return jsonify({"message": "Not found"}), 404
+        elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return jsonify({"message": "Unauthorized"}), 401
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+    return metrics
@@ -0,0 +1,138 @@
+# Note revision history.
+#
+# Every change to a note's content is recorded in note_revisions by the
+# database (the record_note_revision trigger in supabase_setup.sql, and its
+# SQLite/stand-in equivalents). A revision is either a full snapshot
+# (chain = 0) or a forward delta against the revision before it, stored as
+# text_patch ops. A new snapshot is written once NOTE_SNAPSHOT_EVERY revisions
+# have chained off the last one, so rebuilding any version reads one snapshot
+# plus fewer than NOTE_SNAPSHOT_EVERY small deltas.
+#
+# A background thread drops revisions past retention: every note keeps its
+# newest NOTE_HISTORY_KEEP revisions plus anything younger than
+# NOTE_HISTORY_DAYS. The oldest kept revision is rewritten as a snapshot first
+# so what remains still rebuilds. Only notes the database reports as having
+# something to drop (the note_history_candidates function) are visited.
+#
+# Settings (.env):
+#   NOTE_SNAPSHOT_EVERY=20   (Postgres reads the app.note_snapshot_every setting)
+#   NOTE_HISTORY_KEEP=50
+#   NOTE_HISTORY_DAYS=30
+#   NOTE_HISTORY_COMPACT_INTERVAL=3600   (seconds, 0 turns compaction off)
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from text_patch import apply_ops, diff_ops
+
+SNAPSHOT_EVERY = max(1, int(os.environ.get("NOTE_SNAPSHOT_EVERY", "20")))
+KEEP = max(1, int(os.environ.get("NOTE_HISTORY_KEEP", "50")))
+RETENTION_DAYS = float(os.environ.get("NOTE_HISTORY_DAYS", "30"))
+COMPACT_INTERVAL = float(os.environ.get("NOTE_HISTORY_COMPACT_INTERVAL", "3600"))
+
+
+def delta(old_content, new_content):
+    """Forward delta payload: text_patch ops turning old into new, as JSON."""
+    return json.dumps(diff_ops(old_content or "", new_content or ""), ensure_ascii=False)
+
+
+def next_revision(last_chain, old_content, new_content):
+    """(chain, payload) for the revision after one at `last_chain`."""
+    if last_chain + 1 < SNAPSHOT_EVERY:
+        return last_chain + 1, delta(old_content, new_content)
+    return 0, new_content
+
+
+def list_revisions(client, note_id, user_id, limit=100):
+    response = client.table("note_revisions").select("version,chain,created_at") \
+        .eq("note_id", note_id).eq("user_id", user_id).order("version", desc=True).limit(limit).execute()
+    return [{
+        "version": row["version"],
+        "kind": "snapshot" if row["chain"] == 0 else "delta",
+        "created_at": row.get("created_at"),
+    } for row in response.data]
+
+
+def load_revision(client, note_id, user_id, version):
+    """Content of the note at `version`, or None if that revision is not kept."""
+    base = client.table("note_revisions").select("version") \
+        .eq("note_id", note_id).eq("user_id", user_id).eq("chain", 0).lte("version", version) \
+        .order("version", desc=True).limit(1).execute()
+    if not base.data:
+        return None
+    rows = client.table("note_revisions").select("version,chain,payload") \
+        .eq("note_id", note_id).eq("user_id", user_id) \
+        .gte("version", base.data[0]["version"]).lte("version", version).order("version").execute().data
+    if not rows or rows[-1]["version"] != version:
+        return None
+    content = rows[0]["payload"] or ""
+    for row in rows[1:]:
+        content = apply_ops(content, json.loads(row["payload"])) if row["chain"] else (row["payload"] or "")
+    return content
+
+
+def compact_note(client, note_id, cutoff, keep=None):
+    """Drop one note's revisions past retention. Returns how many were removed."""
+    keep = keep or KEEP
+    rows = client.table("note_revisions").select("version,chain,user_id,created_at") \
+        .eq("note_id", note_id).order("version", desc=True).execute().data
+    recent = sum(1 for row in rows if (row.get("created_at") or "") >= cutoff)
+    kept = max(keep, recent)
+    if len(rows) <= kept:
+        return 0
+    oldest = rows[kept - 1]
+    if oldest["chain"] != 0:
+        content = load_revision(client, note_id, oldest["user_id"], oldest["version"])
+        if content is None:
+            return 0
+        client.table("note_revisions").update({"chain": 0, "payload": content}) \
+            .eq("note_id", note_id).eq("version", oldest["version"]).execute()
+    client.table("note_revisions").delete().eq("note_id", note_id).lt("version", oldest["version"]).execute()
+    return len(rows) - kept
+
+
+def compact(client, keep=None, days=None, batch=500):
+    """One retention pass over the notes that have revisions to drop."""
+    keep = keep or KEEP
+    days = RETENTION_DAYS if days is None else days
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    removed = notes = 0
+    last_id = 0
+    while True:
+        # Only notes with an old revision and more than `keep` in all, so
+        # notes whose history is already within retention cost nothing
+        note_ids = client.rpc("note_history_candidates", {"p_cutoff": cutoff, "p_keep": keep,
+                                                          "p_after_id": last_id, "p_limit": batch}).execute().data or []
+        for note_id in note_ids:
+            count = compact_note(client, note_id, cutoff, keep)
+            if count:
+                removed += count
+                notes += 1
+        if len(note_ids) < batch:
+            break
+        last_id = note_ids[-1]
+    return {"notes": notes, "removed": removed}
+
+
+def start_compaction(client, interval=None):
+    """Run compact() every `interval` seconds on a daemon thread."""
+    interval = COMPACT_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                result = compact(client)
+                if result["removed"]:
+                    print(f"[History] Compacted {result['notes']} note(s), removed {result['removed']} revision(s)")
+            except Exception as e:
+                print(f"[History] Compaction failed: {e}")
+
+    thread = threading.Thread(target=loop, name="note-history-compaction", daemon=True)
+    thread.start()
+    return thread
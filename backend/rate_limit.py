@@ -0,0 +1,193 @@
+# Rate limiting and admission control for the Flask backend.
+#
+# Token buckets are kept per (route, caller) where the caller is the logged-in
+# user id when a valid token is sent, otherwise the client IP. Buckets live in
+# process memory by default, or in a Redis-compatible store when
+# RATE_LIMIT_REDIS_URL is set so every worker shares the same budget.
+#
+# X-Forwarded-For is only believed behind TRUSTED_PROXIES reverse proxies:
+# the client IP is then the address the outermost of them saw. With 0, the
+# default, anyone could pick their own key by sending the header, so the
+# socket address is used.
+#
+# Settings (.env):
+#   RATE_LIMIT_ENABLED=1
+#   RATE_LIMIT_REDIS_URL=redis://localhost:6379/0
+#   RATE_LIMIT_MAX_IN_FLIGHT=64
+#   TRUSTED_PROXIES=0
+
+import math
+import os
+import threading
+import time
+
+from flask import request, jsonify
+
+# Budgets per Flask endpoint name: (burst capacity, tokens refilled per second)
+DEFAULT_BUDGET = (120, 2.0)
+ROUTE_BUDGETS = {
+    "login": (10, 10 / 60),
+    "register": (5, 5 / 300),
+    "upload_file": (20, 20 / 60),
+    "import_note_to_files": (20, 20 / 60),
+    "trigger_check_reminders": (2, 1 / 60),
+    "create_short_url": (30, 30 / 60),
+    "import_short_urls": (5, 5 / 300),
+    "export_short_urls": (10, 10 / 60),
+    "redirect_short_url": (300, 50.0),
+}
+EXEMPT_ENDPOINTS = {"home", "serve_static", "static", "metrics"}
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "0"))
+# How often the memory backend drops buckets that have refilled completely
+SWEEP_SECONDS = 60
+
+
+class MemoryBackend:
+    """Token buckets stored in a dict. Only shared by threads of one process.
+
+    Every SWEEP_SECONDS the buckets that have refilled completely are dropped;
+    a missing bucket is a full one, so callers that went idle cost nothing.
+    """
+
+    def __init__(self, sweep_seconds=SWEEP_SECONDS):
+        # key -> (tokens, updated, time the bucket is full again)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._sweep_seconds = sweep_seconds
+        self._next_sweep = time.time() + sweep_seconds
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, capacity, rate, now=None):
+        """Take one token. Returns (allowed, seconds until a token is available)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now >= self._next_sweep:
+                self.sweep(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            return (True, 0.0) if allowed else (False, (1 - tokens) / rate)
+
+    def sweep(self, now):
+        """Drop the buckets that are full by `now`. Called with the lock held."""
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        self._next_sweep = now + self._sweep_seconds
+
+
+# Refill and take in one step on the server, so workers sharing a bucket
+# cannot both read the same count and each spend its last token
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+-- Drop idle buckets once they would have refilled completely
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Token buckets stored in a Redis-compatible store.
+
+    Each take is one Lua script (EVALSHA, falling back to EVAL), so the store
+    must run scripts: Redis, Valkey, or fakeredis with `lupa` for local runs.
+    """
+
+    def __init__(self, client, prefix="rl:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, rate, repr(float(now))])
+        return (True, 0.0) if allowed else (False, (1 - float(tokens)) / rate)
+
+
+def get_backend():
+    url = (os.environ.get("RATE_LIMIT_REDIS_URL") or "").strip()
+    if url:
+        import redis
+        return RedisBackend(redis.Redis.from_url(url))
+    return MemoryBackend()
+
+
+def client_ip():
+    if TRUSTED_PROXIES > 0:
+        # Each proxy appends the address it got the request from; entries
+        # further left were sent by the client and can be anything
+        forwarded = [ip.strip() for ip in request.headers.get("X-Forwarded-For", "").split(",") if ip.strip()]
+        if len(forwarded) >= TRUSTED_PROXIES:
+            return forwarded[-TRUSTED_PROXIES]
+    return request.remote_addr or "unknown"
+
+
+def too_many(retry_after, message, status=429):
+    response = jsonify({"message": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, int(math.ceil(retry_after))))
+    return response
+
+
+def init_rate_limiting(app, identify_user, backend=None, budgets=None, max_in_flight=None):
+    """Register the limiter on `app`.
+
+    `identify_user` maps the current request to a user id (or None), so the
+    limiter reuses the app's own token handling.
+    """
+    if (os.environ.get("RATE_LIMIT_ENABLED") or "1").strip().lower() not in ("1", "true", "yes"):
+        return None
+
+    backend = backend or get_backend()
+    route_budgets = dict(ROUTE_BUDGETS)
+    route_budgets.update(budgets or {})
+    if max_in_flight is None:
+        max_in_flight = int(os.environ.get("RATE_LIMIT_MAX_IN_FLIGHT", "64"))
+
+    state = {"in_flight": 0}
+    lock = threading.Lock()
+
+    @app.before_request
+    def admit_request():
+        endpoint = request.endpoint
+        if request.method == "OPTIONS" or endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        # Global load shedding: refuse new work once too many requests are running
+        with lock:
+            if state["in_flight"] >= max_in_flight:
+                return too_many(1, "Server busy, try again shortly", 503)
+            state["in_flight"] += 1
+        request.environ["rate_limit.admitted"] = True
+
+        user_id = identify_user()
+        caller = f"user:{user_id}" if user_id else f"ip:{client_ip()}"
+        capacity, rate = route_budgets.get(endpoint, DEFAULT_BUDGET)
+        allowed, retry_after = backend.take(f"{endpoint}:{caller}", capacity, rate)
+        if not allowed:
+            return too_many(retry_after, "Too many requests")
+        return None
+
+    @app.teardown_request
+    def release_request(exc=None):
+        if request.environ.pop("rate_limit.admitted", False):
+            with lock:
+                state["in_flight"] -= 1
+
+    return backend
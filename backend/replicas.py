@@ -0,0 +1,278 @@
+# Read replicas for the Supabase client.
+#
+# With SUPABASE_READ_URLS set, get_supabase() returns a RoutedClient: inserts,
+# updates, upserts, deletes and rpc calls go to the primary (SUPABASE_URL),
+# and selects may go to a replica, round robin. A select only leaves the
+# primary when all of these hold:
+#   - it runs inside a request whose view is marked @replica_reads (the list
+#     endpoints and the short URL redirect); everything else, including the
+#     background jobs, reads the primary as before
+#   - the request has not written anything yet
+#   - the user has not written in the last REPLICA_STICKY_SECONDS, so they
+#     read their own writes. Writes are remembered per process and in a
+#     read_primary_until cookie, which covers the other worker processes when
+#     the browser sends cookies (same origin)
+#   - the replica's replication_lag() is at most REPLICA_MAX_LAG_SECONDS.
+#     Lag is checked every REPLICA_LAG_CHECK_SECONDS; a replica that fails a
+#     query or the check is skipped until the next one, and the query is run
+#     on the primary instead.
+#
+# Settings (.env):
+#   SUPABASE_READ_URLS=             replica URLs, comma-separated (empty: primary only)
+#   SUPABASE_READ_KEY=              defaults to SUPABASE_KEY
+#   REPLICA_STICKY_SECONDS=5
+#   REPLICA_MAX_LAG_SECONDS=2
+#   REPLICA_LAG_CHECK_SECONDS=5
+
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+READ_URLS = [url.strip() for url in (os.environ.get("SUPABASE_READ_URLS") or "").split(",") if url.strip()]
+STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "2"))
+LAG_CHECK_SECONDS = float(os.environ.get("REPLICA_LAG_CHECK_SECONDS", "5"))
+COOKIE = "read_primary_until"
+
+# Functions that only read, so they may run on a replica like a select, and
+# the tables each one reads
+READ_ONLY_FUNCTIONS = {"file_folder_tree": ("file_folders",)}
+# Writers remembered per process before old entries are dropped
+MAX_WRITERS = 10000
+
+_route = ContextVar("replica_route", default=None)
+_last_write = {}
+_last_write_lock = threading.Lock()
+
+
+def replica_reads(view):
+    """Let a view's selects go to a replica (see the notes above)."""
+    view.replica_reads = True
+    return view
+
+
+def pinned(user_id, cookie=None, now=None):
+    """True while a user's reads must stay on the primary after a write."""
+    if STICKY_SECONDS <= 0:
+        return False
+    try:
+        if cookie and float(cookie) > time.time():
+            return True
+    except ValueError:
+        pass
+    with _last_write_lock:
+        last = _last_write.get(user_id)
+    return last is not None and (now or time.monotonic()) - last < STICKY_SECONDS
+
+
+def wrote():
+    """Record that the current request wrote; its later reads, and the user's
+    for REPLICA_STICKY_SECONDS, go to the primary."""
+    state = _route.get()
+    if state is None or state["wrote"]:
+        return
+    state["wrote"] = True
+    user_id = state["user_of"]()
+    if user_id is None:
+        return
+    now = time.monotonic()
+    with _last_write_lock:
+        if len(_last_write) >= MAX_WRITERS:
+            for key in [key for key, last in _last_write.items() if now - last >= STICKY_SECONDS]:
+                del _last_write[key]
+        _last_write[user_id] = now
+
+
+def reads_replica():
+    """True when the current request's next select may go to a replica."""
+    state = _route.get()
+    return bool(state and state["replica"] and not state["wrote"])
+
+
+def used():
+    """True when a select in the current request was answered by a replica."""
+    state = _route.get()
+    return bool(state and state["used"])
+
+
+@contextmanager
+def primary_reads():
+    """Run the selects inside on the primary."""
+    state = _route.get()
+    allowed = state["replica"] if state else False
+    if state:
+        state["replica"] = False
+    try:
+        yield
+    finally:
+        if state:
+            state["replica"] = allowed
+
+
+def init_read_routing(app, user_of):
+    """Open the routing state per request and set the cookie after writes."""
+    from flask import g, request
+
+    @app.before_request
+    def open_route():
+        view = app.view_functions.get(request.endpoint)
+        state = {"replica": False, "wrote": False, "used": False, "user_of": user_of}
+        if getattr(view, "replica_reads", False):
+            state["replica"] = not pinned(user_of(), request.cookies.get(COOKIE))
+        g.replica_route_token = _route.set(state)
+
+    @app.after_request
+    def remember_write(response):
+        state = _route.get()
+        if state and state["wrote"] and STICKY_SECONDS > 0:
+            response.set_cookie(COOKIE, str(math.ceil(time.time() + STICKY_SECONDS)), max_age=math.ceil(STICKY_SECONDS),
+                                httponly=True, samesite="Lax")
+        return response
+
+    @app.teardown_request
+    def close_route(exc=None):
+        token = g.pop("replica_route_token", None)
+        if token is not None:
+            _route.reset(token)
+
+
+class Replica:
+    """A replica's client and its last known lag."""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.lag = None
+        self.checked = None
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def usable(self, now):
+        # One request checks a due replica; the others go by the last result
+        if (self.checked is None or now - self.checked >= LAG_CHECK_SECONDS) and self._lock.acquire(blocking=False):
+            try:
+                self.check(now)
+            finally:
+                self._lock.release()
+        return now >= self.down_until and self.lag is not None and self.lag <= MAX_LAG_SECONDS
+
+    def check(self, now):
+        self.checked = now
+        try:
+            self.lag = float(self.client.rpc("replication_lag", {}).execute().data or 0)
+        except Exception as e:
+            self.lag = None
+            print(f"[Replicas] Lag check failed on {self.name}: {e}")
+
+    def failed(self, error):
+        now = time.monotonic()
+        self.down_until = now + LAG_CHECK_SECONDS
+        self.checked = now
+        print(f"[Replicas] {self.name} failed, reading the primary for {LAG_CHECK_SECONDS:g}s: {error}")
+
+
+class RoutedClient:
+    """Supabase client that sends writes to the primary and reads to replicas."""
+
+    def __init__(self, primary, replicas, on_read=None):
+        self.primary = primary
+        self.replicas = [r if isinstance(r, Replica) else Replica(f"replica {i + 1}", r)
+                         for i, r in enumerate(replicas)]
+        self.on_read = on_read
+        self._turn = itertools.count()
+
+    def replica(self):
+        """The replica for a read in the current request, or None for the primary."""
+        state = _route.get()
+        if not self.replicas or state is None or not state["replica"] or state["wrote"]:
+            return None
+        now = time.monotonic()
+        start = next(self._turn)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.usable(now):
+                return replica
+        return None
+
+    def table(self, name):
+        return RoutedTable(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        if fn in READ_ONLY_FUNCTIONS:
+            return ReplicaRead(self, lambda client: client.rpc(fn, params or {}, *args, **kwargs))
+        wrote()
+        return self.primary.rpc(fn, params or {}, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.primary, name)
+
+
+class RoutedTable:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def select(self, *args, **kwargs):
+        return ReplicaRead(self._client, lambda client: client.table(self._name)).select(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # insert, update, upsert and delete
+        wrote()
+        return getattr(self._client.primary.table(self._name), name)
+
+
+class ReplicaRead:
+    """A read whose builder is made on the client that serves it, at execute()."""
+
+    # Builder attributes that are properties rather than methods
+    PROPERTIES = {"not_"}
+
+    def __init__(self, client, start):
+        self._client = client
+        self._start = start
+        self._calls = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self.PROPERTIES:
+            self._calls.append((name, None))
+            return self
+
+        def call(*args, **kwargs):
+            self._calls.append((name, (args, kwargs)))
+            return self
+        return call
+
+    def _build(self, client):
+        query = self._start(client)
+        for name, arguments in self._calls:
+            attr = getattr(query, name)
+            query = attr if arguments is None else attr(*arguments[0], **arguments[1])
+        return query
+
+    def execute(self):
+        replica = self._client.replica()
+        if replica is not None:
+            try:
+                response = self._build(replica.client).execute()
+            except Exception as e:
+                # A PostgREST error (it has a code) would fail on the primary too
+                if getattr(e, "code", None):
+                    raise
+                replica.failed(e)
+            else:
+                _route.get()["used"] = True
+                if self._client.on_read:
+                    self._client.on_read("replica")
+                return response
+        if self._client.on_read:
+            self._client.on_read("primary")
+        return self._build(self._client.primary).execute()
@@ -0,0 +1,262 @@
+# Timeouts, retries, a circuit breaker and hedged reads for the Supabase client.
+#
+# `resilient(client)` wraps the client (the SQLite store too) so that every
+# execute():
+#   - has a deadline: DB_READ_TIMEOUT for selects and read-only functions,
+#     enforced here, and DB_WRITE_TIMEOUT for the rest, which get_supabase()
+#     gives the HTTP client as its timeout, so no call waits forever
+#   - when it reads, is retried after transient failures (connection errors,
+#     timeouts, PostgREST 5xx and connection-pool errors) up to
+#     DB_READ_RETRIES times, with exponential backoff and full jitter, while
+#     the deadline allows. Writes are not retried: a write that failed may
+#     still have committed
+#   - goes through a circuit breaker: after DB_BREAKER_FAILURES transient
+#     failures in a row, calls fail at once for DB_BREAKER_RESET_SECONDS, then
+#     one call is let through to probe and closes it again on success
+#   - with DB_HEDGE_AFTER_MS set, when it reads and has no answer after that
+#     long, is sent a second time; the first answer wins.
+# A call that gives up raises DatabaseUnavailable, which app.py answers with
+# 503 and Retry-After. Errors a retry cannot fix (constraint violations, bad
+# filters) are raised unchanged and do not count against the breaker.
+#
+# Settings (.env):
+#   DB_RESILIENCE=1
+#   DB_READ_TIMEOUT=5            seconds
+#   DB_WRITE_TIMEOUT=15          seconds
+#   DB_READ_RETRIES=2
+#   DB_RETRY_BACKOFF_MS=50
+#   DB_BREAKER_FAILURES=5        0 turns the breaker off
+#   DB_BREAKER_RESET_SECONDS=10
+#   DB_HEDGE_AFTER_MS=0          0 turns hedging off
+#   DB_READ_THREADS=32
+
+import contextvars
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from replicas import READ_ONLY_FUNCTIONS
+from tracing import OPERATIONS
+
+ENABLED = (os.environ.get("DB_RESILIENCE") or "1").strip().lower() in ("1", "true", "yes")
+READ_TIMEOUT = float(os.environ.get("DB_READ_TIMEOUT", "5"))
+WRITE_TIMEOUT = float(os.environ.get("DB_WRITE_TIMEOUT", "15"))
+READ_RETRIES = int(os.environ.get("DB_READ_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("DB_RETRY_BACKOFF_MS", "50")) / 1000.0
+BREAKER_FAILURES = int(os.environ.get("DB_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("DB_BREAKER_RESET_SECONDS", "10"))
+HEDGE_AFTER = float(os.environ.get("DB_HEDGE_AFTER_MS", "0")) / 1000.0
+READ_THREADS = int(os.environ.get("DB_READ_THREADS", "32"))
+
+# Postgres connection errors, too many connections, shutdown, and PostgREST's
+# "could not connect" / "schema cache" / "pool timeout" errors
+TRANSIENT_CODES = {"53300", "57P01", "57P02", "57P03", "PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+class DatabaseUnavailable(Exception):
+    """The database did not answer in time or the circuit is open."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def transient(error):
+    """True for failures of the connection or the server rather than the query."""
+    if isinstance(error, DatabaseUnavailable):
+        return True
+    code = str(getattr(error, "code", None) or "")
+    if code:
+        # Gateway errors come back with the HTTP status as the code
+        return code in TRANSIENT_CODES or code.startswith("08") or (code.isdigit() and int(code) >= 500)
+    # OSError covers TimeoutError and ConnectionError
+    return isinstance(error, OSError) or type(error).__module__.split(".")[0] in ("httpx", "httpcore")
+
+
+class CircuitBreaker:
+    """Fails calls fast after `failures` transient failures in a row."""
+
+    def __init__(self, failures=None, reset_seconds=None, record=None):
+        self.failures = BREAKER_FAILURES if failures is None else failures
+        self.reset_seconds = BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.record = record
+        self._count = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        """Return if a call may go ahead, otherwise raise DatabaseUnavailable."""
+        if self.failures <= 0 or self._opened_at is None:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            wait_for = self._opened_at + self.reset_seconds - time.monotonic()
+            if wait_for <= 0 and not self._probing:
+                # Half open: this call finds out whether the database is back
+                self._probing = True
+                return
+        if self.record:
+            self.record("db_breaker_rejections_total")
+        raise DatabaseUnavailable("Database unavailable", max(wait_for, 1.0))
+
+    def success(self):
+        if self._count == 0 and self._opened_at is None:
+            return
+        with self._lock:
+            if self._opened_at is not None:
+                print("[Database] Circuit closed")
+            self._count = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        if self.failures <= 0:
+            return
+        with self._lock:
+            self._count += 1
+            if self._probing or (self._opened_at is None and self._count >= self.failures):
+                if not self._probing:
+                    print(f"[Database] Circuit open after {self._count} failures, failing fast for "
+                          f"{self.reset_seconds:g}s")
+                    if self.record:
+                        self.record("db_breaker_opened_total")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class ResilientClient:
+    """Supabase client whose calls get deadlines, retries, the breaker and hedging."""
+
+    def __init__(self, client, record=None, read_timeout=None, retries=None, backoff=None, hedge_after=None,
+                 breaker=None, threads=None):
+        self._client = client
+        self.record = record
+        self.read_timeout = READ_TIMEOUT if read_timeout is None else read_timeout
+        self.retries = READ_RETRIES if retries is None else retries
+        self.backoff = RETRY_BACKOFF if backoff is None else backoff
+        self.hedge_after = HEDGE_AFTER if hedge_after is None else hedge_after
+        self.breaker = breaker or CircuitBreaker(record=record)
+        self._threads = threads or READ_THREADS
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def table(self, name):
+        return ResilientQuery(self, self._client.table(name), None)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        return ResilientQuery(self, self._client.rpc(fn, params or {}, *args, **kwargs), fn in READ_ONLY_FUNCTIONS)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _executor(self):
+        # Made on first use, so a forked worker gets its own threads
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix="db-read")
+        return self._pool
+
+    def run(self, execute, read):
+        self.breaker.allow()
+        deadline = time.monotonic() + self.read_timeout
+        attempt = 0
+        while True:
+            try:
+                result = self._read(execute, deadline) if read else execute()
+            except Exception as e:
+                if not transient(e):
+                    # The database answered; the query itself was refused
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                if not read or attempt >= self.retries or time.monotonic() + delay >= deadline:
+                    if isinstance(e, DatabaseUnavailable):
+                        raise
+                    raise DatabaseUnavailable(f"Database unavailable: {e}") from e
+                attempt += 1
+                if self.record:
+                    self.record("db_retries_total")
+                time.sleep(delay)
+                self.breaker.allow()
+                continue
+            self.breaker.success()
+            return result
+
+    def _read(self, execute, deadline):
+        """One attempt at a read, hedged when it is slow, within the deadline."""
+        pool = self._executor()
+        # Each run gets its own copy: one context cannot be entered twice at once
+        futures = [pool.submit(contextvars.copy_context().run, execute)]
+        if self.hedge_after and time.monotonic() + self.hedge_after < deadline:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                futures.append(pool.submit(contextvars.copy_context().run, execute))
+        pending = set(futures)
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and self.record:
+                        self.record("db_hedged_reads_total", {"winner": "first" if future is futures[0] else "hedge"})
+                    return future.result()
+                error = future.exception()
+        if pending or error is None:
+            raise DatabaseUnavailable(f"Database read timed out after {self.read_timeout:g}s")
+        raise error
+
+
+class ResilientQuery:
+    """Proxy for a request builder; its execute() goes through the client's policy."""
+
+    def __init__(self, client, builder, read):
+        self._client = client
+        self._builder = builder
+        self._read = read
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        read = self._read if self._read is not None or name not in OPERATIONS else name == "select"
+        if not callable(attr):
+            return ResilientQuery(self._client, attr, read) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return ResilientQuery(self._client, result, read) if hasattr(result, "execute") else result
+        return call
+
+    def execute(self):
+        return self._client.run(self._builder.execute, bool(self._read))
+
+
+def resilient(client, record=None):
+    return ResilientClient(client, record) if ENABLED else client
+
+
+def init_resilience(app):
+    """Answer calls that gave up with 503 instead of a 500."""
+    from flask import jsonify
+
+    @app.errorhandler(DatabaseUnavailable)
+    def database_unavailable(error):
+        response = jsonify({"message": "Service temporarily unavailable, try again shortly"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(max(1, int(math.ceil(error.retry_after))))
+        return response
@@ -0,0 +1,135 @@
+# Production server for the Flask backend.
+#
+#   cd backend
+#   python serve.py                       # I/O-bound profile
+#   SERVER_PROFILE=cpu python serve.py    # login/register heavy traffic
+#
+# Runs app.py under gunicorn (`python app.py` is the single-process debug
+# server, for development only). Worker and thread counts come from the CPU
+# count and a profile:
+#   io   one process per CPU with SERVER_THREADS (default 16) threads each. Most
+#        requests wait on Supabase with the GIL released, so threads overlap
+#        those waits cheaply.
+#   cpu  CPUs + 1 processes with 2 threads each. Password hashing holds the GIL,
+#        so only more processes add throughput; the second thread keeps a
+#        quick request from queueing behind a hash.
+# WEB_CONCURRENCY and SERVER_THREADS override the profile.
+#
+# The app is imported once in the master and forked (SERVER_PRELOAD=1), so
+# workers share its memory and start fast. Each worker then creates its own
+# Supabase client and background threads. On SIGTERM workers stop accepting,
+# finish in-flight requests for up to SERVER_GRACEFUL_TIMEOUT seconds and
+# flush pending clicks before exiting.
+#
+# Each worker keeps its own /metrics, rate-limit buckets (set
+# RATE_LIMIT_REDIS_URL to share them), click batch, alias filter and preview
+# pool.
+# gunicorn does not run on Windows; use WSL or `python app.py` there.
+#
+# Settings (.env):
+#   HOST=0.0.0.0
+#   PORT=9999
+#   SERVER_PROFILE=io
+#   WEB_CONCURRENCY=
+#   SERVER_THREADS=
+#   SERVER_PRELOAD=1
+#   SERVER_TIMEOUT=60
+#   SERVER_GRACEFUL_TIMEOUT=30
+#   SERVER_MAX_REQUESTS=0
+
+import os
+import sys
+
+PROFILES = ("io", "cpu")
+
+
+def concurrency(profile=None, cpus=None):
+    """(workers, threads) for a profile, honouring the env overrides."""
+    profile = (profile or os.environ.get("SERVER_PROFILE") or "io").strip().lower()
+    if profile not in PROFILES:
+        raise ValueError(f"SERVER_PROFILE must be one of {', '.join(PROFILES)}")
+    cpus = cpus or os.cpu_count() or 1
+    if profile == "cpu":
+        workers, threads = cpus + 1, 2
+    else:
+        workers, threads = cpus, 16
+    workers = int(os.environ.get("WEB_CONCURRENCY") or workers)
+    threads = int(os.environ.get("SERVER_THREADS") or threads)
+    return max(1, workers), max(1, threads)
+
+
+def options(profile=None, workers=None, threads=None, preload=None, bind=None):
+    default_workers, default_threads = concurrency(profile)
+    workers = workers or default_workers
+    threads = threads or default_threads
+    if preload is None:
+        preload = (os.environ.get("SERVER_PRELOAD") or "1").strip().lower() in ("1", "true", "yes")
+    max_requests = int(os.environ.get("SERVER_MAX_REQUESTS", "0"))
+    return {
+        "bind": bind or f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '9999')}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "preload_app": preload,
+        "timeout": int(os.environ.get("SERVER_TIMEOUT", "60")),
+        "graceful_timeout": int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", "30")),
+        "keepalive": 5,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "accesslog": None,
+        "post_fork": _post_fork,
+        "worker_exit": _worker_exit,
+    }
+
+
+def _post_fork(server, worker):
+    if server.cfg.preload_app:
+        import app as backend
+        backend.after_fork()
+
+
+def _worker_exit(server, worker):
+    import app as backend
+    try:
+        backend.before_exit()
+    except Exception as e:
+        print(f"[Server] Flush before exit failed: {e}")
+
+
+def load_app(preload):
+    if preload:
+        # Background threads are started per worker by _post_fork
+        os.environ["DEFER_BACKGROUND_TASKS"] = "1"
+    import app as backend
+    return backend.app
+
+
+def run(app_loader=load_app, **overrides):
+    """Serve with gunicorn. `app_loader(preload)` returns the WSGI app."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("[Server] gunicorn is not installed: pip install -r requirements.txt "
+              "(on Windows use WSL, or `python app.py` for development)")
+        return 1
+
+    settings = options(**overrides)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app_loader(settings["preload_app"])
+
+    print(f"[Server] {settings['workers']} worker(s) x {settings['threads']} thread(s) "
+          f"({settings['worker_class']}) on {settings['bind']}")
+    Server().run()
+    return 0
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+    sys.exit(run())
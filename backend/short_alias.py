@@ -0,0 +1,45 @@
+# Server-generated short-URL aliases.
+#
+# An alias is a fixed-width base62 string taken from HMAC-SHA256(key, process
+# prefix + counter). The counter makes aliases unique within a process, the
+# random prefix separates processes, and the key keeps them unguessable.
+# Callers insert straight away and only ask for another alias, one character
+# longer, when the unique index on short_urls.alias rejects it, so creating a
+# link needs no existence check.
+#
+# Settings (.env):
+#   SHORT_ALIAS_LENGTH=7
+#   SHORT_ALIAS_KEY=      (defaults to SECRET_KEY)
+
+import hashlib
+import hmac
+import itertools
+import os
+import re
+import string
+
+ALPHABET = string.digits + string.ascii_letters
+ALIAS_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MAX_ATTEMPTS = 5
+
+
+def base62(value, width):
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 62)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+class AliasGenerator:
+    def __init__(self, key, length=7):
+        self.key = key.encode() if isinstance(key, str) else key
+        self.length = length
+        self.prefix = os.urandom(8)
+        self.counter = itertools.count()
+
+    def next(self, attempt=0):
+        """A new alias; later attempts after a collision are one character longer."""
+        width = self.length + attempt
+        digest = hmac.new(self.key, self.prefix + next(self.counter).to_bytes(8, "big"), hashlib.sha256).digest()
+        return base62(int.from_bytes(digest, "big") % (62 ** width), width)
@@ -0,0 +1,129 @@
+# Bulk import and export of short URLs.
+#
+# Imports are read line by line from the request stream as CSV (with a header
+# row) or NDJSON and handed to the caller in chunks, so one alias lookup and
+# one insert cover IMPORT_CHUNK_SIZE rows. Exports page through the table by
+# id and are written out a page at a time, so neither side holds every link.
+#
+# Settings (.env):
+#   IMPORT_CHUNK_SIZE=500
+#   IMPORT_MAX_ROWS=50000
+
+import csv
+import io
+import json
+import os
+from urllib.parse import urlparse
+
+from short_alias import ALIAS_PATTERN
+
+CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+MAX_ROWS = int(os.environ.get("IMPORT_MAX_ROWS", "50000"))
+EXPORT_PAGE_SIZE = 1000
+EXPORT_COLUMNS = ("alias", "original_url", "title", "clicks", "created_at", "short_url")
+
+# Header names used by other shorteners' exports, mapped to ours
+COLUMN_NAMES = {
+    "original_url": "original_url", "url": "original_url", "long_url": "original_url",
+    "destination": "original_url", "target": "original_url",
+    "alias": "alias", "slug": "alias", "short_code": "alias", "code": "alias", "keyword": "alias", "back_half": "alias",
+    "title": "title", "name": "title",
+}
+
+
+class ImportLimitError(ValueError):
+    pass
+
+
+def detect_format(content_type, requested=None):
+    fmt = (requested or "").strip().lower()
+    if fmt in ("csv", "ndjson"):
+        return fmt
+    content_type = (content_type or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    return "csv"
+
+
+def _text_lines(stream):
+    first = True
+    for raw in stream:
+        line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        yield line
+
+
+def clean_row(data):
+    """Normalise one input record. Raises ValueError with a message for the report."""
+    row = {}
+    for key, value in data.items():
+        column = COLUMN_NAMES.get(str(key).strip().lower().replace(" ", "_").replace("-", "_"))
+        if column and value not in (None, ""):
+            row[column] = str(value).strip()
+    url = row.get("original_url", "")
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        raise ValueError("original_url must be an http(s) URL")
+    alias = row.get("alias", "")
+    if alias and not ALIAS_PATTERN.match(alias):
+        raise ValueError("alias can only contain letters, numbers, hyphens, and underscores")
+    return {"original_url": url, "alias": alias or None, "title": (row.get("title") or "Untitled")[:500]}
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row or None, error or None) for each record in the upload."""
+    lines = _text_lines(stream)
+    if fmt == "ndjson":
+        records = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+        for number, line in records:
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise ValueError("each line must be a JSON object")
+                yield number, clean_row(data), None
+            except ValueError as e:
+                yield number, None, str(e)
+        return
+    reader = csv.DictReader(lines)
+    for data in reader:
+        if not any((value or "").strip() for value in data.values() if isinstance(value, str)):
+            continue
+        try:
+            yield reader.line_num, clean_row(data), None
+        except ValueError as e:
+            yield reader.line_num, None, str(e)
+
+
+def chunked(rows, size=None):
+    size = size or CHUNK_SIZE
+    chunk = []
+    for count, item in enumerate(rows, 1):
+        if count > MAX_ROWS:
+            raise ImportLimitError(f"at most {MAX_ROWS} rows per import")
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_lines(pages, fmt):
+    """Yield the export body a page at a time from an iterator of row pages."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for page in pages:
+            for row in page:
+                writer.writerow([row.get(column) if row.get(column) is not None else "" for column in EXPORT_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+    for page in pages:
+        yield "".join(json.dumps({column: row.get(column) for column in EXPORT_COLUMNS}) + "\n" for row in page)
@@ -0,0 +1,226 @@
+# Request coalescing ("single flight") for identical concurrent reads.
+#
+# `coalescing(client)` wraps the client so a select (or read-only function)
+# that is identical to one already running, same table, columns, filters
+# and modifiers, waits for that call and gets a copy of its result instead
+# of sending its own. A viral /s/<alias> or the same list loaded from several
+# tabs then costs one database call per burst rather than one per request.
+#
+# A read only joins a call that started after the last write this process
+# made to the same table (and after its last write through a function), so a
+# user's own write is never hidden behind an older call. A read-only function
+# goes by the tables it reads (READ_ONLY_FUNCTIONS), and a table that triggers
+# or cascades change also by the tables that change it (CHANGED_BY). Reads that may go to
+# a replica and reads that must stay on the primary (replicas.py) do not
+# share calls either.
+#
+# SingleFlight serves threads; AsyncSingleFlight is the same for coroutines
+# (worker.py keeps its own copy for the redirect lookup). Collapsed calls are
+# counted in db_reads_coalesced_total.
+#
+# Settings (.env):
+#   SINGLE_FLIGHT=1
+
+import asyncio
+import copy
+import os
+import threading
+
+import replicas
+from replicas import READ_ONLY_FUNCTIONS
+from tracing import OPERATIONS
+
+ENABLED = (os.environ.get("SINGLE_FLIGHT") or "1").strip().lower() in ("1", "true", "yes")
+
+# Tables that change when others are written, per supabase_setup.sql
+CHANGED_BY = {
+    # count_user_usage
+    "user_usage": ("files", "todos", "notes", "short_urls"),
+    # count_folder_files
+    "file_folders": ("files",),
+    # record_note_revision, and ON DELETE CASCADE
+    "note_revisions": ("notes",),
+    "file_previews": ("files",),
+    "short_url_clicks": ("short_urls",),
+}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Threads asking for the same key while a call runs share its result.
+
+    With `copy` given, every caller of a shared call gets its own copy, so
+    none sees what another one changes.
+    """
+
+    def __init__(self, copy=None):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._copy = copy
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        """(result, shared): fn()'s result, and whether the call was shared."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return (self._copy(call.result) if self._copy else call.result), True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        # No one joins once the key is gone, so waiters is final here
+        if call.waiters and self._copy:
+            return self._copy(call.result), True
+        return call.result, bool(call.waiters)
+
+
+class AsyncSingleFlight:
+    """Coroutines awaiting the same key while a call runs share its result,
+    as SingleFlight does for threads."""
+
+    def __init__(self, copy=None):
+        self._calls = {}
+        self._copy = copy
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key, fn):
+        """(result, shared) for `await fn()`."""
+        entry = self._calls.get(key)
+        if entry is not None:
+            entry[1] += 1
+            self.collapsed += 1
+            # shield: a follower that is cancelled must not cancel the call
+            result = await asyncio.shield(entry[0])
+            return (self._copy(result) if self._copy else result), True
+        entry = self._calls[key] = [asyncio.get_running_loop().create_future(), 0]
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            entry[0].cancel()
+            raise
+        except BaseException as e:
+            entry[0].set_exception(e)
+            # Marks it retrieved when no follower was waiting
+            entry[0].exception()
+            raise
+        else:
+            entry[0].set_result(result)
+        finally:
+            del self._calls[key]
+        if entry[1] and self._copy:
+            return self._copy(result), True
+        return result, bool(entry[1])
+
+
+class CoalescingClient:
+    """Supabase client whose identical concurrent reads share one call."""
+
+    def __init__(self, client, record=None, flights=None):
+        self._client = client
+        self.record = record
+        # Callers may change what they get, so each gets its own copy
+        self.flights = flights or SingleFlight(copy.deepcopy)
+        # Writes per table, and through functions, made by this process
+        self._writes = {}
+        self._function_writes = 0
+
+    def table(self, name):
+        return CoalescedQuery(self, self._client.table(name), name, None, ())
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        builder = self._client.rpc(fn, params or {}, *args, **kwargs)
+        return CoalescedQuery(self, builder, None, fn in READ_ONLY_FUNCTIONS, (("rpc", (fn, params, args), kwargs),))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def wrote(self, table):
+        # Only ever incremented, so a lost race just starts one more call
+        if table is None:
+            self._function_writes += 1
+        else:
+            self._writes[table] = self._writes.get(table, 0) + 1
+
+    def run(self, query):
+        if not query._read:
+            try:
+                return query._builder.execute()
+            finally:
+                self.wrote(query._table)
+        tables = (query._table,) if query._table else READ_ONLY_FUNCTIONS[query._calls[0][1][0]]
+        sources = sorted({source for table in tables for source in (table, *CHANGED_BY.get(table, ()))})
+        key = repr((query._table, tuple(self._writes.get(source, 0) for source in sources), self._function_writes,
+                    replicas.reads_replica(), query._calls))
+        result, shared = self.flights.do(key, query._builder.execute)
+        if shared and self.record:
+            self.record("db_reads_coalesced_total", {"table": query._table or f"rpc:{query._calls[0][1][0]}"})
+        return result
+
+
+class CoalescedQuery:
+    """Proxy for a request builder that remembers the call chain as the key."""
+
+    def __init__(self, client, builder, table, read, calls):
+        self._client = client
+        self._builder = builder
+        self._table = table
+        self._read = read
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        read = self._read if self._read is not None or name not in OPERATIONS else name == "select"
+        if not callable(attr):
+            if attr is self._builder:
+                self._calls += ((name, (), {}),)
+                return self
+            return (CoalescedQuery(self._client, attr, self._table, read, self._calls + ((name, (), {}),))
+                    if hasattr(attr, "execute") else attr)
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self._builder:
+                # Builders that change in place and return themselves
+                self._calls += ((name, args, kwargs),)
+                self._read = read
+                return self
+            if hasattr(result, "execute"):
+                return CoalescedQuery(self._client, result, self._table, read, self._calls + ((name, args, kwargs),))
+            return result
+        return call
+
+    def execute(self):
+        return self._client.run(self)
+
+
+def coalescing(client, record=None):
+    return CoalescingClient(client, record) if ENABLED else client
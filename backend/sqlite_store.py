@@ -0,0 +1,749 @@
+# Embedded SQLite storage for single-node installs.
+#
+# SQLiteClient offers the part of the Supabase query builder the app uses
+# (table().select/insert/update/upsert/delete, eq/neq/gt/gte/lt/lte/in_/is_/
+# like/ilike, order/limit/range, execute) on a local database in WAL mode, so
+# handlers run unchanged without the network hop to hosted Supabase.
+# Needs SQLite 3.35+ for RETURNING.
+#
+# Settings (.env):
+#   STORAGE_BACKEND=sqlite
+#   SQLITE_PATH=data.db
+
+import re
+import sqlite3
+import threading
+import uuid
+
+import folder_tree
+import note_history
+import todo_due
+import usage
+from text_patch import PatchError, apply_ops
+
+NOW = "(strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"
+
+# Same tables as supabase_setup.sql
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    time_zone TEXT NOT NULL DEFAULT 'UTC',
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    folder_id INTEGER,
+    title TEXT,
+    priority TEXT,
+    due_date TEXT,
+    due_time TEXT DEFAULT '23:59',
+    completed INTEGER DEFAULT 0,
+    reminder_sent INTEGER DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
+    due_at TEXT,
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS notebooks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    notebook_id INTEGER NOT NULL,
+    section TEXT NOT NULL DEFAULT 'General',
+    title TEXT NOT NULL,
+    content TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT DEFAULT {NOW},
+    updated_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS file_folders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    parent_id INTEGER,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    byte_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    mime_type TEXT,
+    size INTEGER DEFAULT 0,
+    data TEXT,
+    folder_id INTEGER,
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT DEFAULT {NOW},
+    modified_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS short_urls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    original_url TEXT NOT NULL,
+    alias TEXT UNIQUE NOT NULL,
+    short_url TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT 'Untitled',
+    clicks INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS note_revisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    chain INTEGER NOT NULL DEFAULT 0,
+    payload TEXT,
+    created_at TEXT DEFAULT {NOW},
+    UNIQUE (note_id, version)
+);
+
+CREATE TABLE IF NOT EXISTS short_url_clicks (
+    short_url_id INTEGER NOT NULL REFERENCES short_urls (id) ON DELETE CASCADE,
+    granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+    bucket TEXT NOT NULL,
+    referrer TEXT NOT NULL DEFAULT '',
+    agent TEXT NOT NULL DEFAULT '',
+    country TEXT NOT NULL DEFAULT '',
+    clicks INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (short_url_id, granularity, bucket, referrer, agent, country)
+);
+
+CREATE TABLE IF NOT EXISTS file_previews (
+    file_id INTEGER PRIMARY KEY REFERENCES files (id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('ready', 'none', 'failed')),
+    mime_type TEXT,
+    data TEXT,
+    digest TEXT,
+    created_at TEXT DEFAULT {NOW}
+);
+
+CREATE TABLE IF NOT EXISTS user_usage (
+    user_id TEXT PRIMARY KEY,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    file_bytes INTEGER NOT NULL DEFAULT 0,
+    todo_count INTEGER NOT NULL DEFAULT 0,
+    note_count INTEGER NOT NULL DEFAULT 0,
+    short_url_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT {NOW}
+);
+
+-- record_note_revision in supabase_setup.sql; note_diff and note_snapshot_every
+-- are Python functions registered on each connection
+CREATE TRIGGER IF NOT EXISTS notes_history_insert AFTER INSERT ON notes
+BEGIN
+    INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+    VALUES (NEW.id, NEW.user_id, NEW.version, 0, NEW.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS notes_history_update AFTER UPDATE OF content ON notes
+WHEN OLD.content IS NOT NEW.content
+BEGIN
+    INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+    SELECT OLD.id, OLD.user_id, OLD.version, 0, OLD.content
+    WHERE NOT EXISTS (SELECT 1 FROM note_revisions WHERE note_id = OLD.id);
+    INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+    SELECT NEW.id, NEW.user_id, NEW.version,
+           CASE WHEN last.chain + 1 < note_snapshot_every() THEN last.chain + 1 ELSE 0 END,
+           CASE WHEN last.chain + 1 < note_snapshot_every() THEN note_diff(OLD.content, NEW.content) ELSE NEW.content END
+    FROM (SELECT chain FROM note_revisions WHERE note_id = NEW.id ORDER BY version DESC LIMIT 1) AS last;
+END;
+
+-- reset_todo_reminder in supabase_setup.sql
+CREATE TRIGGER IF NOT EXISTS todos_reset_reminder AFTER UPDATE OF due_date, due_time ON todos
+WHEN OLD.due_date IS NOT NEW.due_date OR OLD.due_time IS NOT NEW.due_time
+BEGIN
+    UPDATE todos SET reminder_sent = 0 WHERE id = NEW.id;
+END;
+
+CREATE INDEX IF NOT EXISTS folders_user_id_idx ON folders (user_id);
+CREATE INDEX IF NOT EXISTS todos_user_id_idx ON todos (user_id, folder_id);
+CREATE INDEX IF NOT EXISTS notebooks_user_id_idx ON notebooks (user_id);
+CREATE INDEX IF NOT EXISTS notes_user_id_idx ON notes (user_id, notebook_id);
+CREATE INDEX IF NOT EXISTS file_folders_user_id_idx ON file_folders (user_id, parent_id);
+CREATE INDEX IF NOT EXISTS files_user_id_idx ON files (user_id, folder_id);
+CREATE INDEX IF NOT EXISTS short_urls_user_id_idx ON short_urls (user_id);
+"""
+
+# count_user_usage in supabase_setup.sql: (trigger, event, table, row, counter
+# deltas as SQL)
+USAGE_TRIGGERS = [
+    ("files_usage_insert", "INSERT", "files", "NEW", {"file_count": "1", "file_bytes": "COALESCE(NEW.size, 0)"}),
+    ("files_usage_delete", "DELETE", "files", "OLD", {"file_count": "-1", "file_bytes": "-COALESCE(OLD.size, 0)"}),
+    ("files_usage_size", "UPDATE OF size", "files", "NEW",
+     {"file_bytes": "COALESCE(NEW.size, 0) - COALESCE(OLD.size, 0)"}),
+    ("todos_usage_insert", "INSERT", "todos", "NEW", {"todo_count": "1"}),
+    ("todos_usage_delete", "DELETE", "todos", "OLD", {"todo_count": "-1"}),
+    ("notes_usage_insert", "INSERT", "notes", "NEW", {"note_count": "1"}),
+    ("notes_usage_delete", "DELETE", "notes", "OLD", {"note_count": "-1"}),
+    ("short_urls_usage_insert", "INSERT", "short_urls", "NEW", {"short_url_count": "1"}),
+    ("short_urls_usage_delete", "DELETE", "short_urls", "OLD", {"short_url_count": "-1"}),
+]
+USAGE_TRIGGERS_SQL = "".join(f"""
+CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}
+BEGIN
+    INSERT INTO user_usage (user_id, {", ".join(deltas)}) VALUES ({row}.user_id, {", ".join(deltas.values())})
+    ON CONFLICT (user_id) DO UPDATE SET {", ".join(f"{column} = {column} + excluded.{column}" for column in deltas)},
+        updated_at = {NOW};
+END;
+""" for name, event, table, row, deltas in USAGE_TRIGGERS) + """
+-- The storage quota check of count_user_usage. Writes take the database's
+-- write lock before these run, so concurrent uploads are checked in turn.
+CREATE TRIGGER IF NOT EXISTS files_quota_insert BEFORE INSERT ON files
+WHEN storage_quota_bytes() > 0 AND COALESCE(NEW.size, 0) > 0
+BEGIN
+    SELECT RAISE(ABORT, 'Storage quota exceeded')
+    WHERE COALESCE((SELECT file_bytes FROM user_usage WHERE user_id = NEW.user_id), 0) + NEW.size > storage_quota_bytes();
+END;
+CREATE TRIGGER IF NOT EXISTS files_quota_size BEFORE UPDATE OF size ON files
+WHEN storage_quota_bytes() > 0 AND COALESCE(NEW.size, 0) > COALESCE(OLD.size, 0)
+BEGIN
+    SELECT RAISE(ABORT, 'Storage quota exceeded')
+    WHERE COALESCE((SELECT file_bytes FROM user_usage WHERE user_id = NEW.user_id), 0)
+          + NEW.size - COALESCE(OLD.size, 0) > storage_quota_bytes();
+END;
+"""
+
+# Columns added after the first release, applied to existing databases on open
+ADDED_COLUMNS = [
+    ("todos", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("notes", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("files", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("users", "time_zone", "TEXT NOT NULL DEFAULT 'UTC'"),
+    ("todos", "due_at", "TEXT"),
+    ("file_folders", "file_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("file_folders", "byte_count", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Indexes and triggers on added columns, created once the columns exist
+ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS todos_user_due_at_idx ON todos (user_id, due_at);
+CREATE INDEX IF NOT EXISTS todos_reminder_due_idx ON todos (due_at) WHERE completed = 0 AND reminder_sent = 0;
+
+-- set_todo_due_at in supabase_setup.sql; todo_due_at is a Python function
+-- registered on each connection
+CREATE TRIGGER IF NOT EXISTS todos_set_due_at_insert AFTER INSERT ON todos
+BEGIN
+    UPDATE todos SET due_at = todo_due_at(NEW.due_date, NEW.due_time,
+                                          (SELECT time_zone FROM users WHERE id = NEW.user_id))
+    WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS todos_set_due_at_update AFTER UPDATE OF due_date, due_time ON todos
+BEGIN
+    UPDATE todos SET due_at = todo_due_at(NEW.due_date, NEW.due_time,
+                                          (SELECT time_zone FROM users WHERE id = NEW.user_id))
+    WHERE id = NEW.id;
+END;
+
+-- count_folder_files in supabase_setup.sql
+CREATE TRIGGER IF NOT EXISTS files_count_folder_insert AFTER INSERT ON files
+WHEN NEW.folder_id IS NOT NULL
+BEGIN
+    UPDATE file_folders SET file_count = file_count + 1, byte_count = byte_count + COALESCE(NEW.size, 0)
+    WHERE id = NEW.folder_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_count_folder_delete AFTER DELETE ON files
+WHEN OLD.folder_id IS NOT NULL
+BEGIN
+    UPDATE file_folders SET file_count = file_count - 1, byte_count = byte_count - COALESCE(OLD.size, 0)
+    WHERE id = OLD.folder_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_count_folder_update AFTER UPDATE OF folder_id, size ON files
+BEGIN
+    UPDATE file_folders SET file_count = file_count - 1, byte_count = byte_count - COALESCE(OLD.size, 0)
+    WHERE id = OLD.folder_id;
+    UPDATE file_folders SET file_count = file_count + 1, byte_count = byte_count + COALESCE(NEW.size, 0)
+    WHERE id = NEW.folder_id;
+END;
+"""
+
+# Run once when the column is added (the last of a group), for rows written
+# before it existed
+BACKFILLS = {
+    ("file_folders", "byte_count"): """
+        UPDATE file_folders SET
+            file_count = (SELECT count(*) FROM files WHERE files.folder_id = file_folders.id),
+            byte_count = (SELECT COALESCE(sum(size), 0) FROM files WHERE files.folder_id = file_folders.id)
+    """,
+}
+
+UUID_TABLES = {"users"}
+# Tables whose version is bumped on every update (the bump_version trigger in Postgres)
+VERSIONED_TABLES = {"todos", "notes", "files"}
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class StorageError(Exception):
+    """Raised for constraint violations, shaped like postgrest's APIError."""
+
+    def __init__(self, message, code=None, details=None):
+        self.message = message
+        self.code = code
+        self.details = details
+        super().__init__(message)
+
+
+class SQLiteResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _ident(name):
+    if not IDENTIFIER.match(name):
+        raise StorageError(f"invalid identifier {name!r}", "42602")
+    return f'"{name}"'
+
+
+def _translate(error):
+    message = str(error)
+    if "UNIQUE constraint failed" in message:
+        column = message.rsplit(".", 1)[-1]
+        return StorageError(f'duplicate key value violates unique constraint "{column}"', "23505", message)
+    if "NOT NULL constraint failed" in message:
+        return StorageError(f"null value violates not-null constraint: {message}", "23502", message)
+    if message == "Storage quota exceeded":
+        return StorageError(message, usage.QUOTA_EXCEEDED, message)
+    return StorageError(message, "P0001", message)
+
+
+class SQLiteQuery:
+    def __init__(self, client, table):
+        _ident(table)
+        self.client = client
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.where = []
+        self.params = []
+        self.orders = []
+        self.limit_count = None
+        self.offset = 0
+        self.count_mode = None
+        self.on_conflict = None
+        self.single_row = False
+
+    # Operations
+    def select(self, columns="*", count=None, **kwargs):
+        self.columns = columns
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict="id", **kwargs):
+        self.operation = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values, **kwargs):
+        self.operation = "update"
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    # Filters
+    def _compare(self, column, op, value):
+        self.where.append(f"{_ident(column)} {OPERATORS[op]} ?")
+        self.params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._compare(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._compare(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._compare(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._compare(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._compare(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._compare(column, "lte", value)
+
+    def like(self, column, pattern):
+        self.where.append(f"{_ident(column)} LIKE ?")
+        self.params.append(pattern)
+        return self
+
+    def ilike(self, column, pattern):
+        self.where.append(f"lower({_ident(column)}) LIKE lower(?)")
+        self.params.append(pattern)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self.where.append("0")
+            return self
+        self.where.append(f"{_ident(column)} IN ({', '.join('?' * len(values))})")
+        self.params.extend(values)
+        return self
+
+    def is_(self, column, value):
+        if value in (None, "null"):
+            self.where.append(f"{_ident(column)} IS NULL")
+        else:
+            self.where.append(f"{_ident(column)} IS ?")
+            self.params.append(value)
+        return self
+
+    # Modifiers
+    def order(self, column, desc=False, **kwargs):
+        # PostgREST defaults: NULLS LAST ascending, NULLS FIRST descending
+        self.orders.append(f"{_ident(column)} {'DESC NULLS FIRST' if desc else 'ASC NULLS LAST'}")
+        return self
+
+    def limit(self, count, **kwargs):
+        self.limit_count = int(count)
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset = int(start)
+        self.limit_count = int(end) - int(start) + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def maybe_single(self):
+        return self.single()
+
+    def _projection(self):
+        if self.columns.strip() == "*":
+            return "*"
+        return ", ".join(_ident(c.strip()) for c in self.columns.split(","))
+
+    def _where_sql(self):
+        return f" WHERE {' AND '.join(self.where)}" if self.where else ""
+
+    def _rows(self, payload):
+        rows = payload if isinstance(payload, list) else [payload]
+        prepared = []
+        for row in rows:
+            row = dict(row)
+            if self.table_name in UUID_TABLES and row.get("id") is None:
+                row["id"] = str(uuid.uuid4())
+            prepared.append(row)
+        return prepared
+
+    def _insert_sql(self, row, conflict=None):
+        columns = list(row)
+        sql = (f"INSERT INTO {_ident(self.table_name)} ({', '.join(_ident(c) for c in columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        if conflict:
+            keys = [k.strip() for k in conflict.split(",")]
+            updates = [c for c in columns if c not in keys]
+            action = (f"DO UPDATE SET {', '.join(f'{_ident(c)} = excluded.{_ident(c)}' for c in updates)}"
+                      if updates else "DO NOTHING")
+            sql += f" ON CONFLICT ({', '.join(_ident(k) for k in keys)}) {action}"
+        return sql + " RETURNING *", [row[c] for c in columns]
+
+    def execute(self):
+        conn = self.client.connection()
+        table = _ident(self.table_name)
+        try:
+            with conn:
+                count = None
+                if self.operation == "select":
+                    sql = f"SELECT {self._projection()} FROM {table}{self._where_sql()}"
+                    if self.orders:
+                        sql += " ORDER BY " + ", ".join(self.orders)
+                    if self.limit_count is not None or self.offset:
+                        sql += f" LIMIT {self.limit_count if self.limit_count is not None else -1} OFFSET {self.offset}"
+                    data = [dict(r) for r in conn.execute(sql, self.params)]
+                    if self.count_mode:
+                        count = conn.execute(f"SELECT count(*) FROM {table}{self._where_sql()}", self.params).fetchone()[0]
+                elif self.operation in ("insert", "upsert"):
+                    data = []
+                    for row in self._rows(self.payload):
+                        sql, params = self._insert_sql(row, self.on_conflict if self.operation == "upsert" else None)
+                        data.extend(dict(r) for r in conn.execute(sql, params))
+                elif self.operation == "update":
+                    if not self.payload:
+                        data = []
+                    else:
+                        assignments = ", ".join(f"{_ident(c)} = ?" for c in self.payload)
+                        if self.table_name in VERSIONED_TABLES and "version" not in self.payload:
+                            assignments += ', "version" = "version" + 1'
+                        sql = f"UPDATE {table} SET {assignments}{self._where_sql()} RETURNING *"
+                        data = [dict(r) for r in conn.execute(sql, list(self.payload.values()) + self.params)]
+                else:
+                    sql = f"DELETE FROM {table}{self._where_sql()} RETURNING *"
+                    data = [dict(r) for r in conn.execute(sql, self.params)]
+        except sqlite3.IntegrityError as e:
+            raise _translate(e) from e
+        if self.single_row:
+            data = data[0] if data else None
+        return SQLiteResponse(data, count)
+
+
+def register_user(conn, p_username, p_email, p_password):
+    user_id = str(uuid.uuid4())
+    conn.execute("INSERT INTO users (id, username, email, password) VALUES (?, ?, ?, ?)",
+                 (user_id, p_username, p_email, p_password))
+    conn.execute("INSERT INTO folders (user_id, name) VALUES (?, 'General')", (user_id,))
+    conn.execute("INSERT INTO notebooks (user_id, name) VALUES (?, 'My First Notebook')", (user_id,))
+    return user_id
+
+
+def apply_note_patch(conn, p_note_id, p_user_id, p_base_version, p_ops, p_title=None, p_section=None):
+    row = conn.execute("SELECT content, version FROM notes WHERE id = ? AND user_id = ?",
+                       (p_note_id, p_user_id)).fetchone()
+    if row is None:
+        raise StorageError("note not found", "P0002")
+    if row["version"] != p_base_version:
+        raise StorageError(f"stale base version, current is {row['version']}", "40001")
+    try:
+        body = apply_ops(row["content"], p_ops)
+    except PatchError as e:
+        raise StorageError(str(e), "22023") from e
+    version = conn.execute(
+        "UPDATE notes SET content = ?, title = COALESCE(?, title), section = COALESCE(?, section), "
+        f"updated_at = {NOW}, version = version + 1 WHERE id = ? RETURNING version",
+        (body, p_title, p_section, p_note_id)).fetchone()[0]
+    return {"version": version, "length": len(body)}
+
+
+def add_click_rollups(conn, p_rows):
+    existing = {row[0] for row in conn.execute(
+        f"SELECT id FROM short_urls WHERE id IN ({', '.join('?' * len(p_rows))})",
+        [r["short_url_id"] for r in p_rows])} if p_rows else set()
+    rows = [r for r in p_rows if r["short_url_id"] in existing]
+    upsert = ("INSERT INTO short_url_clicks (short_url_id, granularity, bucket, referrer, agent, country, clicks) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (short_url_id, granularity, bucket, referrer, agent, country) "
+              "DO UPDATE SET clicks = clicks + excluded.clicks")
+    for granularity, bucket in (("hour", lambda hour: hour), ("day", lambda hour: hour[:10] + "T00:00:00+00:00")):
+        conn.executemany(upsert, [(r["short_url_id"], granularity, bucket(r["hour"]), r.get("referrer") or "",
+                                   r.get("agent") or "", r.get("country") or "", r["clicks"]) for r in rows])
+    totals = {}
+    for r in rows:
+        totals[r["short_url_id"]] = totals.get(r["short_url_id"], 0) + r["clicks"]
+    conn.executemany("UPDATE short_urls SET clicks = COALESCE(clicks, 0) + ? WHERE id = ?",
+                     [(clicks, short_url_id) for short_url_id, clicks in totals.items()])
+    return sum(totals.values())
+
+
+def note_history_candidates(conn, p_cutoff, p_keep, p_after_id, p_limit):
+    return [row[0] for row in conn.execute(
+        "SELECT note_id FROM note_revisions WHERE note_id IN (SELECT note_id FROM note_revisions "
+        "WHERE created_at < ? AND note_id > ?) GROUP BY note_id HAVING count(*) > ? ORDER BY note_id LIMIT ?",
+        (p_cutoff, p_after_id, p_keep, p_limit))]
+
+
+def backfill_todo_due_at(conn, p_after_id, p_limit):
+    rows = conn.execute(
+        "SELECT t.id, t.due_date, t.due_time, t.due_at, u.time_zone FROM todos t "
+        "LEFT JOIN users u ON u.id = t.user_id WHERE t.id > ? ORDER BY t.id LIMIT ?",
+        (p_after_id, p_limit)).fetchall()
+    updates = []
+    for row in rows:
+        value = todo_due.due_at_value(row["due_date"], row["due_time"], row["time_zone"])
+        if row["due_at"] is None and row["time_zone"] is not None and value is not None:
+            updates.append((value, row["id"]))
+    conn.executemany("UPDATE todos SET due_at = ?, version = version + 1 WHERE id = ?", updates)
+    return {"last_id": rows[-1]["id"] if rows else None, "updated": len(updates)}
+
+
+def set_user_time_zone(conn, p_user_id, p_time_zone):
+    if not conn.execute("UPDATE users SET time_zone = ? WHERE id = ? AND time_zone IS NOT ?",
+                        (p_time_zone, p_user_id, p_time_zone)).rowcount:
+        return 0
+    rows = conn.execute("SELECT id, due_date, due_time FROM todos WHERE user_id = ? AND completed = 0 "
+                        "AND COALESCE(due_date, '') <> ''", (p_user_id,)).fetchall()
+    conn.executemany("UPDATE todos SET due_at = ?, reminder_sent = 0, version = version + 1 WHERE id = ?",
+                     [(todo_due.due_at_value(row["due_date"], row["due_time"], p_time_zone), row["id"]) for row in rows])
+    return len(rows)
+
+
+def file_folder_tree(conn, p_user_id):
+    folders = conn.execute("SELECT id, parent_id, name, created_at, file_count, byte_count FROM file_folders "
+                           "WHERE user_id = ?", (p_user_id,)).fetchall()
+    return folder_tree.walk([dict(row) for row in folders])
+
+
+def delete_file_folder(conn, p_user_id, p_folder_id):
+    folders = conn.execute("SELECT id, parent_id FROM file_folders WHERE user_id = ?", (p_user_id,)).fetchall()
+    if not any(row["id"] == p_folder_id for row in folders):
+        return {"folders": 0, "files": 0}
+    ids = folder_tree.subtree_ids([dict(row) for row in folders], p_folder_id)
+    marks = ", ".join("?" * len(ids))
+    files = conn.execute(f"DELETE FROM files WHERE user_id = ? AND folder_id IN ({marks})", [p_user_id, *ids]).rowcount
+    conn.execute(f"DELETE FROM file_folders WHERE id IN ({marks})", ids)
+    return {"folders": len(ids), "files": files}
+
+
+def reconcile_user_usage(conn, p_after_id, p_limit):
+    users = conn.execute("SELECT id FROM users WHERE ? IS NULL OR id > ? ORDER BY id LIMIT ?",
+                         (p_after_id, p_after_id, p_limit)).fetchall()
+    fixed = 0
+    for user in users:
+        uid = user["id"]
+        stored = conn.execute("SELECT file_count, file_bytes, todo_count, note_count, short_url_count "
+                              "FROM user_usage WHERE user_id = ?", (uid,)).fetchone()
+        files = conn.execute("SELECT count(*), COALESCE(sum(size), 0) FROM files WHERE user_id = ?", (uid,)).fetchone()
+        actual = (files[0], files[1], *(conn.execute(f"SELECT count(*) FROM {table} WHERE user_id = ?", (uid,)).fetchone()[0]
+                                        for table in ("todos", "notes", "short_urls")))
+        if stored is None or tuple(stored) != actual:
+            conn.execute("INSERT INTO user_usage (user_id, file_count, file_bytes, todo_count, note_count, short_url_count) "
+                         "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id) DO UPDATE SET file_count = excluded.file_count, "
+                         "file_bytes = excluded.file_bytes, todo_count = excluded.todo_count, "
+                         f"note_count = excluded.note_count, short_url_count = excluded.short_url_count, updated_at = {NOW}",
+                         (uid, *actual))
+            fixed += 1
+    return {"last_id": users[-1]["id"] if users else None, "checked": len(users), "fixed": fixed}
+
+
+def replication_lag(conn):
+    # A single database: never behind
+    return 0.0
+
+
+# Python versions of the Postgres functions in supabase_setup.sql
+FUNCTIONS = {
+    "register_user": register_user,
+    "apply_note_patch": apply_note_patch,
+    "add_click_rollups": add_click_rollups,
+    "note_history_candidates": note_history_candidates,
+    "backfill_todo_due_at": backfill_todo_due_at,
+    "set_user_time_zone": set_user_time_zone,
+    "file_folder_tree": file_folder_tree,
+    "delete_file_folder": delete_file_folder,
+    "reconcile_user_usage": reconcile_user_usage,
+    "replication_lag": replication_lag,
+}
+
+
+class SQLiteRPC:
+    def __init__(self, client, fn, params):
+        self.client = client
+        self.fn = fn
+        self.params = params
+
+    def execute(self):
+        handler = FUNCTIONS.get(self.fn)
+        if handler is None:
+            raise StorageError(f"function {self.fn} does not exist", "42883")
+        conn = self.client.connection()
+        try:
+            with conn:
+                return SQLiteResponse(handler(conn, **self.params))
+        except sqlite3.IntegrityError as e:
+            raise _translate(e) from e
+
+
+class SQLiteClient:
+    """Supabase-compatible client for an embedded SQLite database."""
+
+    def __init__(self, path="data.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connection()
+        counted = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'user_usage'").fetchone()
+        conn.executescript(SCHEMA)
+        self.migrate(conn)
+        conn.executescript(USAGE_TRIGGERS_SQL)
+        if not counted:
+            # Database from before usage counters: count what is already stored
+            with conn:
+                reconcile_user_usage(conn, None, -1)
+
+    def migrate(self, conn):
+        for table, column, definition in ADDED_COLUMNS:
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({_ident(table)})")}
+            if column not in existing:
+                with conn:
+                    conn.execute(f"ALTER TABLE {_ident(table)} ADD COLUMN {_ident(column)} {definition}")
+                    if (table, column) in BACKFILLS:
+                        conn.execute(BACKFILLS[(table, column)])
+        conn.executescript(ADDED_INDEXES)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level="DEFERRED")
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.create_function("note_diff", 2, note_history.delta, deterministic=True)
+            conn.create_function("note_snapshot_every", 0, lambda: note_history.SNAPSHOT_EVERY)
+            conn.create_function("todo_due_at", 3, todo_due.due_at_value, deterministic=True)
+            conn.create_function("storage_quota_bytes", 0, lambda: usage.QUOTA_BYTES)
+            self._local.conn = conn
+        return conn
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, **kwargs):
+        return SQLiteRPC(self, fn, params or {})
+
+    def bulk_load(self, name, rows, chunk_size=5000):
+        """Insert many rows in large transactions (used for seeding)."""
+        conn = self.connection()
+        table = _ident(name)
+        chunk = []
+        columns = None
+
+        def flush():
+            if chunk:
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(_ident(c) for c in columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})", chunk)
+                chunk.clear()
+
+        for row in rows:
+            if columns is None:
+                columns = list(row)
+            chunk.append([row.get(c) for c in columns])
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
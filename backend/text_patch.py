@@ -0,0 +1,63 @@
+# Text patches for note content.
+#
+# A patch is a list of [position, delete_count, insert_text] operations,
+# applied in order. Positions count Unicode code points (what Postgres
+# char_length/substr and Python indexing use), so clients must not send
+# UTF-16 offsets.
+
+MAX_OPS = 1000
+
+
+class PatchError(ValueError):
+    pass
+
+
+def validate_ops(ops):
+    if not isinstance(ops, list):
+        raise PatchError("ops must be a list")
+    if len(ops) > MAX_OPS:
+        raise PatchError(f"at most {MAX_OPS} operations per patch")
+    for op in ops:
+        if not isinstance(op, (list, tuple)) or len(op) not in (2, 3):
+            raise PatchError("each op must be [position, delete_count, insert_text]")
+        pos, delete = op[0], op[1]
+        insert = op[2] if len(op) == 3 else ""
+        if not isinstance(pos, int) or not isinstance(delete, int) or isinstance(pos, bool) or pos < 0 or delete < 0:
+            raise PatchError("position and delete_count must be non-negative integers")
+        if not isinstance(insert, str):
+            raise PatchError("insert_text must be a string")
+    return ops
+
+
+def apply_ops(text, ops):
+    """Apply `ops` to `text` and return the new text."""
+    text = text or ""
+    for op in validate_ops(ops):
+        pos, delete = op[0], op[1]
+        insert = op[2] if len(op) == 3 else ""
+        if pos + delete > len(text):
+            raise PatchError("patch out of range")
+        text = text[:pos] + insert + text[pos + delete:]
+    return text
+
+
+def _common_prefix(a, b):
+    # Binary search on slice equality: the comparisons run in C, which beats a
+    # per-character loop on large notes
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def diff_ops(old, new):
+    """Smallest single replace turning `old` into `new` (common prefix/suffix)."""
+    if old == new:
+        return []
+    start = _common_prefix(old, new)
+    suffix = _common_prefix(old[start:][::-1], new[start:][::-1])
+    return [[start, len(old) - start - suffix, new[start:len(new) - suffix]]]
@@ -0,0 +1,154 @@
+# Todo due times as real timestamps.
+#
+# Todos keep the due_date ("YYYY-MM-DD") and due_time ("HH:MM") text the
+# frontend sends, plus due_at: the same moment as a UTC timestamp, resolved in
+# the owner's time zone (users.time_zone, an IANA name such as
+# "Europe/Berlin"). The set_todo_due_at trigger (supabase_setup.sql) sets
+# due_at whenever due_date/due_time are written, so reminder and "due today"
+# queries are range scans on an index instead of parsing text for every row in
+# Python.
+#
+# Rows written before due_at existed are filled in by the backfill, which
+# walks todos by id in batches (one backfill_todo_due_at call each):
+#
+#   cd backend
+#   python todo_due.py backfill --batch 1000 --pause 0.1
+#
+# Settings (.env):
+#   DEFAULT_TIME_ZONE=UTC
+#   TIME_ZONE_CACHE_SECONDS=300
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIME_ZONE = os.environ.get("DEFAULT_TIME_ZONE") or "UTC"
+CACHE_SECONDS = float(os.environ.get("TIME_ZONE_CACHE_SECONDS", "300"))
+DEFAULT_DUE_TIME = "23:59"
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+def zone(name):
+    """ZoneInfo for an IANA name, or the default zone when it is unknown."""
+    try:
+        return ZoneInfo(name or DEFAULT_TIME_ZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIME_ZONE)
+
+
+def valid_time_zone(name):
+    if not name or len(name) > 64:
+        return False
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def due_at(due_date, due_time, time_zone):
+    """UTC datetime for a due date/time in `time_zone`, or None without a valid date.
+
+    Same rules as the todo_due_at function in supabase_setup.sql: a missing
+    or malformed time means the end of the day.
+    """
+    due_date = (due_date or "").strip()
+    due_time = (due_time or "").strip()
+    if not DATE_PATTERN.match(due_date):
+        return None
+    if not TIME_PATTERN.match(due_time):
+        due_time = DEFAULT_DUE_TIME
+    try:
+        local = datetime.strptime(f"{due_date} {due_time}", "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+    return local.replace(tzinfo=zone(time_zone)).astimezone(timezone.utc)
+
+
+def iso(moment):
+    return moment.astimezone(timezone.utc).isoformat() if moment else None
+
+
+def due_at_value(due_date, due_time, time_zone):
+    """due_at as stored: ISO 8601 in UTC, or None."""
+    return iso(due_at(due_date, due_time, time_zone))
+
+
+def day_range(time_zone, now=None):
+    """(start, end) in UTC of the current day in `time_zone`."""
+    tz = zone(time_zone)
+    local = (now or datetime.now(timezone.utc)).astimezone(tz)
+    start = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Wall-clock arithmetic, so days with a DST change are 23 or 25 hours
+    end = start + timedelta(days=1)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def local_text(value, time_zone):
+    """due_at (ISO text or datetime) as "YYYY-MM-DD HH:MM" in `time_zone`."""
+    moment = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return moment.astimezone(zone(time_zone)).strftime("%Y-%m-%d %H:%M")
+
+
+class TimeZoneCache:
+    """users.time_zone by user id, kept for CACHE_SECONDS in this process.
+
+    Only for reads: another process may change the zone meanwhile, so nothing
+    written to the database is computed from it.
+    """
+
+    def __init__(self, ttl=CACHE_SECONDS):
+        self.ttl = ttl
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get(self, client, user_id):
+        now = time.monotonic()
+        with self.lock:
+            cached = self.values.get(user_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        response = client.table("users").select("time_zone").eq("id", user_id).execute()
+        name = (response.data[0].get("time_zone") if response.data else None) or DEFAULT_TIME_ZONE
+        self.put(user_id, name)
+        return name
+
+    def put(self, user_id, name):
+        with self.lock:
+            self.values[user_id] = (time.monotonic() + self.ttl, name)
+
+
+def backfill(client, batch=1000, pause=0.0, after_id=0, log=print):
+    """Fill due_at for todos that have none. Returns the number of rows set."""
+    total = 0
+    while True:
+        result = client.rpc("backfill_todo_due_at", {"p_after_id": after_id, "p_limit": batch}).execute().data
+        if not result or result.get("last_id") is None:
+            break
+        after_id = result["last_id"]
+        total += result["updated"]
+        log(f"[DueAt] Backfilled up to id {after_id}: {total} row(s) set")
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fill todos.due_at for rows written before it existed")
+    parser.add_argument("command", choices=("backfill",))
+    parser.add_argument("--batch", type=int, default=1000, help="rows per database call")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between batches")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this todo id")
+    args = parser.parse_args()
+
+    # Only the client is needed, not the app's background threads
+    os.environ["DEFER_BACKGROUND_TASKS"] = "1"
+    from app import supabase
+    count = backfill(supabase, args.batch, args.pause, args.after_id)
+    print(f"[DueAt] Done: {count} row(s) set")
@@ -0,0 +1,301 @@
+# Query tracing for the Supabase client.
+#
+# `traced(client)` wraps the client so every `.execute()` is timed and
+# recorded with its table, operation, filters, row count and payload size.
+# Calls are grouped under the Flask request that issued them; when a request
+# goes over the query budget or repeats the same query shape (the usual
+# N+1 loop) a warning is printed. Spans use the OTLP/JSON layout so they can
+# be fed to any OpenTelemetry collector.
+#
+# With TRACE_DEBUG=1 responses carry X-Query-Count and Server-Timing headers.
+# Payload sizes mean serializing every response again, so they are only
+# measured with TRACE_DEBUG on or TRACE_EXPORT_PATH set.
+#
+# Settings (.env):
+#   TRACE_QUERIES=1
+#   TRACE_QUERY_BUDGET=8          queries per request before warning
+#   TRACE_REPEAT_THRESHOLD=3      identical query shapes per request before warning
+#   TRACE_EXPORT_PATH=            append OTLP/JSON lines to this file
+#   TRACE_DEBUG=0                 query count headers and payload sizes
+
+import json
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+
+OPERATIONS = ("select", "insert", "update", "upsert", "delete")
+FILTERS = (
+    "eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_",
+    "contains", "contained_by", "match", "filter", "or_", "not_",
+)
+# Endpoints whose query count grows with the size of the upload or export by
+# design (one query per chunk or page); they are traced but not warned about
+BATCH_ENDPOINTS = {"import_short_urls", "export_short_urls", "import_workspace", "export_workspace"}
+
+_current = ContextVar("query_trace", default=None)
+_export_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def debug_enabled():
+    return (os.environ.get("TRACE_DEBUG") or "0").strip().lower() in ("1", "true", "yes")
+
+
+def _now_ns():
+    return time.time_ns()
+
+
+def _attr(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class RequestTrace:
+    """Queries issued while handling one request."""
+
+    def __init__(self, name, trace_id=None, parent_span_id=None):
+        self.name = name
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.start_ns = _now_ns()
+        self.end_ns = None
+        self.queries = []
+        self.shape_counts = {}
+        self.measure_bytes = debug_enabled() or bool((os.environ.get("TRACE_EXPORT_PATH") or "").strip())
+        self._lock = threading.Lock()
+
+    def record(self, query):
+        # Queries may be issued from worker threads of the same request
+        with self._lock:
+            self.queries.append(query)
+            self.shape_counts[query["shape"]] = self.shape_counts.get(query["shape"], 0) + 1
+
+    @property
+    def db_seconds(self):
+        return sum(q["duration"] for q in self.queries)
+
+    def problems(self, budget, repeat_threshold):
+        found = []
+        if len(self.queries) > budget:
+            found.append(f"{len(self.queries)} queries (budget {budget})")
+        for shape, count in self.shape_counts.items():
+            if count >= repeat_threshold:
+                found.append(f"{count}x {shape}")
+        return found
+
+    def to_otlp(self, attributes=None):
+        spans = [{
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": 2,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or _now_ns()),
+            "attributes": [_attr(k, v) for k, v in (attributes or {}).items()]
+                + [_attr("db.query_count", len(self.queries))],
+        }]
+        for q in self.queries:
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": q["span_id"],
+                "parentSpanId": self.span_id,
+                "name": f"{q['operation']} {q['table']}",
+                "kind": 3,
+                "startTimeUnixNano": str(q["start_ns"]),
+                "endTimeUnixNano": str(q["start_ns"] + int(q["duration"] * 1e9)),
+                "attributes": [
+                    _attr("db.system", "postgresql"),
+                    _attr("db.sql.table", q["table"]),
+                    _attr("db.operation", q["operation"]),
+                    _attr("db.statement", q["shape"]),
+                    _attr("db.response.rows", q["rows"]),
+                    _attr("db.response.bytes", q["bytes"]),
+                ],
+                "status": {"code": 2} if q["error"] else {"code": 0},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_attr("service.name", "xqxing-backend")]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace(name, traceparent=None):
+    trace_id = parent = None
+    # W3C traceparent: version-traceid-spanid-flags
+    parts = (traceparent or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        trace_id, parent = parts[1], parts[2]
+    trace = RequestTrace(name, trace_id, parent)
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    trace = _current.get()
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Teardown ran in a different context than before_request
+        _current.set(None)
+    if trace is not None:
+        trace.end_ns = _now_ns()
+    return trace
+
+
+def export_trace(trace, attributes=None, path=None):
+    path = path or (os.environ.get("TRACE_EXPORT_PATH") or "").strip()
+    if not path:
+        return
+    line = json.dumps(trace.to_otlp(attributes), separators=(",", ":"))
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _payload_size(data):
+    try:
+        return len(json.dumps(data, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class TracedQuery:
+    """Proxy for a postgrest request builder that remembers the call chain."""
+
+    def __init__(self, builder, table, calls=()):
+        self._builder = builder
+        self._table = table
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return TracedQuery(attr, self._table, self._calls + ((name, ()),)) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return TracedQuery(result, self._table, self._calls + ((name, args),))
+            return result
+        return call
+
+    def _describe(self):
+        operation = "select"
+        filters = []
+        modifiers = []
+        for name, args in self._calls:
+            if name in OPERATIONS:
+                operation = name
+            elif name in FILTERS:
+                column = args[0] if args and isinstance(args[0], str) else "?"
+                # Values are left out so the shape groups identical queries
+                filters.append(f"{column}={name.rstrip('_')}.?")
+            elif name in ("order", "limit", "range", "single", "maybe_single"):
+                modifiers.append(name if not args else f"{name}({args[0]})")
+        return operation, filters, modifiers
+
+    def execute(self):
+        trace = _current.get()
+        start_ns = _now_ns()
+        started = time.perf_counter()
+        error = None
+        response = None
+        try:
+            response = self._builder.execute()
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if trace is not None:
+                duration = time.perf_counter() - started
+                operation, filters, modifiers = self._describe()
+                data = getattr(response, "data", None)
+                trace.record({
+                    "span_id": secrets.token_hex(8),
+                    "table": self._table,
+                    "operation": operation,
+                    "filters": filters,
+                    "shape": " ".join([operation, self._table] + filters + modifiers),
+                    "rows": len(data) if isinstance(data, list) else (1 if data else 0),
+                    "bytes": _payload_size(data) if data is not None and trace.measure_bytes else 0,
+                    "start_ns": start_ns,
+                    "duration": duration,
+                    "error": repr(error) if error else None,
+                })
+
+
+class TracedClient:
+    """Supabase client whose table and rpc calls are traced."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return TracedQuery(self._client.table(name), name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        return TracedQuery(self._client.rpc(fn, params or {}, *args, **kwargs), f"rpc:{fn}", (("rpc", (fn,)),))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def traced(client):
+    if (os.environ.get("TRACE_QUERIES") or "1").strip().lower() not in ("1", "true", "yes"):
+        return client
+    return TracedClient(client)
+
+
+def init_tracing(app):
+    """Open a trace per request and report budget / N+1 problems when it ends."""
+    from flask import g, request
+
+    budget = _env_int("TRACE_QUERY_BUDGET", 8)
+    repeat_threshold = _env_int("TRACE_REPEAT_THRESHOLD", 3)
+    debug_headers = debug_enabled()
+
+    @app.before_request
+    def open_trace():
+        trace, token = start_trace(f"{request.method} {request.path}", request.headers.get("traceparent"))
+        g.trace_token = token
+
+    @app.after_request
+    def add_trace_headers(response):
+        trace = current_trace()
+        if trace is not None and debug_headers:
+            response.headers["X-Query-Count"] = str(len(trace.queries))
+            response.headers["Server-Timing"] = f"db;dur={trace.db_seconds * 1000:.1f}"
+        return response
+
+    @app.teardown_request
+    def close_trace(exc=None):
+        token = g.pop("trace_token", None)
+        if token is None:
+            return
+        trace = end_trace(token)
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        trace.name = f"{request.method} {route}"
+        problems = trace.problems(budget, repeat_threshold) if request.endpoint not in BATCH_ENDPOINTS else []
+        if problems:
+            print(f"[Trace] {trace.name}: " + "; ".join(problems))
+        export_trace(trace, {"http.method": request.method, "http.route": route})
@@ -0,0 +1,118 @@
+# Per-user usage counters and the storage quota.
+#
+# user_usage holds one row per user: file_count, file_bytes, todo_count,
+# note_count and short_url_count. Triggers on files, todos, notes and
+# short_urls (count_user_usage in supabase_setup.sql, and their SQLite and
+# stand-in equivalents) adjust it in the same transaction as every insert,
+# delete and file size change, so reading a user's usage is one primary-key
+# lookup however large the account. GET /usage returns it with the quota.
+#
+# The quota is enforced by the database too: the trigger refuses any write
+# that takes file_bytes past it (error code QUOTA_EXCEEDED), in the same
+# transaction, so concurrent uploads cannot pass it together. Postgres reads
+# the app.storage_quota_mb setting, which should match STORAGE_QUOTA_MB.
+#
+# A background thread recounts every user once per USAGE_RECONCILE_INTERVAL
+# (reconcile_user_usage, a batch of users per call) and fixes rows that
+# drifted, e.g. after rows were changed by hand. It can also be run once:
+#
+#   cd backend
+#   python usage.py reconcile --batch 500
+#
+# Settings (.env):
+#   STORAGE_QUOTA_MB=100   (0 means no quota; Postgres reads app.storage_quota_mb)
+#   USAGE_RECONCILE_INTERVAL=86400   (seconds, 0 turns the job off)
+#   USAGE_RECONCILE_BATCH=500
+
+import base64
+import binascii
+import os
+import threading
+import time
+
+QUOTA_BYTES = int(float(os.environ.get("STORAGE_QUOTA_MB", "100")) * 1024 * 1024)
+RECONCILE_INTERVAL = float(os.environ.get("USAGE_RECONCILE_INTERVAL", "86400"))
+RECONCILE_BATCH = int(os.environ.get("USAGE_RECONCILE_BATCH", "500"))
+COUNTERS = ("file_count", "file_bytes", "todo_count", "note_count", "short_url_count")
+# SQLSTATE the count_user_usage trigger raises for a write past the quota
+QUOTA_EXCEEDED = "QU001"
+
+
+def get(client, user_id):
+    """A user's counters; zeros for users with nothing stored yet."""
+    response = client.table("user_usage").select(",".join(COUNTERS)).eq("user_id", user_id).execute()
+    row = response.data[0] if response.data else {}
+    return {counter: int(row.get(counter) or 0) for counter in COUNTERS}
+
+
+def data_size(data):
+    """Bytes a file's base64 `data` decodes to: what it is stored and charged
+    as, whatever size the client claims. Raises ValueError when it is not
+    base64."""
+    if not data:
+        return 0
+    try:
+        return len(base64.b64decode(data, validate=True))
+    except (binascii.Error, TypeError) as e:
+        raise ValueError("File data is not valid base64") from e
+
+
+def quota_exceeded(error):
+    """True when a write failed because it would pass the storage quota."""
+    return getattr(error, "code", None) == QUOTA_EXCEEDED
+
+
+def summary(counters, quota=None):
+    quota = QUOTA_BYTES if quota is None else quota
+    return dict(counters, quota_bytes=quota or None)
+
+
+def reconcile(client, batch=None, log=print):
+    """Recount every user. Returns {"users": checked, "fixed": rows corrected}."""
+    batch = batch or RECONCILE_BATCH
+    after_id = None
+    checked = fixed = 0
+    while True:
+        result = client.rpc("reconcile_user_usage", {"p_after_id": after_id, "p_limit": batch}).execute().data
+        if not result or result.get("last_id") is None:
+            break
+        after_id = result["last_id"]
+        checked += result["checked"]
+        fixed += result["fixed"]
+    if fixed:
+        log(f"[Usage] Reconciled {checked} user(s), fixed {fixed}")
+    return {"users": checked, "fixed": fixed}
+
+
+def start_reconciliation(client, interval=None):
+    """Run reconcile() every `interval` seconds on a daemon thread."""
+    interval = RECONCILE_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                reconcile(client)
+            except Exception as e:
+                print(f"[Usage] Reconciliation failed: {e}")
+
+    thread = threading.Thread(target=loop, name="usage-reconciliation", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recount user_usage from the stored rows")
+    parser.add_argument("command", choices=("reconcile",))
+    parser.add_argument("--batch", type=int, default=RECONCILE_BATCH, help="users per database call")
+    args = parser.parse_args()
+
+    # Only the client is needed, not the app's background threads
+    os.environ["DEFER_BACKGROUND_TASKS"] = "1"
+    from app import supabase
+    result = reconcile(supabase, args.batch)
+    print(f"[Usage] Done: {result['users']} user(s) checked, {result['fixed']} fixed")
@@ -0,0 +1,238 @@
+# Full-workspace backup: GET /export and POST /import.
+#
+# An export is a ZIP with one NDJSON entry per table (folders.ndjson,
+# todos.ndjson, ... files.ndjson with the base64 data, short_urls.ndjson) and a
+# manifest.json, or with ?format=ndjson a single stream of
+# {"table": ..., "row": {...}} lines. Each table is paged through by id and
+# every page is compressed and sent before the next is read, so memory stays
+# at one page whatever the size of the account (file pages are small, they
+# carry the blobs).
+#
+# Imports read NDJSON straight from the request. A ZIP keeps its directory at
+# the end, so it is first spooled to a temporary file (memory up to
+# WORKSPACE_SPOOL_MB, then disk) and its entries are read line by line. Rows
+# are inserted in chunks of WORKSPACE_IMPORT_CHUNK_SIZE rows or
+# WORKSPACE_IMPORT_CHUNK_MB, parents before children, and folder, notebook
+# and file-folder ids are remapped to the new rows. Imports add to the
+# workspace; importing the same archive twice creates everything twice,
+# except short URLs, whose aliases are unique.
+#
+# Settings (.env):
+#   WORKSPACE_IMPORT_CHUNK_SIZE=500
+#   WORKSPACE_IMPORT_CHUNK_MB=8
+#   WORKSPACE_IMPORT_MAX_MB=1024
+#   WORKSPACE_SPOOL_MB=16
+
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+
+CHUNK_SIZE = int(os.environ.get("WORKSPACE_IMPORT_CHUNK_SIZE", "500"))
+CHUNK_BYTES = int(float(os.environ.get("WORKSPACE_IMPORT_CHUNK_MB", "8")) * 1024 * 1024)
+MAX_BYTES = int(float(os.environ.get("WORKSPACE_IMPORT_MAX_MB", "1024")) * 1024 * 1024)
+SPOOL_BYTES = int(float(os.environ.get("WORKSPACE_SPOOL_MB", "16")) * 1024 * 1024)
+FORMAT = "xqxing-workspace"
+VERSION = 1
+
+# Exported columns, in import order: parents before the rows that point at them
+TABLES = {
+    "folders": ("id", "name", "created_at"),
+    "todos": ("id", "folder_id", "title", "priority", "due_date", "due_time", "completed", "created_at"),
+    "notebooks": ("id", "name", "created_at"),
+    "notes": ("id", "notebook_id", "section", "title", "content", "created_at", "updated_at"),
+    "file_folders": ("id", "parent_id", "name", "created_at"),
+    "files": ("id", "folder_id", "name", "type", "mime_type", "size", "data", "created_at", "modified_at"),
+    "short_urls": ("id", "alias", "original_url", "title", "clicks", "created_at"),
+}
+# column -> table whose ids it holds
+REFERENCES = {
+    "todos": {"folder_id": "folders"},
+    "notes": {"notebook_id": "notebooks"},
+    "file_folders": {"parent_id": "file_folders"},
+    "files": {"folder_id": "file_folders"},
+}
+# Rows without these (after remapping) are skipped
+REQUIRED = {
+    "folders": ("name",),
+    "todos": ("title", "priority"),
+    "notebooks": ("name",),
+    "notes": ("title", "notebook_id"),
+    "file_folders": ("name",),
+    "files": ("name", "type"),
+    "short_urls": ("original_url",),
+}
+PAGE_SIZE = 1000
+FILE_PAGE_SIZE = 5
+
+
+class ImportLimitError(ValueError):
+    pass
+
+
+def page_size(table):
+    return FILE_PAGE_SIZE if table == "files" else PAGE_SIZE
+
+
+def detect_format(content_type, requested=None):
+    fmt = (requested or "").strip().lower()
+    if fmt in ("zip", "ndjson"):
+        return fmt
+    content_type = (content_type or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    return "zip"
+
+
+def manifest(counts):
+    return {"format": FORMAT, "version": VERSION, "exported_at": datetime.now(timezone.utc).isoformat(),
+            "tables": counts}
+
+
+def _row(table, row):
+    return {column: row.get(column) for column in TABLES[table]}
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream whose contents are taken out as they are produced."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_zip(pages_for):
+    """Yield a ZIP archive of every table; `pages_for(table)` yields pages of rows."""
+    sink = _Sink()
+    counts = {}
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for table in TABLES:
+            counts[table] = 0
+            # Sizes are unknown until the entry is written, so allow ZIP64
+            with archive.open(f"{table}.ndjson", "w", force_zip64=True) as entry:
+                for page in pages_for(table):
+                    entry.write("".join(json.dumps(_row(table, row)) + "\n" for row in page).encode())
+                    counts[table] += len(page)
+                    yield sink.take()
+        archive.writestr("manifest.json", json.dumps(manifest(counts), indent=2))
+    yield sink.take()
+
+
+def export_ndjson(pages_for):
+    """Yield the same export as one NDJSON stream, the manifest last."""
+    counts = {}
+    for table in TABLES:
+        counts[table] = 0
+        for page in pages_for(table):
+            yield "".join(json.dumps({"table": table, "row": _row(table, row)}) + "\n" for row in page)
+            counts[table] += len(page)
+    yield json.dumps({"table": "manifest", "row": manifest(counts)}) + "\n"
+
+
+def _limited(stream, limit=None):
+    limit = limit or MAX_BYTES
+    total = 0
+    for block in stream:
+        total += len(block)
+        if total > limit:
+            raise ImportLimitError(f"archives are limited to {limit // (1024 * 1024)} MB")
+        yield block
+
+
+def _parse(line, where):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise ValueError(f"{where}: not valid JSON")
+    if not isinstance(record, dict):
+        raise ValueError(f"{where}: each line must be a JSON object")
+    return record
+
+
+def _check_manifest(record):
+    if record.get("format") not in (None, FORMAT) or (record.get("version") or VERSION) > VERSION:
+        raise ValueError("not a workspace export from this app, or from a newer version")
+
+
+def read_records(stream, fmt):
+    """Yield (table, row) from an uploaded archive, in table order for ZIPs."""
+    if fmt == "ndjson":
+        for number, line in enumerate(_limited(stream), 1):
+            if not line.strip():
+                continue
+            record = _parse(line, f"line {number}")
+            table = record.get("table")
+            if table == "manifest":
+                _check_manifest(record.get("row") or {})
+            elif table in TABLES and isinstance(record.get("row"), dict):
+                yield table, record["row"]
+            else:
+                raise ValueError(f"line {number}: unknown table {table!r}")
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+        for block in _limited(iter(lambda: stream.read(1024 * 1024), b"")):
+            spool.write(block)
+        spool.seek(0)
+        try:
+            archive = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile:
+            raise ValueError("not a ZIP archive (send NDJSON with ?format=ndjson)")
+        with archive:
+            names = set(archive.namelist())
+            if "manifest.json" in names:
+                _check_manifest(_parse(archive.read("manifest.json"), "manifest.json"))
+            for table in TABLES:
+                name = f"{table}.ndjson"
+                if name not in names:
+                    continue
+                with archive.open(name) as entry:
+                    for number, line in enumerate(io.TextIOWrapper(entry, encoding="utf-8"), 1):
+                        if line.strip():
+                            yield table, _parse(line, f"{name} line {number}")
+
+
+def chunks(records, size=None, max_bytes=None):
+    """Group consecutive (table, row) records into (table, rows) insert batches."""
+    size = size or CHUNK_SIZE
+    max_bytes = max_bytes or CHUNK_BYTES
+    table, rows, weight = None, [], 0
+    for record_table, row in records:
+        if rows and (record_table != table or len(rows) >= size or weight >= max_bytes):
+            yield table, rows
+            rows, weight = [], 0
+        table = record_table
+        rows.append(row)
+        weight += sum(len(value) for value in row.values() if isinstance(value, str))
+    if rows:
+        yield table, rows
+
+
+def prepare(table, row, ids):
+    """Values to insert for an exported row, with references mapped to new ids.
+
+    Returns None when a required value is missing. A reference to a row that
+    was not imported becomes NULL (the item lands at the top level).
+    """
+    values = {column: row[column] for column in TABLES[table] if column != "id" and row.get(column) is not None}
+    for column, parent in REFERENCES.get(table, {}).items():
+        if column in values:
+            values[column] = ids[parent].get(values[column])
+            if values[column] is None:
+                del values[column]
+    if any(values.get(column) in (None, "") for column in REQUIRED.get(table, ())):
+        return None
+    return values
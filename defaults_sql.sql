@@ -0,0 +1,10 @@
+-- Default rows are now created once at registration instead of on the first
+-- GET /folders or GET /notebooks. Run once to backfill accounts that never
+-- opened the todo or notes page.
+INSERT INTO folders (user_id, name)
+SELECT u.id, 'General' FROM users u
+WHERE NOT EXISTS (SELECT 1 FROM folders f WHERE f.user_id = u.id);
+
+INSERT INTO notebooks (user_id, name)
+SELECT u.id, 'My First Notebook' FROM users u
+WHERE NOT EXISTS (SELECT 1 FROM notebooks n WHERE n.user_id = u.id);
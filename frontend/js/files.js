@@ -9,6 +9,8 @@ let currentView = 'grid';
 let selectedFileId = null;
 let currentFolder = null;
 let currentUser = null;
+// From GET /usage; the sum over loaded files until it answers
+let storageUsage = null;
 
 function getAuthHeaders() {
     const token = localStorage.getItem('token');
@@ -25,9 +27,10 @@ function init() {
     setupEventListeners();
 }
 
+// Page load: folders, files and notes in one request, next to the usage
 async function loadAllData() {
     try {
-        await Promise.all([loadFiles(), loadFileFolders(), loadNotes()]);
+        await Promise.all([loadBootstrap(), loadUsage()]);
         renderFiles();
         updateStorageInfo();
     } catch (e) {
@@ -35,6 +38,19 @@ async function loadAllData() {
     }
 }
 
+async function loadBootstrap() {
+    const res = await fetch('/bootstrap?views=files', { headers: getAuthHeaders() });
+    if (!res.ok) {
+        await Promise.all([loadFiles(), loadFileFolders(), loadNotes()]);
+        return;
+    }
+    const data = await res.json();
+    files = data.files;
+    // Already flat, parents first, with the subtree totals
+    fileFolders = data.file_folder_tree;
+    setNotes(data.notes);
+}
+
 async function loadFiles() {
     const res = await fetch('/files', { headers: getAuthHeaders() });
     if (res.ok) {
@@ -43,37 +59,80 @@ async function loadFiles() {
 }
 
 async function loadFileFolders() {
-    const res = await fetch('/file-folders', { headers: getAuthHeaders() });
+    const res = await fetch('/file-folders/tree', { headers: getAuthHeaders() });
     if (res.ok) {
-        fileFolders = await res.json();
+        // The tree comes nested with sizes; the views filter a flat list
+        const flat = [];
+        const walk = nodes => nodes.forEach(node => {
+            flat.push(node);
+            walk(node.children || []);
+        });
+        walk(await res.json());
+        fileFolders = flat;
     }
 }
 
+function getFolderMeta(folder) {
+    const count = folder.total_files || 0;
+    return `${count} file${count === 1 ? '' : 's'} · ${getFileSize(folder.total_bytes || 0)}`;
+}
+
 async function loadNotes() {
     const res = await fetch('/notes', { headers: getAuthHeaders() });
     if (res.ok) {
-        notes = await res.json();
-        notes.forEach(note => {
-            note.type = 'note';
-            note.mimeType = 'text/plain';
-            note.size = (note.content || '').length;
-        });
+        setNotes(await res.json());
+    }
+}
+
+function setNotes(list) {
+    notes = list;
+    notes.forEach(note => {
+        note.type = 'note';
+        note.mimeType = 'text/plain';
+        // Unknown until opened when listed without content
+        note.size = note.content === undefined ? null : note.content.length;
+    });
+}
+
+// Notes listed by /bootstrap come without content; fetch it on first open
+async function loadNoteContent(note) {
+    if (note.content !== undefined) return;
+    const res = await fetch(`/notes/${note.id}`, { headers: getAuthHeaders() });
+    if (res.ok) {
+        note.content = (await res.json()).content || '';
+        note.size = note.content.length;
+    }
+}
+
+async function loadUsage() {
+    const res = await fetch('/usage', { headers: getAuthHeaders() });
+    if (res.ok) {
+        storageUsage = await res.json();
     }
 }
 
 async function saveFiles() {
-    await loadFiles();
+    await Promise.all([loadFiles(), loadFileFolders(), loadUsage()]);
     updateStorageInfo();
 }
 
+function storageUsed() {
+    return storageUsage ? storageUsage.file_bytes : files.reduce((sum, f) => sum + (f.size || 0), 0);
+}
+
+function storageQuota() {
+    return storageUsage ? (storageUsage.quota_bytes || Infinity) : MAX_STORAGE;
+}
+
 function updateStorageInfo() {
-    const used = files.reduce((sum, f) => sum + (f.size || 0), 0);
+    const used = storageUsed();
+    const quota = storageQuota();
     const usedMB = (used / (1024 * 1024)).toFixed(2);
-    const maxMB = (MAX_STORAGE / (1024 * 1024));
-    const percent = Math.min((used / MAX_STORAGE) * 100, 100);
+    const maxMB = isFinite(quota) ? `${(quota / (1024 * 1024)).toFixed(0)} MB` : 'unlimited';
+    const percent = isFinite(quota) ? Math.min((used / quota) * 100, 100) : 0;
     
     document.getElementById('storage-used').style.width = percent + '%';
-    document.getElementById('storage-text').textContent = `${usedMB} MB / ${maxMB} MB used`;
+    document.getElementById('storage-text').textContent = `${usedMB} MB / ${maxMB} used`;
 }
 
 function setupEventListeners() {
@@ -106,9 +165,8 @@ function setupEventListeners() {
 
 async function handleFiles(fileList) {
     const totalSize = Array.from(fileList).reduce((sum, f) => sum + f.size, 0);
-    const currentUsed = files.reduce((sum, f) => sum + (f.size || 0), 0);
     
-    if (currentUsed + totalSize > MAX_STORAGE) {
+    if (storageUsed() + totalSize > storageQuota()) {
         alert('Not enough storage space!');
         return;
     }
@@ -132,8 +190,9 @@ async function handleFiles(fileList) {
             });
             
             if (res.ok) {
-                await loadFiles();
+                await Promise.all([loadFiles(), loadFileFolders(), loadUsage()]);
                 renderFiles();
+                updateStorageInfo();
             }
         };
         reader.readAsDataURL(file);
@@ -176,6 +235,7 @@ function getFileIcon(type) {
 }
 
 function getFileSize(bytes) {
+    if (bytes === null || bytes === undefined) return '—';
     if (!bytes || bytes < 1024) return bytes + ' B';
     if (bytes < 1024 * 1024) return (bytes / 1024).toFixed(1) + ' KB';
     return (bytes / (1024 * 1024)).toFixed(1) + ' MB';
@@ -238,7 +298,7 @@ function renderFiles() {
         <div class="file-card folder-card" onclick="openFolder(${folder.id})">
             <div class="file-icon">📁</div>
             <div class="file-name">${escapeHtml(folder.name)}</div>
-            <div class="file-meta">Folder</div>
+            <div class="file-meta">${getFolderMeta(folder)}</div>
             <div class="file-actions">
                 <button onclick="event.stopPropagation(); renameFolder(${folder.id})" title="Rename">✏️</button>
                 <button onclick="event.stopPropagation(); deleteFolder(${folder.id})" title="Delete">🗑️</button>
@@ -248,7 +308,7 @@ function renderFiles() {
 
     const fileHtml = filtered.map(file => `
         <div class="file-card" onclick="openFile(${file.id})" oncontextmenu="showFileMenu(event, ${file.id}, '${file.type}')">
-            <div class="file-icon">${getFileIcon(file.type)}</div>
+            <div class="file-icon"${hasPreview(file) ? ` data-preview-id="${file.id}"` : ''}>${getFileIcon(file.type)}</div>
             <div class="file-name">${escapeHtml(file.name)}</div>
             <div class="file-meta">${getFileSize(file.size)}</div>
             <div class="file-actions">
@@ -261,12 +321,13 @@ function renderFiles() {
     `).join('');
 
     grid.innerHTML = folderHtml + fileHtml;
+    renderPreviews(grid);
 
     const listFolderHtml = fileFolders.filter(f => f.parent_id === currentFolder).map(folder => `
         <div class="list-row" onclick="openFolder(${folder.id})">
             <span class="col-name"><span class="type-icon">📁</span> ${escapeHtml(folder.name)}</span>
             <span class="col-type">Folder</span>
-            <span class="col-size">-</span>
+            <span class="col-size">${getFileSize(folder.total_bytes || 0)}</span>
             <span class="col-date">${formatDate(folder.created_at)}</span>
             <span class="col-actions">
                 <button onclick="event.stopPropagation(); renameFolder(${folder.id})">✏️</button>
@@ -293,6 +354,51 @@ function renderFiles() {
     list.innerHTML = listFolderHtml + listFileHtml;
 }
 
+// ===== PREVIEWS =====
+// Grid cards show a thumbnail (images) or a text snippet (text, PDF) from
+// GET /files/<id>/preview: a few KB the browser caches, instead of the file.
+const previews = new Map();
+
+function hasPreview(file) {
+    // Only rows from /files carry mime_type; notes are listed from /notes
+    const mime = (file.mime_type || '').toLowerCase();
+    return mime.startsWith('image/') && mime !== 'image/svg+xml'
+        || mime.startsWith('text/') || mime === 'application/pdf' || mime === 'application/json';
+}
+
+function loadPreview(id) {
+    if (!previews.has(id)) {
+        previews.set(id, fetchPreview(id).catch(() => null));
+    }
+    return previews.get(id);
+}
+
+async function fetchPreview(id, attempt = 0) {
+    const res = await fetch(`/files/${id}/preview`, { headers: getAuthHeaders() });
+    if (res.status === 202 && attempt < 10) {
+        // Still being generated
+        const wait = (Number(res.headers.get('Retry-After')) || 1) * 1000;
+        await new Promise(resolve => setTimeout(resolve, wait));
+        return fetchPreview(id, attempt + 1);
+    }
+    if (!res.ok) return null;
+    const blob = await res.blob();
+    if (blob.type.startsWith('image/')) return { image: URL.createObjectURL(blob) };
+    return { text: await blob.text() };
+}
+
+function renderPreviews(container) {
+    container.querySelectorAll('[data-preview-id]').forEach(async el => {
+        const preview = await loadPreview(Number(el.dataset.previewId));
+        if (!preview || !el.isConnected) return;
+        if (preview.image) {
+            el.innerHTML = `<img class="file-thumb" src="${preview.image}" alt="">`;
+        } else {
+            el.closest('.file-card').title = preview.text;
+        }
+    });
+}
+
 async function openFile(id) {
     selectedFileId = id;
     
@@ -300,6 +406,7 @@ async function openFile(id) {
     if (!file) {
         file = notes.find(n => n.id === id);
         if (file) {
+            await loadNoteContent(file);
             file = { ...file, data: btoa(file.content || ''), mimeType: 'text/plain' };
         }
     }
@@ -357,6 +464,7 @@ async function showFileInfo(id) {
     let file = files.find(f => f.id === id);
     if (!file) {
         file = notes.find(n => n.id === id);
+        if (file) await loadNoteContent(file);
     }
     if (!file) return;
 
@@ -405,8 +513,9 @@ async function deleteFile(id) {
     });
 
     if (res.ok) {
-        await loadFiles();
+        await Promise.all([loadFiles(), loadFileFolders(), loadUsage()]);
         renderFiles();
+        updateStorageInfo();
     }
 }
 
@@ -417,6 +526,7 @@ async function downloadFile() {
     if (!file) {
         file = notes.find(n => n.id === selectedFileId);
         if (file) {
+            await loadNoteContent(file);
             file = { ...file, data: btoa(file.content || '') };
         }
     }
@@ -17,6 +17,8 @@ let notes = [];
 let currentNoteId = null;
 let unsavedChanges = false;
 let lastSavedContent = '';
+let lastSavedVersion = null;
+let selectRequest = 0;
 
 // Initialize Quill Editor
 const quill = new Quill('#quill-editor', {
@@ -112,7 +114,28 @@ function checkUnsavedAndContinue(callback) {
 }
 
 // Init
-document.addEventListener('DOMContentLoaded', loadNotebooks);
+document.addEventListener('DOMContentLoaded', loadInitialData);
+
+// Page load: notebooks and the note list (without content) in one request
+async function loadInitialData() {
+    try {
+        const res = await fetch(`${API_URL}/bootstrap?views=notes`, {
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!res.ok) throw new Error("Failed to load notebooks");
+        const data = await res.json();
+        notebooks = data.notebooks;
+        if (!renderNotebooks()) return;
+
+        // Show the first notebook's notes from the same response
+        currentNotebookId = notebooks[0].id;
+        notes = data.notes.filter(note => note.notebook_id === currentNotebookId);
+        showNotes();
+    } catch (err) {
+        console.error(err);
+        alert(err.message);
+    }
+}
 
 // ====== NOTEBOOK FUNCTIONS ======
 async function loadNotebooks() {
@@ -122,22 +145,7 @@ async function loadNotebooks() {
         });
         if (!res.ok) throw new Error("Failed to load notebooks");
         notebooks = await res.json();
-        
-        notebookSelect.innerHTML = '';
-        if (notebooks.length === 0) {
-            notebookSelect.innerHTML = '<option value="">No notebooks</option>';
-            currentNotebookId = null;
-            notesListContainer.innerHTML = '';
-            clearEditor();
-            return;
-        }
-
-        notebooks.forEach(nb => {
-            const opt = document.createElement('option');
-            opt.value = nb.id;
-            opt.textContent = nb.name;
-            notebookSelect.appendChild(opt);
-        });
+        if (!renderNotebooks()) return;
 
         // Load the first notebook's notes
         currentNotebookId = notebooks[0].id;
@@ -149,6 +157,26 @@ async function loadNotebooks() {
     }
 }
 
+// Fill the notebook picker; false when there are no notebooks
+function renderNotebooks() {
+    notebookSelect.innerHTML = '';
+    if (notebooks.length === 0) {
+        notebookSelect.innerHTML = '<option value="">No notebooks</option>';
+        currentNotebookId = null;
+        notesListContainer.innerHTML = '';
+        clearEditor();
+        return false;
+    }
+
+    notebooks.forEach(nb => {
+        const opt = document.createElement('option');
+        opt.value = nb.id;
+        opt.textContent = nb.name;
+        notebookSelect.appendChild(opt);
+    });
+    return true;
+}
+
 async function createNotebook() {
     const name = prompt('Enter notebook name:');
     if (!name) return;
@@ -203,19 +231,32 @@ async function loadNotes(notebookId) {
         });
         if (!res.ok) throw new Error("Failed to load notes");
         notes = await res.json();
-        
-        renderNotesList();
-
-        if (notes.length > 0) {
-            selectNote(notes[0].id);
-        } else {
-            clearEditor();
-        }
+        showNotes();
     } catch (err) {
         console.error(err);
     }
 }
 
+function showNotes() {
+    renderNotesList();
+
+    if (notes.length > 0) {
+        selectNote(notes[0].id);
+    } else {
+        clearEditor();
+    }
+}
+
+// Notes listed by /bootstrap come without content; fetch it on first open
+async function loadNoteContent(note) {
+    const res = await fetch(`${API_URL}/notes/${note.id}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+    });
+    if (!res.ok) return false;
+    Object.assign(note, await res.json());
+    return true;
+}
+
 function renderNotesList() {
     notesListContainer.innerHTML = '';
     
@@ -248,20 +289,25 @@ function renderNotesList() {
     });
 }
 
-function selectNote(id) {
+async function selectNote(id) {
     if (unsavedChanges && !checkUnsavedAndContinue()) return;
     
-    currentNoteId = id;
-    const note = notes.find(n => n.id === currentNoteId);
+    const note = notes.find(n => n.id === id);
     if (!note) return;
-
-    noteTitleInput.value = note.title || '';
-    noteSectionInput.value = note.section || '';
-    quill.root.innerHTML = note.content || '';
-    
-    // Reset unsaved state
-    unsavedChanges = false;
-    lastSavedContent = note.content || '';
+    // The editor keeps the previous note until this one's content is in
+    const request = ++selectRequest;
+    if (note.content === undefined) {
+        try {
+            if (!(await loadNoteContent(note))) return;
+        } catch (err) {
+            console.error(err);
+            return;
+        }
+        // Another note was picked while this one loaded
+        if (request !== selectRequest) return;
+    }
+    currentNoteId = id;
+    showNoteVersion(note);
 
     // Update active class in list
     document.querySelectorAll('.note-item').forEach(el => el.classList.remove('active'));
@@ -275,6 +321,7 @@ function clearEditor() {
     quill.root.innerHTML = '';
     unsavedChanges = false;
     lastSavedContent = '';
+    lastSavedVersion = null;
 }
 
 async function createNewNote() {
@@ -313,30 +360,127 @@ async function createNewNote() {
     }
 }
 
+// Smallest single replace turning oldText into newText, as [position, delete, insert].
+// Positions count code points (Array.from), which is what the server uses.
+function diffOps(oldText, newText) {
+    if (oldText === newText) return [];
+    const a = Array.from(oldText);
+    const b = Array.from(newText);
+    let start = 0;
+    while (start < a.length && start < b.length && a[start] === b[start]) start++;
+    let endA = a.length, endB = b.length;
+    while (endA > start && endB > start && a[endA - 1] === b[endB - 1]) { endA--; endB--; }
+    return [[start, endA - start, b.slice(start, endB).join('')]];
+}
+
+// Send only the changed range from baseContent, which the server has as baseVersion
+async function patchNote(baseVersion, baseContent, title, section, content) {
+    return fetch(`${API_URL}/notes/${currentNoteId}`, {
+        method: 'PATCH',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({
+            base_version: baseVersion,
+            ops: diffOps(baseContent, content),
+            title,
+            section
+        })
+    });
+}
+
+// Both edits of base applied, or null when they touch the same text
+function mergeEdits(base, mine, theirs) {
+    const [m] = diffOps(base, mine);
+    const [t] = diffOps(base, theirs);
+    if (!m) return theirs;
+    if (!t) return mine;
+    const text = Array.from(base);
+    const apply = ([pos, del, ins]) => text.splice(pos, del, ...Array.from(ins));
+    // Apply the later edit first so the earlier one's position still holds
+    if (m[0] + m[1] <= t[0] && !(m[0] === t[0] && m[1] === 0 && t[1] === 0)) {
+        apply(t);
+        apply(m);
+    } else if (t[0] + t[1] <= m[0] && !(m[0] === t[0] && m[1] === 0 && t[1] === 0)) {
+        apply(m);
+        apply(t);
+    } else {
+        return null;
+    }
+    return text.join('');
+}
+
+function showNoteVersion(note) {
+    noteTitleInput.value = note.title || '';
+    noteSectionInput.value = note.section || '';
+    quill.root.innerHTML = note.content || '';
+    unsavedChanges = false;
+    lastSavedContent = note.content || '';
+    lastSavedVersion = note.version ?? null;
+}
+
+// The note changed elsewhere since it was loaded (or its version is unknown):
+// reload it and save this edit on top of the current version. Edits to
+// different parts are merged; otherwise the user picks which version stays.
+// Returns { res, content } for the save sent, or null when nothing was sent.
+async function saveOnCurrentVersion(title, section, content) {
+    const noteId = currentNoteId;
+    const res = await fetch(`${API_URL}/notes/${noteId}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+    });
+    if (!res.ok || currentNoteId !== noteId) return null;
+    const server = await res.json();
+    const serverContent = server.content || '';
+
+    let merged = mergeEdits(lastSavedContent, content, serverContent);
+    if (merged === null) {
+        const keepMine = confirm('This note was changed somewhere else while you were editing it.\n\n' +
+            'OK: keep your version and replace theirs\nCancel: discard your changes and load theirs');
+        if (!keepMine) {
+            const note = notes.find(n => n.id === noteId);
+            if (note) Object.assign(note, server);
+            showNoteVersion(server);
+            renderNotesList();
+            return null;
+        }
+        merged = content;
+    }
+    if (merged !== content) {
+        quill.root.innerHTML = merged;
+    }
+    return { res: await patchNote(server.version, serverContent, title, section, merged), content: merged };
+}
+
 async function saveNote() {
     if (!currentNoteId) return;
 
     const title = noteTitleInput.value;
     const section = noteSectionInput.value || 'General';
-    const content = quill.root.innerHTML;
+    let content = quill.root.innerHTML;
 
     try {
-        const res = await fetch(`${API_URL}/notes/${currentNoteId}`, {
-            method: 'PUT',
-            headers: { 
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${token}` 
-            },
-            body: JSON.stringify({ title, section, content })
-        });
+        let res = lastSavedVersion === null ? null
+            : await patchNote(lastSavedVersion, lastSavedContent, title, section, content);
+        if (!res || res.status === 409) {
+            const saved = await saveOnCurrentVersion(title, section, content);
+            // Nothing sent, or it lost another race: the next autosave tries again
+            if (!saved || saved.res.status === 409) return;
+            res = saved.res;
+            content = saved.content;
+        }
         
         if (res.ok) {
+            const data = await res.json();
+            lastSavedVersion = data.version ?? null;
+
             // Update local memory and list silently
             const noteIndex = notes.findIndex(n => n.id === currentNoteId);
             if(noteIndex > -1) {
                 notes[noteIndex].title = title;
                 notes[noteIndex].section = section;
                 notes[noteIndex].content = content;
+                notes[noteIndex].version = lastSavedVersion;
                 notes[noteIndex].updated_at = new Date().toISOString();
                 renderNotesList();
             }
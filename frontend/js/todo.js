@@ -1,5 +1,7 @@
 const TODO_API = "http://127.0.0.1:9999/todos";
 const FOLDERS_API = "http://127.0.0.1:9999/folders";
+const TIME_ZONE_API = "http://127.0.0.1:9999/settings/time-zone";
+const BOOTSTRAP_API = "http://127.0.0.1:9999/bootstrap";
 
 // ===== HTML ESCAPE TO PREVENT XSS =====
 function escapeHtml(text) {
@@ -38,6 +40,24 @@ function getAuthHeaders() {
   };
 }
 
+// ===== TIME ZONE =====
+// Due dates are wall-clock times; the backend needs the browser's zone to
+// know when they fall (reminders, "due today"). Sent once per session.
+async function syncTimeZone() {
+  const timeZone = Intl.DateTimeFormat().resolvedOptions().timeZone;
+  if (!timeZone || sessionStorage.getItem("timeZoneSent") === timeZone) return;
+  try {
+    const res = await fetch(TIME_ZONE_API, {
+      method: "PUT",
+      headers: getAuthHeaders(),
+      body: JSON.stringify({ time_zone: timeZone }),
+    });
+    if (res.ok) sessionStorage.setItem("timeZoneSent", timeZone);
+  } catch (err) {
+    console.error("Time zone sync failed:", err);
+  }
+}
+
 // ===== TIME FORMAT HELPER FUNCTIONS =====
 // Convert 24-hour time to 12-hour AM/PM format
 function convertTo12Hour(time24) {
@@ -82,73 +102,75 @@ async function fetchTodos(folderId = null) {
       return;
     }
 
-    const data = await res.json();
-
-    const list = document.getElementById("todoList");
-    list.innerHTML = "";
-
-    data.forEach((todo) => {
-      const li = document.createElement("li");
-
-      let priorityClass = "";
-      if (todo.priority === "High") priorityClass = "priority-high";
-      if (todo.priority === "Medium") priorityClass = "priority-medium";
-      if (todo.priority === "Low") priorityClass = "priority-low";
-
-      li.innerHTML = `
-              <div>
-                <b>${escapeHtml(todo.title)}</b> 
-                <span class="${priorityClass}">(${escapeHtml(todo.priority)})</span>
-                <br>
-                <small>Due: ${escapeHtml(todo.due_date || "No date")} @ ${formatTimeDisplay(todo.due_time || "23:59")}</small>
-              </div>
-
-              <div class="todo-actions">
-                <button class="completeBtn" data-id="${todo.id}" data-completed="${todo.completed}">✔</button>
-                <button class="editBtn" data-id="${todo.id}">✏️</button>
-                <button class="deleteBtn" data-id="${todo.id}">🗑</button>
-              </div>
-          `;
-
-      // Store task data in data attributes for editing
-      li.setAttribute("data-todo-id", todo.id);
-      li.setAttribute("data-todo-title", escapeHtml(todo.title));
-      li.setAttribute("data-todo-priority", escapeHtml(todo.priority));
-      li.setAttribute("data-todo-date", escapeHtml(todo.due_date || ""));
-      li.setAttribute("data-todo-time", escapeHtml(todo.due_time || "23:59"));
-
-      if (todo.completed) li.style.opacity = "0.5";
-
-      list.appendChild(li);
-      setTimeout(() => li.classList.add("enter"), 20);
-      checkNotification(todo);
-    });
+    renderTodos(await res.json());
+  } catch (error) {
+    console.error("Error fetching todos:", error);
+  }
+}
+
+function renderTodos(data) {
+  const list = document.getElementById("todoList");
+  list.innerHTML = "";
+
+  data.forEach((todo) => {
+    const li = document.createElement("li");
+
+    let priorityClass = "";
+    if (todo.priority === "High") priorityClass = "priority-high";
+    if (todo.priority === "Medium") priorityClass = "priority-medium";
+    if (todo.priority === "Low") priorityClass = "priority-low";
+
+    li.innerHTML = `
+            <div>
+              <b>${escapeHtml(todo.title)}</b> 
+              <span class="${priorityClass}">(${escapeHtml(todo.priority)})</span>
+              <br>
+              <small>Due: ${escapeHtml(todo.due_date || "No date")} @ ${formatTimeDisplay(todo.due_time || "23:59")}</small>
+            </div>
+
+            <div class="todo-actions">
+              <button class="completeBtn" data-id="${todo.id}" data-completed="${todo.completed}">✔</button>
+              <button class="editBtn" data-id="${todo.id}">✏️</button>
+              <button class="deleteBtn" data-id="${todo.id}">🗑</button>
+            </div>
+        `;
+
+    // Store task data in data attributes for editing
+    li.setAttribute("data-todo-id", todo.id);
+    li.setAttribute("data-todo-title", escapeHtml(todo.title));
+    li.setAttribute("data-todo-priority", escapeHtml(todo.priority));
+    li.setAttribute("data-todo-date", escapeHtml(todo.due_date || ""));
+    li.setAttribute("data-todo-time", escapeHtml(todo.due_time || "23:59"));
+
+    if (todo.completed) li.style.opacity = "0.5";
+
+    list.appendChild(li);
+    setTimeout(() => li.classList.add("enter"), 20);
+    checkNotification(todo);
+  });
 
-    document.querySelectorAll(".completeBtn").forEach((btn) => {
-      btn.addEventListener("click", function () {
-        const id = this.getAttribute("data-id");
-        const completed = this.getAttribute("data-completed") === "1" ? 1 : 0;
-        completeTask(id, completed);
-      });
+  document.querySelectorAll(".completeBtn").forEach((btn) => {
+    btn.addEventListener("click", function () {
+      const id = this.getAttribute("data-id");
+      const completed = this.getAttribute("data-completed") === "1" ? 1 : 0;
+      completeTask(id, completed);
     });
+  });
 
-    document.querySelectorAll(".deleteBtn").forEach((btn) => {
-      btn.addEventListener("click", function () {
-        const id = this.getAttribute("data-id");
-        deleteTask(id);
-      });
+  document.querySelectorAll(".deleteBtn").forEach((btn) => {
+    btn.addEventListener("click", function () {
+      const id = this.getAttribute("data-id");
+      deleteTask(id);
     });
+  });
 
-    // STEP 5: Add event listener for edit button
-    document.querySelectorAll(".editBtn").forEach((btn) => {
-      btn.addEventListener("click", function () {
-        const id = this.getAttribute("data-id");
-        editTask(id);
-      });
+  // STEP 5: Add event listener for edit button
+  document.querySelectorAll(".editBtn").forEach((btn) => {
+    btn.addEventListener("click", function () {
+      const id = this.getAttribute("data-id");
+      editTask(id);
     });
-  } catch (error) {
-    console.error("Error fetching todos:", error);
-  }
+  });
 }
 
 async function addTask() {
@@ -359,37 +381,7 @@ async function fetchFolders() {
     }
 
     const folders = await res.json();
-    const folderList = document.getElementById("folderList");
-    
-    if (!folderList) {
-      console.error("folderList element not found");
-      return;
-    }
-    
-    folderList.innerHTML = "";
-
-    if (folders.length === 0) {
-      folderList.innerHTML = '<div class="empty-folder-message">No folders yet. Create one!</div>';
-      return;
-    }
-
-    folders.forEach((folder) => {
-      const folderItem = document.createElement("div");
-      folderItem.className = "folder-item";
-      folderItem.setAttribute("data-folder-id", folder.id);
-      
-      folderItem.innerHTML = `
-        <div class="folder-name" onclick="selectFolder(${folder.id})">
-          📁 ${folder.name}
-        </div>
-        <div class="folder-actions">
-          <button class="folder-btn rename-btn" onclick="renameFolder(${folder.id})" title="Rename">✏️</button>
-          <button class="folder-btn delete-btn" onclick="deleteFolder(${folder.id})" title="Delete">🗑</button>
-        </div>
-      `;
-      
-      folderList.appendChild(folderItem);
-    });
+    renderFolders(folders);
 
     // Auto-select the first folder if none is selected
     if (!currentFolderId && folders.length > 0) {
@@ -401,6 +393,71 @@ async function fetchFolders() {
   }
 }
 
+function renderFolders(folders) {
+  const folderList = document.getElementById("folderList");
+  
+  if (!folderList) {
+    console.error("folderList element not found");
+    return;
+  }
+  
+  folderList.innerHTML = "";
+
+  if (folders.length === 0) {
+    folderList.innerHTML = '<div class="empty-folder-message">No folders yet. Create one!</div>';
+    return;
+  }
+
+  folders.forEach((folder) => {
+    const folderItem = document.createElement("div");
+    folderItem.className = "folder-item";
+    folderItem.setAttribute("data-folder-id", folder.id);
+    
+    folderItem.innerHTML = `
+      <div class="folder-name" onclick="selectFolder(${folder.id})">
+        📁 ${folder.name}
+      </div>
+      <div class="folder-actions">
+        <button class="folder-btn rename-btn" onclick="renameFolder(${folder.id})" title="Rename">✏️</button>
+        <button class="folder-btn delete-btn" onclick="deleteFolder(${folder.id})" title="Delete">🗑</button>
+      </div>
+    `;
+    
+    folderList.appendChild(folderItem);
+  });
+}
+
+// Page load: folders and todos in one request; the first folder is selected
+// from what came back instead of fetching its todos again
+async function loadInitialData() {
+  try {
+    const res = await fetch(BOOTSTRAP_API + "?views=todos", {
+      headers: getAuthHeaders(),
+    });
+
+    if (!res.ok) {
+      if (res.status === 401) {
+        window.location.href = "auth/login.html";
+        return;
+      }
+      fetchFolders();
+      return;
+    }
+
+    const { folders, todos } = await res.json();
+    renderFolders(folders);
+    if (folders.length > 0) {
+      currentFolderId = folders[0].id;
+      highlightFolder(currentFolderId);
+      renderTodos(todos.filter((todo) => todo.folder_id === currentFolderId));
+    } else {
+      renderTodos(todos);
+    }
+  } catch (error) {
+    console.error("Error loading todos:", error);
+  }
+}
+
 // STEP 2: Create a new folder
 async function createFolder() {
   const folderInput = document.getElementById("folderInput");
@@ -484,16 +541,20 @@ async function renameFolder(folderId) {
 async function selectFolder(folderId) {
   currentFolderId = folderId;
 
-  // Update UI to highlight the selected folder
+  highlightFolder(folderId);
+
+  // Fetch and display todos for this folder
+  fetchTodos(folderId);
+}
+
+// Update UI to highlight the selected folder
+function highlightFolder(folderId) {
   document.querySelectorAll(".folder-item").forEach(item => {
     item.classList.remove("active");
   });
   if (folderId) {
     document.querySelector(`[data-folder-id="${folderId}"]`).classList.add("active");
   }
-
-  // Fetch and display todos for this folder
-  fetchTodos(folderId);
 }
 
 // STEP 6: Modify fetchTodos to accept folderId parameter
@@ -554,8 +615,10 @@ document.addEventListener("DOMContentLoaded", () => {
     timeFormatBtn.textContent = timeFormat === "24h" ? "24H" : "12H";
   }
   
-  // Initialize folders on page load
-  fetchFolders();
+  syncTimeZone();
+
+  // Initialize folders and todos on page load
+  loadInitialData();
   
   // Attach event listener for folder creation button
   const createFolderBtn = document.getElementById("createFolderBtn");
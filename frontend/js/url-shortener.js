@@ -34,14 +34,27 @@ function showToast(type, message) {
   }, 3000);
 }
 
-// Generate random alias
-function generateRandomAlias(length = 6) {
-  const chars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789';
-  let result = '';
-  for (let i = 0; i < length; i++) {
-    result += chars.charAt(Math.floor(Math.random() * chars.length));
-  }
-  return result;
+// Check a custom alias while it is typed (server reads only the id column)
+let aliasCheckTimer = null;
+function checkAliasAvailability() {
+  const input = document.getElementById('custom-alias');
+  clearTimeout(aliasCheckTimer);
+  input.setCustomValidity('');
+  const alias = input.value.trim();
+  if (!alias || !/^[a-zA-Z0-9-_]+$/.test(alias)) return;
+  aliasCheckTimer = setTimeout(async () => {
+    try {
+      const response = await fetch(`${API_BASE}/short-urls/available?alias=${encodeURIComponent(alias)}`, {
+        headers: getAuthHeaders()
+      });
+      if (!response.ok || input.value.trim() !== alias) return;
+      const data = await response.json();
+      input.setCustomValidity(data.available ? '' : 'Alias already exists');
+      if (!data.available) input.reportValidity();
+    } catch (_) {
+      // Creating the link still reports a taken alias
+    }
+  }, 300);
 }
 
 // Validate URL
@@ -76,15 +89,14 @@ async function createShortUrl() {
     return;
   }
   
-  const alias = customAlias || generateRandomAlias();
-  
   try {
     const response = await fetch(`${API_BASE}/short-urls`, {
       method: 'POST',
       headers: getAuthHeaders(),
       body: JSON.stringify({
         original_url: originalUrl,
-        alias: alias,
+        // Left out when empty: the server generates one
+        alias: customAlias || undefined,
         title: title || 'Untitled'
       })
     });
@@ -368,6 +380,9 @@ document.addEventListener('DOMContentLoaded', () => {
   // Download QR button
   document.getElementById('download-qr-btn').addEventListener('click', downloadQRCode);
   
+  // Custom alias availability
+  document.getElementById('custom-alias').addEventListener('input', checkAliasAvailability);
+  
   // Search and sort
   document.getElementById('search-urls').addEventListener('input', filterUrls);
   document.getElementById('sort-select').addEventListener('change', filterUrls);
@@ -26,6 +26,7 @@ CREATE TABLE IF NOT EXISTS todos (
     due_time TEXT DEFAULT '23:59',
     completed INTEGER DEFAULT 0,
     reminder_sent INTEGER DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
@@ -45,6 +46,7 @@ CREATE TABLE IF NOT EXISTS notes (
     section TEXT NOT NULL DEFAULT 'General',
     title TEXT NOT NULL,
     content TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -68,6 +70,7 @@ CREATE TABLE IF NOT EXISTS files (
     size BIGINT DEFAULT 0,
     data TEXT,
     folder_id BIGINT,
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     modified_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -93,3 +96,646 @@ ALTER TABLE notes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE file_folders ENABLE ROW LEVEL SECURITY;
 ALTER TABLE files ENABLE ROW LEVEL SECURITY;
 ALTER TABLE short_urls ENABLE ROW LEVEL SECURITY;
+
+-- Registration: user plus default folder and notebook in one transaction.
+-- A duplicate username or email raises unique_violation (23505) and nothing is created.
+CREATE OR REPLACE FUNCTION register_user(p_username TEXT, p_email TEXT, p_password TEXT)
+RETURNS UUID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    new_id UUID;
+BEGIN
+    INSERT INTO users (username, email, password)
+    VALUES (p_username, p_email, p_password)
+    RETURNING id INTO new_id;
+
+    INSERT INTO folders (user_id, name) VALUES (new_id, 'General');
+    INSERT INTO notebooks (user_id, name) VALUES (new_id, 'My First Notebook');
+
+    RETURN new_id;
+END;
+$$;
+
+-- Row versions for optimistic concurrency (If-Match / ETag on PUT).
+-- ADD COLUMN covers databases created before the column was in the tables above.
+ALTER TABLE todos ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE files ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS todos_bump_version ON todos;
+CREATE TRIGGER todos_bump_version BEFORE UPDATE ON todos FOR EACH ROW EXECUTE FUNCTION bump_version();
+DROP TRIGGER IF EXISTS notes_bump_version ON notes;
+CREATE TRIGGER notes_bump_version BEFORE UPDATE ON notes FOR EACH ROW EXECUTE FUNCTION bump_version();
+DROP TRIGGER IF EXISTS files_bump_version ON files;
+CREATE TRIGGER files_bump_version BEFORE UPDATE ON files FOR EACH ROW EXECUTE FUNCTION bump_version();
+
+-- A todo whose due date or time changes gets a fresh reminder. The edit form
+-- sends every field, so this compares with the stored values and a rename
+-- keeps a reminder that was already emailed.
+CREATE OR REPLACE FUNCTION reset_todo_reminder()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.due_date IS DISTINCT FROM OLD.due_date OR NEW.due_time IS DISTINCT FROM OLD.due_time THEN
+        NEW.reminder_sent := 0;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS todos_reset_reminder ON todos;
+CREATE TRIGGER todos_reset_reminder BEFORE UPDATE OF due_date, due_time ON todos
+FOR EACH ROW EXECUTE FUNCTION reset_todo_reminder();
+
+-- Apply a text patch to a note's content server-side (PATCH /notes/<id>).
+-- p_ops is a JSON array of [position, delete_count, insert_text], positions in
+-- characters. Raises P0002 when the note is missing, 40001 when p_base_version
+-- is stale and 22023 for out-of-range operations.
+CREATE OR REPLACE FUNCTION apply_note_patch(
+    p_note_id BIGINT,
+    p_user_id UUID,
+    p_base_version INTEGER,
+    p_ops JSONB,
+    p_title TEXT DEFAULT NULL,
+    p_section TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    body TEXT;
+    current_version INTEGER;
+    op JSONB;
+    pos INTEGER;
+    del INTEGER;
+BEGIN
+    SELECT content, version INTO body, current_version
+    FROM notes WHERE id = p_note_id AND user_id = p_user_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'note not found' USING ERRCODE = 'P0002';
+    END IF;
+    IF current_version <> p_base_version THEN
+        RAISE EXCEPTION 'stale base version, current is %', current_version USING ERRCODE = '40001';
+    END IF;
+
+    body := COALESCE(body, '');
+    FOR op IN SELECT value FROM jsonb_array_elements(p_ops) LOOP
+        pos := (op->>0)::INTEGER;
+        del := (op->>1)::INTEGER;
+        IF pos < 0 OR del < 0 OR pos + del > char_length(body) THEN
+            RAISE EXCEPTION 'patch out of range' USING ERRCODE = '22023';
+        END IF;
+        body := substr(body, 1, pos) || COALESCE(op->>2, '') || substr(body, pos + del + 1);
+    END LOOP;
+
+    UPDATE notes
+    SET content = body,
+        title = COALESCE(p_title, title),
+        section = COALESCE(p_section, section),
+        updated_at = NOW()
+    WHERE id = p_note_id
+    RETURNING version INTO current_version;
+
+    RETURN jsonb_build_object('version', current_version, 'length', char_length(body));
+END;
+$$;
+
+-- Note revision history (GET /notes/<id>/revisions). Each content change adds
+-- a row: a full snapshot (chain = 0) or a forward delta against the previous
+-- revision as JSON [position, delete_count, insert_text] ops. A snapshot is
+-- taken once app.note_snapshot_every revisions (default 20) chain off the last
+-- one, which bounds how many deltas a read has to apply. Change it with
+--   ALTER DATABASE postgres SET app.note_snapshot_every = '50';
+-- Old revisions are pruned by the backend's compaction thread.
+CREATE TABLE IF NOT EXISTS note_revisions (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    note_id BIGINT NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    version INTEGER NOT NULL,
+    chain INTEGER NOT NULL DEFAULT 0,
+    payload TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (note_id, version)
+);
+ALTER TABLE note_revisions ENABLE ROW LEVEL SECURITY;
+-- Snapshots are TOASTed; lz4 (Postgres 14+) is cheaper to compress and read than pglz
+ALTER TABLE note_revisions ALTER COLUMN payload SET COMPRESSION lz4;
+CREATE INDEX IF NOT EXISTS note_revisions_created_at_idx ON note_revisions (created_at, note_id);
+
+-- Single replace op between two texts: common prefix and suffix found by
+-- binary search on left()/right() so large notes are not walked per character.
+CREATE OR REPLACE FUNCTION note_diff(old_text TEXT, new_text TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    a TEXT := COALESCE(old_text, '');
+    b TEXT := COALESCE(new_text, '');
+    lo INTEGER := 0;
+    hi INTEGER;
+    mid INTEGER;
+    prefix INTEGER;
+    suffix INTEGER;
+BEGIN
+    hi := LEAST(char_length(a), char_length(b));
+    WHILE lo < hi LOOP
+        mid := (lo + hi + 1) / 2;
+        IF left(a, mid) = left(b, mid) THEN lo := mid; ELSE hi := mid - 1; END IF;
+    END LOOP;
+    prefix := lo;
+
+    lo := 0;
+    hi := LEAST(char_length(a), char_length(b)) - prefix;
+    WHILE lo < hi LOOP
+        mid := (lo + hi + 1) / 2;
+        IF right(a, mid) = right(b, mid) THEN lo := mid; ELSE hi := mid - 1; END IF;
+    END LOOP;
+    suffix := lo;
+
+    RETURN jsonb_build_array(jsonb_build_array(
+        prefix,
+        char_length(a) - prefix - suffix,
+        substr(b, prefix + 1, char_length(b) - prefix - suffix)
+    ));
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION record_note_revision()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    snapshot_every INTEGER := COALESCE(NULLIF(current_setting('app.note_snapshot_every', true), '')::INTEGER, 20);
+    last_chain INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+        VALUES (NEW.id, NEW.user_id, NEW.version, 0, NEW.content);
+        RETURN NULL;
+    END IF;
+    IF OLD.content IS NOT DISTINCT FROM NEW.content THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT chain INTO last_chain FROM note_revisions
+    WHERE note_id = NEW.id ORDER BY version DESC LIMIT 1;
+    IF NOT FOUND THEN
+        -- Note written before history existed: keep its old text as the base
+        INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+        VALUES (OLD.id, OLD.user_id, OLD.version, 0, OLD.content);
+        last_chain := 0;
+    END IF;
+
+    IF last_chain + 1 < snapshot_every THEN
+        INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+        VALUES (NEW.id, NEW.user_id, NEW.version, last_chain + 1, note_diff(OLD.content, NEW.content)::TEXT);
+    ELSE
+        INSERT INTO note_revisions (note_id, user_id, version, chain, payload)
+        VALUES (NEW.id, NEW.user_id, NEW.version, 0, NEW.content);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS notes_record_revision ON notes;
+CREATE TRIGGER notes_record_revision AFTER INSERT OR UPDATE OF content ON notes
+FOR EACH ROW EXECUTE FUNCTION record_note_revision();
+
+-- Notes the compaction pass has something to drop from: a revision older than
+-- p_cutoff and more than p_keep revisions in all. Returns up to p_limit note
+-- ids after p_after_id, in order, as a JSON array.
+CREATE OR REPLACE FUNCTION note_history_candidates(p_cutoff TIMESTAMPTZ, p_keep INTEGER, p_after_id BIGINT, p_limit INTEGER)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(jsonb_agg(note_id ORDER BY note_id), '[]'::jsonb)
+    FROM (
+        SELECT r.note_id
+        FROM (SELECT DISTINCT note_id FROM note_revisions WHERE created_at < p_cutoff AND note_id > p_after_id) old
+        JOIN note_revisions r ON r.note_id = old.note_id
+        GROUP BY r.note_id
+        HAVING count(*) > p_keep
+        ORDER BY r.note_id
+        LIMIT p_limit
+    ) candidates;
+$$;
+
+-- Click analytics rollups for short URLs (GET /short-urls/<id>/stats). The
+-- backend batches clicks in memory and calls add_click_rollups with rows of
+-- {short_url_id, hour, referrer, agent, country, clicks}; each batch is added
+-- to the hourly and daily rollups and to short_urls.clicks.
+CREATE TABLE IF NOT EXISTS short_url_clicks (
+    short_url_id BIGINT NOT NULL REFERENCES short_urls (id) ON DELETE CASCADE,
+    granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+    bucket TIMESTAMPTZ NOT NULL,
+    referrer TEXT NOT NULL DEFAULT '',
+    agent TEXT NOT NULL DEFAULT '',
+    country TEXT NOT NULL DEFAULT '',
+    clicks BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (short_url_id, granularity, bucket, referrer, agent, country)
+);
+ALTER TABLE short_url_clicks ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION add_click_rollups(p_rows JSONB)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    WITH batch AS (
+        -- Links deleted since the clicks were counted are skipped
+        SELECT r.short_url_id, date_trunc('hour', r.hour) AS hour, COALESCE(r.referrer, '') AS referrer,
+               COALESCE(r.agent, '') AS agent, COALESCE(r.country, '') AS country, r.clicks
+        FROM jsonb_to_recordset(p_rows) AS r(short_url_id BIGINT, hour TIMESTAMPTZ, referrer TEXT, agent TEXT,
+                                             country TEXT, clicks BIGINT)
+        WHERE EXISTS (SELECT 1 FROM short_urls s WHERE s.id = r.short_url_id)
+    ),
+    hourly AS (
+        INSERT INTO short_url_clicks AS c (short_url_id, granularity, bucket, referrer, agent, country, clicks)
+        SELECT short_url_id, 'hour', hour, referrer, agent, country, SUM(clicks)
+        FROM batch GROUP BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT (short_url_id, granularity, bucket, referrer, agent, country)
+        DO UPDATE SET clicks = c.clicks + EXCLUDED.clicks
+    ),
+    daily AS (
+        INSERT INTO short_url_clicks AS c (short_url_id, granularity, bucket, referrer, agent, country, clicks)
+        SELECT short_url_id, 'day', date_trunc('day', hour AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+               referrer, agent, country, SUM(clicks)
+        FROM batch GROUP BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT (short_url_id, granularity, bucket, referrer, agent, country)
+        DO UPDATE SET clicks = c.clicks + EXCLUDED.clicks
+    ),
+    totals AS (
+        UPDATE short_urls s SET clicks = COALESCE(s.clicks, 0) + b.clicks
+        FROM (SELECT short_url_id, SUM(clicks) AS clicks FROM batch GROUP BY short_url_id) b
+        WHERE s.id = b.short_url_id
+        RETURNING b.clicks
+    )
+    SELECT COALESCE(SUM(clicks), 0)::BIGINT FROM totals;
+$$;
+
+-- Todo due times as timestamps. due_date/due_time stay as the text the app
+-- sends; due_at is the same moment resolved in the owner's time zone, set by
+-- the set_todo_due_at trigger on every write. Reminder scans and "due today" lists read it
+-- through the indexes below. On a large table, create the indexes with
+-- CREATE INDEX CONCURRENTLY (outside a transaction) instead.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS time_zone TEXT NOT NULL DEFAULT 'UTC';
+ALTER TABLE todos ADD COLUMN IF NOT EXISTS due_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS todos_user_due_at_idx ON todos (user_id, due_at);
+CREATE INDEX IF NOT EXISTS todos_reminder_due_idx ON todos (due_at) WHERE completed = 0 AND reminder_sent = 0;
+
+-- Same rules as todo_due.due_at in the backend: a missing or malformed time
+-- means 23:59, an invalid date gives NULL.
+CREATE OR REPLACE FUNCTION todo_due_at(p_date TEXT, p_time TEXT, p_zone TEXT)
+RETURNS TIMESTAMPTZ
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    p_date := btrim(COALESCE(p_date, ''));
+    p_time := btrim(COALESCE(p_time, ''));
+    IF p_date !~ '^\d{4}-\d{2}-\d{2}$' THEN
+        RETURN NULL;
+    END IF;
+    IF p_time !~ '^([01]\d|2[0-3]):[0-5]\d$' THEN
+        p_time := '23:59';
+    END IF;
+    RETURN (p_date || ' ' || p_time)::timestamp AT TIME ZONE COALESCE(NULLIF(p_zone, ''), 'UTC');
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+-- due_at from the owner's current time zone whenever a todo's due date or time
+-- is written, so writers never look the zone up themselves. FOR SHARE waits
+-- for a set_user_time_zone in progress, whose todo update would otherwise
+-- miss this row.
+CREATE OR REPLACE FUNCTION set_todo_due_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.due_at := todo_due_at(NEW.due_date, NEW.due_time,
+                              (SELECT time_zone FROM users WHERE id = NEW.user_id FOR SHARE));
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS todos_set_due_at ON todos;
+CREATE TRIGGER todos_set_due_at BEFORE INSERT OR UPDATE OF due_date, due_time ON todos
+FOR EACH ROW EXECUTE FUNCTION set_todo_due_at();
+
+-- Backfill for rows written before due_at existed (python todo_due.py
+-- backfill): sets due_at on the next p_limit todos after p_after_id and
+-- returns {last_id, updated}; last_id is null once there are no more rows.
+-- The update bumps each row's version, so open editors get one 412 and reload.
+CREATE OR REPLACE FUNCTION backfill_todo_due_at(p_after_id BIGINT, p_limit INTEGER)
+RETURNS JSONB
+LANGUAGE sql
+AS $$
+    WITH batch AS (
+        SELECT id FROM todos WHERE id > p_after_id ORDER BY id LIMIT p_limit
+    ),
+    changed AS (
+        UPDATE todos t
+        SET due_at = todo_due_at(t.due_date, t.due_time, u.time_zone)
+        FROM batch b, users u
+        WHERE t.id = b.id AND u.id = t.user_id AND t.due_at IS NULL
+          AND todo_due_at(t.due_date, t.due_time, u.time_zone) IS NOT NULL
+        RETURNING t.id
+    )
+    SELECT jsonb_build_object('last_id', (SELECT max(id) FROM batch),
+                              'updated', (SELECT count(*) FROM changed));
+$$;
+
+-- PUT /settings/time-zone: store the zone and move the user's open todos to
+-- the same wall-clock due times in it. Returns the number of todos updated,
+-- 0 when the zone was already set.
+CREATE OR REPLACE FUNCTION set_user_time_zone(p_user_id UUID, p_time_zone TEXT)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE users SET time_zone = p_time_zone WHERE id = p_user_id AND time_zone IS DISTINCT FROM p_time_zone;
+    IF NOT FOUND THEN
+        RETURN 0;
+    END IF;
+    UPDATE todos
+    SET due_at = todo_due_at(due_date, due_time, p_time_zone), reminder_sent = 0
+    WHERE user_id = p_user_id AND completed = 0 AND COALESCE(due_date, '') <> '';
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$;
+
+-- File previews (GET /files/<id>/preview): a WebP thumbnail for images or a
+-- text snippet for text files and PDFs, base64 in data, written by the
+-- backend's preview pool after upload. 'none' marks files without a preview.
+CREATE TABLE IF NOT EXISTS file_previews (
+    file_id BIGINT PRIMARY KEY REFERENCES files (id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('ready', 'none', 'failed')),
+    mime_type TEXT,
+    data TEXT,
+    digest TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+ALTER TABLE file_previews ENABLE ROW LEVEL SECURITY;
+
+-- File folder sizes (GET /file-folders/tree). file_count and byte_count are
+-- the files directly in a folder; the trigger below keeps them current on
+-- upload, delete, move and size change, and file_folder_tree adds them up
+-- over the tree, so neither reads the files table. The UPDATE fills in
+-- folders created before the columns existed (re-running it recounts).
+ALTER TABLE file_folders ADD COLUMN IF NOT EXISTS file_count BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE file_folders ADD COLUMN IF NOT EXISTS byte_count BIGINT NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS file_folders_user_parent_idx ON file_folders (user_id, parent_id);
+CREATE INDEX IF NOT EXISTS files_folder_id_idx ON files (folder_id);
+
+UPDATE file_folders f
+SET file_count = s.files, byte_count = s.bytes
+FROM (SELECT d.id, count(x.id) AS files, COALESCE(sum(x.size), 0) AS bytes
+      FROM file_folders d LEFT JOIN files x ON x.folder_id = d.id
+      GROUP BY d.id) s
+WHERE f.id = s.id AND (f.file_count, f.byte_count) IS DISTINCT FROM (s.files, s.bytes);
+
+CREATE OR REPLACE FUNCTION count_folder_files()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.folder_id IS NOT NULL THEN
+        UPDATE file_folders
+        SET file_count = file_count - 1, byte_count = byte_count - COALESCE(OLD.size, 0)
+        WHERE id = OLD.folder_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') AND NEW.folder_id IS NOT NULL THEN
+        UPDATE file_folders
+        SET file_count = file_count + 1, byte_count = byte_count + COALESCE(NEW.size, 0)
+        WHERE id = NEW.folder_id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS files_count_folder ON files;
+CREATE TRIGGER files_count_folder AFTER INSERT OR DELETE OR UPDATE OF folder_id, size ON files
+FOR EACH ROW EXECUTE FUNCTION count_folder_files();
+
+-- A user's folders in tree order (parents first, siblings by name) with
+-- depth and the counts of each folder's whole subtree in total_files and
+-- total_bytes. The backend nests the rows.
+CREATE OR REPLACE FUNCTION file_folder_tree(p_user_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH RECURSIVE mine AS (
+        SELECT id, parent_id, name, created_at, file_count, byte_count
+        FROM file_folders WHERE user_id = p_user_id
+    ),
+    walk AS (
+        SELECT f.id, 0 AS depth, ARRAY[f.id] AS path, ARRAY[f.name] AS sort_path
+        FROM mine f
+        WHERE f.parent_id IS NULL OR NOT EXISTS (SELECT 1 FROM mine p WHERE p.id = f.parent_id)
+        UNION ALL
+        SELECT c.id, w.depth + 1, w.path || c.id, w.sort_path || c.name
+        FROM mine c JOIN walk w ON c.parent_id = w.id
+        WHERE NOT c.id = ANY (w.path)
+    ),
+    totals AS (
+        SELECT ancestor AS id, sum(m.file_count) AS total_files, sum(m.byte_count) AS total_bytes
+        FROM walk w JOIN mine m ON m.id = w.id, unnest(w.path) AS ancestor
+        GROUP BY ancestor
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'id', m.id, 'parent_id', m.parent_id, 'name', m.name, 'created_at', m.created_at,
+        'file_count', m.file_count, 'byte_count', m.byte_count, 'depth', w.depth,
+        'total_files', t.total_files, 'total_bytes', t.total_bytes
+    ) ORDER BY w.sort_path, w.path), '[]'::jsonb)
+    FROM walk w JOIN mine m ON m.id = w.id JOIN totals t ON t.id = w.id;
+$$;
+
+-- DELETE /file-folders/<id>: the folder, every folder below it and their
+-- files in one transaction. Returns {folders, files} deleted.
+CREATE OR REPLACE FUNCTION delete_file_folder(p_user_id UUID, p_folder_id BIGINT)
+RETURNS JSONB
+LANGUAGE sql
+AS $$
+    WITH RECURSIVE subtree AS (
+        SELECT id FROM file_folders WHERE id = p_folder_id AND user_id = p_user_id
+        UNION
+        SELECT c.id FROM file_folders c JOIN subtree s ON c.parent_id = s.id WHERE c.user_id = p_user_id
+    ),
+    gone_files AS (
+        DELETE FROM files WHERE user_id = p_user_id AND folder_id IN (SELECT id FROM subtree) RETURNING id
+    ),
+    gone_folders AS (
+        DELETE FROM file_folders WHERE id IN (SELECT id FROM subtree) RETURNING id
+    )
+    SELECT jsonb_build_object('folders', (SELECT count(*) FROM gone_folders),
+                              'files', (SELECT count(*) FROM gone_files));
+$$;
+
+-- Per-user usage (GET /usage, the storage quota on upload). The
+-- count_user_usage triggers adjust a user's row in the same transaction as
+-- every insert and delete on files, todos, notes and short_urls and every
+-- change of files.size. reconcile_user_usage recounts from the tables; the
+-- backend runs it periodically, and the call at the end of this section
+-- fills the table for existing accounts.
+--
+-- The storage quota is enforced by the same trigger: a write that grows
+-- file_bytes past app.storage_quota_mb (default 100, 0 means no quota) raises
+-- QU001 and is rolled back. The usage row stays locked until commit, so
+-- concurrent uploads by one user are checked one after another. Keep it in
+-- step with STORAGE_QUOTA_MB in the backend's .env:
+--   ALTER DATABASE postgres SET app.storage_quota_mb = '100';
+CREATE TABLE IF NOT EXISTS user_usage (
+    user_id UUID PRIMARY KEY,
+    file_count BIGINT NOT NULL DEFAULT 0,
+    file_bytes BIGINT NOT NULL DEFAULT 0,
+    todo_count BIGINT NOT NULL DEFAULT 0,
+    note_count BIGINT NOT NULL DEFAULT 0,
+    short_url_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+ALTER TABLE user_usage ENABLE ROW LEVEL SECURITY;
+CREATE INDEX IF NOT EXISTS todos_user_id_idx ON todos (user_id);
+CREATE INDEX IF NOT EXISTS notes_user_id_idx ON notes (user_id);
+CREATE INDEX IF NOT EXISTS files_user_id_idx ON files (user_id);
+CREATE INDEX IF NOT EXISTS short_urls_user_id_idx ON short_urls (user_id);
+
+CREATE OR REPLACE FUNCTION count_user_usage()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    owner UUID;
+    items INTEGER := CASE TG_OP WHEN 'INSERT' THEN 1 WHEN 'DELETE' THEN -1 ELSE 0 END;
+    bytes BIGINT := 0;
+    total BIGINT;
+    quota BIGINT := (COALESCE(NULLIF(current_setting('app.storage_quota_mb', true), '')::NUMERIC, 100) * 1048576)::BIGINT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        owner := OLD.user_id;
+    ELSE
+        owner := NEW.user_id;
+    END IF;
+    IF TG_TABLE_NAME = 'files' THEN
+        IF TG_OP = 'INSERT' THEN
+            bytes := COALESCE(NEW.size, 0);
+        ELSIF TG_OP = 'DELETE' THEN
+            bytes := -COALESCE(OLD.size, 0);
+        ELSE
+            bytes := COALESCE(NEW.size, 0) - COALESCE(OLD.size, 0);
+        END IF;
+    END IF;
+    INSERT INTO user_usage AS u (user_id, file_count, file_bytes, todo_count, note_count, short_url_count)
+    VALUES (owner,
+            CASE WHEN TG_TABLE_NAME = 'files' THEN items ELSE 0 END,
+            bytes,
+            CASE WHEN TG_TABLE_NAME = 'todos' THEN items ELSE 0 END,
+            CASE WHEN TG_TABLE_NAME = 'notes' THEN items ELSE 0 END,
+            CASE WHEN TG_TABLE_NAME = 'short_urls' THEN items ELSE 0 END)
+    ON CONFLICT (user_id) DO UPDATE SET
+        file_count = u.file_count + EXCLUDED.file_count,
+        file_bytes = u.file_bytes + EXCLUDED.file_bytes,
+        todo_count = u.todo_count + EXCLUDED.todo_count,
+        note_count = u.note_count + EXCLUDED.note_count,
+        short_url_count = u.short_url_count + EXCLUDED.short_url_count,
+        updated_at = NOW()
+    RETURNING file_bytes INTO total;
+    IF bytes > 0 AND quota > 0 AND total > quota THEN
+        RAISE EXCEPTION 'Storage quota exceeded' USING ERRCODE = 'QU001';
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS files_count_user_usage ON files;
+CREATE TRIGGER files_count_user_usage AFTER INSERT OR DELETE OR UPDATE OF size ON files
+FOR EACH ROW EXECUTE FUNCTION count_user_usage();
+DROP TRIGGER IF EXISTS todos_count_user_usage ON todos;
+CREATE TRIGGER todos_count_user_usage AFTER INSERT OR DELETE ON todos
+FOR EACH ROW EXECUTE FUNCTION count_user_usage();
+DROP TRIGGER IF EXISTS notes_count_user_usage ON notes;
+CREATE TRIGGER notes_count_user_usage AFTER INSERT OR DELETE ON notes
+FOR EACH ROW EXECUTE FUNCTION count_user_usage();
+DROP TRIGGER IF EXISTS short_urls_count_user_usage ON short_urls;
+CREATE TRIGGER short_urls_count_user_usage AFTER INSERT OR DELETE ON short_urls
+FOR EACH ROW EXECUTE FUNCTION count_user_usage();
+
+-- Recount the next p_limit users after p_after_id (NULL to start) and fix
+-- rows that differ. Returns {last_id, checked, fixed}; last_id is null once
+-- there are no more users. Each user's row is locked before counting, so a
+-- write committing meanwhile waits and adds itself on top of the new count.
+CREATE OR REPLACE FUNCTION reconcile_user_usage(p_after_id UUID, p_limit INTEGER)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    uid UUID;
+    last_id UUID;
+    checked INTEGER := 0;
+    fixed INTEGER := 0;
+    stored user_usage%ROWTYPE;
+    actual user_usage%ROWTYPE;
+BEGIN
+    FOR uid IN SELECT id FROM users WHERE p_after_id IS NULL OR id > p_after_id ORDER BY id LIMIT p_limit LOOP
+        last_id := uid;
+        checked := checked + 1;
+        INSERT INTO user_usage (user_id) VALUES (uid) ON CONFLICT (user_id) DO NOTHING;
+        SELECT * INTO stored FROM user_usage WHERE user_id = uid FOR UPDATE;
+        actual := stored;
+        SELECT count(*), COALESCE(sum(size), 0) INTO actual.file_count, actual.file_bytes
+        FROM files WHERE user_id = uid;
+        SELECT count(*) INTO actual.todo_count FROM todos WHERE user_id = uid;
+        SELECT count(*) INTO actual.note_count FROM notes WHERE user_id = uid;
+        SELECT count(*) INTO actual.short_url_count FROM short_urls WHERE user_id = uid;
+        IF (stored.file_count, stored.file_bytes, stored.todo_count, stored.note_count, stored.short_url_count)
+           IS DISTINCT FROM
+           (actual.file_count, actual.file_bytes, actual.todo_count, actual.note_count, actual.short_url_count) THEN
+            UPDATE user_usage SET file_count = actual.file_count, file_bytes = actual.file_bytes,
+                todo_count = actual.todo_count, note_count = actual.note_count,
+                short_url_count = actual.short_url_count, updated_at = NOW()
+            WHERE user_id = uid;
+            fixed := fixed + 1;
+        END IF;
+    END LOOP;
+    RETURN jsonb_build_object('last_id', last_id, 'checked', checked, 'fixed', fixed);
+END;
+$$;
+
+SELECT reconcile_user_usage(NULL, 1000000);
+
+-- ===== READ REPLICAS =====
+-- Seconds this server's data is behind the primary, for the app's replica
+-- routing (backend/replicas.py): 0 on the primary, and 0 on a replica that
+-- has replayed all it received. pg_last_xact_replay_timestamp() stops moving
+-- while the primary is idle, which is not lag.
+CREATE OR REPLACE FUNCTION replication_lag()
+RETURNS DOUBLE PRECISION
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END::DOUBLE PRECISION;
+$$;